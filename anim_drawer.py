@@ -6,16 +6,8 @@ import sys
 import math
 
 # functions
-from common.drawing_tools import circle_make, square_make
-
-# default setting of figures
-plt.rcParams['font.family'] = 'Times New Roman' # Fonts
-plt.rcParams["mathtext.fontset"] = 'stix' # math fonts
-plt.rcParams['xtick.direction'] = 'in' # x axis in
-plt.rcParams['ytick.direction'] = 'in' # y axis in 
-plt.rcParams["font.size"] = 10
-plt.rcParams['axes.linewidth'] = 1.0 # axis line width
-plt.rcParams['axes.grid'] = True # make grid
+from common.drawing_tools import circle_make, square_make, set_default_rc_params
+from common.profiling import profiled
 
 class AnimDrawer():
     """create animation of pendulum with cart
@@ -25,6 +17,13 @@ class AnimDrawer():
     pendulum : pendulum class
     anim_fig : figure of matplotlib
     axis : axis of matplotlib
+    anim_param : int
+        decimation of the frames, every anim_param-th state is drawn
+
+    Notes
+    ------------
+    the outlines of the cart and wheels are made once at the origin
+    and only translated by the cart position in each frame
 
     """
 
@@ -39,6 +38,8 @@ class AnimDrawer():
 
         self.anim_param = 1
 
+        set_default_rc_params()
+
         # setting up figure
         self.anim_fig = plt.figure(dpi=150)
         self.axis = self.anim_fig.add_subplot(111)
@@ -47,7 +48,29 @@ class AnimDrawer():
         self.p_imgs = [] # img of pendulum
         self.c_imgs = [] # img of cart
 
-    def draw_anim(self, interval=10):
+        # outlines at z = 0, composed of [cart, wheel 1, wheel 2]
+        self.c_shapes = self._make_cart_shapes()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Parameters
+        ------------
+        path : str
+            trajectory file saved by common.trajectory_io.save_pendulum_trajectory
+
+        Returns
+        ---------
+        drawer : AnimDrawer class
+            drawer of the saved run, the simulation is not executed again
+        """
+        from common.trajectory_io import load_pendulum_trajectory
+
+        pendulum = load_pendulum_trajectory(path)
+
+        return cls(pendulum)
+
+    def draw_anim(self, interval=10, save_path=None, show=True, fps=None):
         """draw the animation and save
 
         Parameteres
@@ -55,30 +78,39 @@ class AnimDrawer():
         interval : int, optional
             animation's interval time, you should link the sampling time of systems
             default is 10 [ms]
+        save_path : str, optional
+            if not None, the animation is saved to this path (e.g. pendulum.mp4) by ffmpeg
+            default is None
+        show : bool, optional
+            if True, the animation is shown in the window, default is True
+        fps : float, optional
+            target frame rate, the frames are decimated to keep the real time
+            default is None (every state is drawn)
 
         """
+        if len(self.pendulum.history_z) == 0:
+            raise ValueError("the pendulum has no history to draw")
+
         self._set_axis()
         self._set_img()
 
         # self.axis.legend()
-        print('save_animation?')
-        self.shuold_save_animation = int(input())
-
-
-        if self.shuold_save_animation:
-            framenum = int(len(self.pendulum.history_z)-1 / self.anim_param)
-            animation = ani.FuncAnimation(self.anim_fig, self._update_anim, interval=interval * self.anim_param, frames=framenum)            
-        else:
-            animation = ani.FuncAnimation(self.anim_fig, self._update_anim, interval=interval, frames=len(self.pendulum.history_z)-1)
+        self.anim_param = 1
+        if fps is not None:
+            self.anim_param = max(1, int(round(1000. / (fps * interval))))
 
+        framenum = (len(self.pendulum.history_z) - 1) // self.anim_param + 1
+        animation = ani.FuncAnimation(self.anim_fig, self._update_anim, init_func=self._init_anim,
+                                      interval=interval * self.anim_param, frames=framenum, blit=True)
 
-        if self.shuold_save_animation: 
-            print('animation_number?')
-            num = int(input())
-            animation.save('pendulum_{0}.mp4'.format(num), writer='ffmpeg')
+        if save_path is not None:
+            animation.save(save_path, writer='ffmpeg', fps=1000. / (interval * self.anim_param))
             # animation.save("pendulum_simu.gif", writer = 'imagemagick') # gif保存
 
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(self.anim_fig)
 
     def _set_axis(self):
         """ initialize the animation axies
@@ -124,6 +156,38 @@ class AnimDrawer():
             temp_img, = self.axis.plot([],[], color=c_color_list[i])
             self.c_imgs.append(temp_img)
 
+    def _make_cart_shapes(self):
+        """ make the outlines of the cart and wheels at z = 0
+
+        Returns
+        -----------
+        c_shapes : list of tuple of numpy.ndarray
+            (xs, ys) of [cart, wheel 1, wheel 2]
+        """
+        cart_xs, cart_ys = square_make(0.0, 0.0, width=self.pendulum.c_width, height=self.pendulum.c_height)
+
+        center_x = self.pendulum.c_width/2 - self.pendulum.c_wheel_size
+        center_y = - self.pendulum.c_height/2 - self.pendulum.c_wheel_size
+
+        wheel_1 = circle_make(center_x, center_y, self.pendulum.c_wheel_size)
+        wheel_2 = circle_make(-center_x, center_y, self.pendulum.c_wheel_size)
+
+        return [(cart_xs, cart_ys), wheel_1, wheel_2]
+
+    def _init_anim(self):
+        """the initial frame of the animation with blit
+
+        Returns
+        -----------
+        imgs : list of img
+            imgs of pendulum and cart
+        """
+        for img in self.p_imgs + self.c_imgs:
+            img.set_data([], [])
+
+        return self.p_imgs + self.c_imgs
+
+    @profiled("draw.update_anim")
     def _update_anim(self, i):
         """the update animation
         this function should be used in the animation functions
@@ -131,24 +195,18 @@ class AnimDrawer():
         Parameters
         ------------
         i : int
-            time step of the animation
+            frame of the animation, the state of i * anim_param is drawn
             the sampling time should be related to the sampling time of system
 
         Returns
         -----------
-        p_imgs : list of img
-            this list is including 1 imgs
-        c_imgs : list of img
-            this list is including 3 imgs
+        imgs : list of img
+            imgs of pendulum (1 img) and cart (3 imgs), redrawn by blit
         """
-        if self.shuold_save_animation:
-            self._draw_pendulum(int(i * self.anim_param))
-            self._draw_cart(int(i * self.anim_param))
-        else:
-            self._draw_pendulum(i)
-            self._draw_cart(i)
+        self._draw_pendulum(int(i * self.anim_param))
+        self._draw_cart(int(i * self.anim_param))
         
-        return self.p_imgs, self.c_imgs
+        return self.p_imgs + self.c_imgs
     
     def _draw_pendulum(self, i):
         """
@@ -162,16 +220,19 @@ class AnimDrawer():
             time step of the animation
             the sampling time should be related to the sampling time of system
         """
-        p_x = [self.pendulum.history_z[i], self.pendulum.history_z[i] + 2 * self.pendulum.p_l * math.sin(self.pendulum.history_th[i])]
-        p_y = [0.0, 2 * self.pendulum.p_l * math.cos(self.pendulum.history_th[i])]
+        z = self.pendulum.history_z[i]
+        th = self.pendulum.history_th[i]
+
+        p_x = [z, z + 2 * self.pendulum.p_l * math.sin(th)]
+        p_y = [0.0, 2 * self.pendulum.p_l * math.cos(th)]
 
-        self.p_imgs[0].set_data([p_x, p_y])
+        self.p_imgs[0].set_data(p_x, p_y)
 
     def _draw_cart(self, i):
         """
         This private function is just divided thing of
         the _update_anim to see the code more clear
-        Drawing pendulum
+        Drawing cart, the outlines are translated by the cart position
 
         Parameters
         ------------
@@ -179,26 +240,7 @@ class AnimDrawer():
             time step of the animation
             the sampling time should be related to the sampling time of system
         """
-        # cart
-        xs, ys = square_make(self.pendulum.history_z[i], 0.0, width=self.pendulum.c_width, height=self.pendulum.c_height)
-        self.c_imgs[0].set_data([xs, ys])
-
-        # wheel 1
-        center_x = self.pendulum.history_z[i] + self.pendulum.c_width/2 - self.pendulum.c_wheel_size
-        center_y = - self.pendulum.c_height/2 - self.pendulum.c_wheel_size
-
-        wheel_xs, wheel_ys = circle_make(center_x, center_y, self.pendulum.c_wheel_size)
-        self.c_imgs[1].set_data([wheel_xs, wheel_ys])
-
-        # wheel 2
-        center_x = self.pendulum.history_z[i] - self.pendulum.c_width/2 + self.pendulum.c_wheel_size
-        center_y = - self.pendulum.c_height/2 - self.pendulum.c_wheel_size
-
-        wheel_xs, wheel_ys = circle_make(center_x, center_y, self.pendulum.c_wheel_size)
-        self.c_imgs[2].set_data([wheel_xs, wheel_ys])
-
-
-    
-
-
+        z = self.pendulum.history_z[i]
 
+        for img, (xs, ys) in zip(self.c_imgs, self.c_shapes):
+            img.set_data(xs + z, ys)
@@ -0,0 +1,324 @@
+# benchmark suite of the simulator and controller hot paths
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulator import SinglePendulumWithCart, BatchSinglePendulumWithCart, LinearSinglePendulumWithCart
+from controllers.LQR import LQR
+from controllers.SDRE import SDRE
+from controllers.MPC import MPC
+from controllers.SwingUp import SwingUp
+from common.drawing_tools import circle_make, square_make
+from benchmarks.import_time import measure_import_time
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+DEFAULT_TOLERANCE = 0.25 # relative slow down reported as a regression
+
+def _initial_state():
+    return SinglePendulumWithCart(init_z=-0.5, init_th=0.1, init_v_z=0.0, init_v_th=-0.5)
+
+def bench_update_state_rk4(number):
+    pendulum = _initial_state()
+
+    def run():
+        for _ in range(number):
+            pendulum.update_state(input_f=0.1, dt=0.01)
+
+    return run
+
+def bench_update_state_dopri5(number):
+    pendulum = SinglePendulumWithCart(init_z=-0.5, init_th=0.1, init_v_th=-0.5, integrator="dopri5")
+
+    def run():
+        for _ in range(number):
+            pendulum.update_state(input_f=0.1, dt=0.01)
+
+    return run
+
+def bench_batch_update_state(number, num_pendulums=1000):
+    states = np.zeros((num_pendulums, 4))
+    states[:, 1] = np.linspace(-0.3, 0.3, num_pendulums)
+    batch = BatchSinglePendulumWithCart(states, record_history=False)
+
+    def run():
+        for _ in range(number):
+            batch.update_state(input_f=0.1, dt=0.01)
+
+    return run
+
+def bench_lqr_calc_input(number):
+    pendulum = _initial_state()
+    controller = LQR(pendulum)
+
+    def run():
+        for _ in range(number):
+            controller.calc_input(pendulum)
+
+    return run
+
+def bench_batch_closed_loop_lqr(number, num_pendulums=1000):
+    states = np.zeros((num_pendulums, 4))
+    states[:, 1] = np.linspace(-0.3, 0.3, num_pendulums)
+    batch = BatchSinglePendulumWithCart(states, record_history=False)
+    controller = LQR(_initial_state())
+
+    def run():
+        for _ in range(number):
+            batch.update_state(input_f=controller.calc_inputs(batch), dt=0.01)
+
+    return run
+
+def bench_sdre_calc_input(number, solver="control"):
+    pendulum = _initial_state()
+    controller = SDRE(pendulum, solver=solver)
+
+    def run():
+        for _ in range(number):
+            controller.calc_input(pendulum)
+
+    return run
+
+def bench_sdre_newton_calc_input(number):
+    return bench_sdre_calc_input(number, solver="newton")
+
+def bench_mpc_calc_input(number):
+    pendulum = _initial_state()
+    controller = MPC(pendulum, input_limit=5.0, z_limit=1.0)
+
+    def run():
+        for _ in range(number):
+            controller.calc_input(pendulum)
+
+    return run
+
+def bench_circle_make(number):
+    def run():
+        for _ in range(number):
+            circle_make(0.1, -0.1, 0.05)
+
+    return run
+
+def bench_square_make(number):
+    def run():
+        for _ in range(number):
+            square_make(0.0, 0.0, width=0.3, height=0.2)
+
+    return run
+
+def bench_closed_loop(number, controller_class=LQR, steps=2000):
+    def run():
+        for _ in range(number):
+            pendulum = SinglePendulumWithCart(init_z=-0.5, init_v_th=-100. * np.pi / 180.,
+                                              history_capacity=steps)
+            controller = controller_class(pendulum)
+
+            for _ in range(steps):
+                f = controller.calc_input(pendulum)
+                pendulum.update_state(input_f=f[0, 0], dt=0.01)
+
+    return run
+
+def bench_closed_loop_sdre(number):
+    return bench_closed_loop(number, controller_class=SDRE)
+
+def bench_closed_loop_swing_up(number, steps=1000):
+    def run():
+        for _ in range(number):
+            pendulum = SinglePendulumWithCart(init_th=np.pi, history_capacity=steps)
+            controller = SwingUp(pendulum)
+
+            for _ in range(steps):
+                f = controller.calc_input(pendulum)
+                pendulum.update_state(input_f=f[0, 0], dt=0.01)
+
+    return run
+
+def bench_closed_loop_linear(number, steps=2000):
+    controller = LQR(_initial_state(), dt=0.01)
+
+    def run():
+        for _ in range(number):
+            pendulum = LinearSinglePendulumWithCart(init_z=-0.5, init_v_th=-100. * np.pi / 180.,
+                                                    history_capacity=steps)
+            pendulum.simulate(controller.K, steps, dt=0.01)
+
+    return run
+
+# name : (setup function, number of the operations in one measurement, unit of the operation)
+BENCHMARKS = {
+    "update_state_rk4": (bench_update_state_rk4, 2000, "step"),
+    "update_state_dopri5": (bench_update_state_dopri5, 2000, "step"),
+    "batch_update_state_1000": (bench_batch_update_state, 200, "step"),
+    "lqr_calc_input": (bench_lqr_calc_input, 20000, "call"),
+    "batch_closed_loop_lqr_1000": (bench_batch_closed_loop_lqr, 200, "step"),
+    "sdre_calc_input": (bench_sdre_calc_input, 200, "call"),
+    "sdre_newton_calc_input": (bench_sdre_newton_calc_input, 200, "call"),
+    "mpc_calc_input": (bench_mpc_calc_input, 2000, "call"),
+    "circle_make": (bench_circle_make, 5000, "call"),
+    "square_make": (bench_square_make, 10000, "call"),
+    "closed_loop_lqr_2000": (bench_closed_loop, 1, "run"),
+    "closed_loop_sdre_2000": (bench_closed_loop_sdre, 1, "run"),
+    "closed_loop_linear_lqr_2000": (bench_closed_loop_linear, 20, "run"),
+    "closed_loop_swing_up_1000": (bench_closed_loop_swing_up, 2, "run"),
+}
+
+def run_benchmark(name, repeat=5):
+    """
+    Parameters
+    ------------
+    name : str
+        name of the benchmark
+    repeat : int
+        number of the measurements, default is 5
+
+    Returns
+    ---------
+    result : dict
+        seconds : minimum time of one operation in seconds
+        ops_per_sec : operations per second at the minimum time
+        unit : the operation, e.g. step, call, run
+    """
+    setup, number, unit = BENCHMARKS[name]
+    run = setup(number)
+
+    run() # warm up, e.g. the gain cache and lazy imports
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) / number)
+
+    seconds = min(times)
+
+    return {"seconds": seconds, "ops_per_sec": 1. / seconds, "unit": unit,
+            "median_seconds": float(np.median(times))}
+
+def run_suite(names=None, repeat=5, import_time=True):
+    """
+    Parameters
+    ------------
+    names : list of str, optional
+        names of the benchmarks, default is all
+    repeat : int
+        number of the measurements of each benchmark, default is 5
+    import_time : bool
+        measure the import time of main and campaign, default is True
+
+    Returns
+    ---------
+    report : dict
+        environment and the results of the benchmarks
+    """
+    results = {}
+
+    for name in (names or list(BENCHMARKS)):
+        results[name] = run_benchmark(name, repeat=repeat)
+
+    if import_time:
+        elapsed, _ = measure_import_time(repeat)
+        results["import_time"] = {"seconds": elapsed, "ops_per_sec": 1. / elapsed, "unit": "import",
+                                  "median_seconds": elapsed}
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "repeat": repeat, "results": results}
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Parameters
+    ------------
+    report : dict
+        made by run_suite
+    baseline : dict
+        stored report
+    tolerance : float
+        relative slow down reported as a regression, default is 0.25
+
+    Returns
+    ---------
+    rows : list of tuple
+        (name, baseline seconds, seconds, ratio, regressed) of the benchmarks of the report,
+        the baseline seconds and ratio are None for the benchmarks out of the baseline
+    """
+    rows = []
+
+    for name, result in report["results"].items():
+        if name not in baseline["results"]:
+            rows.append((name, None, result["seconds"], None, False))
+            continue
+
+        base = baseline["results"][name]["seconds"]
+        ratio = result["seconds"] / base
+        rows.append((name, base, result["seconds"], ratio, ratio > 1. + tolerance))
+
+    return rows
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return "{0:9.2f} us".format(seconds * 1e6)
+    if seconds < 1.:
+        return "{0:9.2f} ms".format(seconds * 1e3)
+    return "{0:9.3f} s ".format(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the simulator and controller hot paths")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-import-time", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json", help="path of the result file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="stored result compared with this run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slow down reported as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    report = run_suite(args.only, repeat=args.repeat, import_time=not args.skip_import_time)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["results"].items():
+        print("{0:<26} {1} / {2:<6} {3:12.1f} {2}/s".format(name, _format_seconds(result["seconds"]),
+                                                           result["unit"], result["ops_per_sec"]))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print("baseline is saved to {0}".format(args.baseline))
+        return
+
+    if not os.path.exists(args.baseline):
+        print("baseline {0} is not found, --save-baseline stores one".format(args.baseline))
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    rows = compare(report, baseline, tolerance=args.tolerance)
+
+    print()
+    print("{0:<26} {1:>12} {2:>12} {3:>8}".format("compared with baseline", "baseline", "this run", "ratio"))
+    for name, base, seconds, ratio, regressed in rows:
+        if base is None:
+            print("{0:<26} {1:>12} {2}  NO BASELINE".format(name, "-", _format_seconds(seconds)))
+            continue
+        print("{0:<26} {1} {2} {3:7.2f}x{4}".format(name, _format_seconds(base), _format_seconds(seconds),
+                                                    ratio, "  REGRESSION" if regressed else ""))
+
+    missing = [row[0] for row in rows if row[1] is None]
+    if missing:
+        print("no baseline of {0}, store a new one by --save-baseline".format(", ".join(missing)))
+
+    if missing or any(row[4] for row in rows):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# import time budget of a headless simulation worker
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the simulation only modules must not import the plotting and control libraries
+HEAVY_MODULES = ["matplotlib", "control", "scipy"]
+
+DEFAULT_BUDGET = 0.3 # [s]
+
+CODE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+import campaign
+elapsed = time.perf_counter() - start
+heavy = sorted(set(name.split('.')[0] for name in sys.modules) & set({0}))
+print(json.dumps({{"elapsed": elapsed, "heavy_modules": heavy}}))
+"""
+
+def measure_import_time(repeat=5):
+    """
+    Parameters
+    ------------
+    repeat : int
+        number of fresh interpreters, default is 5
+
+    Returns
+    ---------
+    elapsed : float in seconds
+        minimum import time of main and campaign
+    heavy_modules : list of str
+        heavy libraries imported by them
+    """
+    results = []
+
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", CODE.format(HEAVY_MODULES)], cwd=ROOT)
+        results.append(json.loads(output.decode()))
+
+    return min(result["elapsed"] for result in results), results[0]["heavy_modules"]
+
+def main():
+    parser = argparse.ArgumentParser(description="check the import time of a simulation only run")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="import time budget [s]")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    elapsed, heavy_modules = measure_import_time(args.repeat)
+
+    print("import time = {0:.3f} [s] (budget {1:.3f} [s])".format(elapsed, args.budget))
+    print("heavy modules = {0}".format(heavy_modules))
+
+    if elapsed > args.budget or heavy_modules:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+# Monte Carlo robustness campaign of pendulum control
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import numpy as np
+
+from simulator import SinglePendulumWithCart
+from controllers.LQR import LQR
+from controllers.SDRE import SDRE
+from controllers.MPC import MPC
+from common.metrics import calc_summary_metrics
+from common.trajectory_io import TrajectoryWriter
+from common.events import default_events
+
+CONTROLLERS = {"LQR": LQR, "SDRE": SDRE, "MPC": MPC}
+
+HISTORY_CHANNELS = ["z", "th", "v_z", "v_th", "input_f"]
+
+FIELDS = ["trial", "controller", "init_z", "init_th", "init_v_z", "init_v_th",
+          "p_m", "p_l", "p_mu", "c_m", "c_mu",
+          "settling_time", "max_abs_z", "control_effort", "success", "diverged", "steps"]
+
+def make_trials(num_trials, controller_names, seed=0, init_range=None, param_scale=0.2):
+    """
+    Parameters
+    ------------
+    num_trials : int
+        number of trials of each controller
+    controller_names : list of str
+        names of the controllers, "LQR", "SDRE" or "MPC"
+    seed : int
+        seed of the random generator, default is 0
+    init_range : dict, optional
+        half width of the uniform initial state, keys are z, th, v_z, v_th
+    param_scale : float
+        relative half width of the uniform parameter perturbation, default is 0.2
+
+    Returns
+    ---------
+    trials : list of dict
+        settings of each trial, the same trial index has the same initial state and plant
+    """
+    if init_range is None:
+        init_range = {"z": 0.5, "th": 0.3, "v_z": 0.5, "v_th": 1.0}
+
+    random = np.random.RandomState(seed)
+    nominal = SinglePendulumWithCart()
+
+    trials = []
+
+    for i in range(num_trials):
+        setting = {"trial": i}
+
+        for key in ("z", "th", "v_z", "v_th"):
+            setting["init_" + key] = random.uniform(-init_range[key], init_range[key])
+
+        for key in ("p_m", "p_l", "p_mu", "c_m", "c_mu"):
+            setting[key] = getattr(nominal, key) * (1.0 + random.uniform(-param_scale, param_scale))
+
+        for name in controller_names:
+            trial = dict(setting)
+            trial["controller"] = name
+            trials.append(trial)
+
+    return trials
+
+def run_trial(trial, simulation_time=2000, sampling_time=0.01, th_limit=math.pi / 2., z_limit=5.0,
+              return_history=False, early_stop=False, controller_options=None):
+    """
+    Parameters
+    ------------
+    trial : dict
+        setting of the trial, made by make_trials
+    simulation_time : int
+        maximum number of the simulation steps, default is 2000
+    sampling_time : float in seconds
+        sampling time of the control, default is 0.01
+    th_limit : float in radians
+        the trial is diverged if |th| exceeds it, default is pi / 2
+    z_limit : float in meters
+        the trial is diverged if |z| exceeds it, default is 5.0
+    return_history : bool
+        if True, the result has "history", numpy.ndarray, shape(5, simulation_time) of
+        [z, th, v_z, v_th, input_f] padded by nan after the divergence, default is False
+    early_stop : bool
+        if True, the trial also stops when the plant has settled, default is False
+    controller_options : dict, optional
+        keyword arguments of the controller, e.g. Q and R, default is None
+        the dt of MPC and of the discrete LQR (dt is given) is the sampling time
+
+    Returns
+    ---------
+    result : dict
+        setting and summary metrics of the trial
+
+    Notes
+    --------
+    the controller is designed on the nominal plant and only observes the state of the
+    perturbed plant, so the trial measures the robustness against the model error
+    """
+    plant = SinglePendulumWithCart(init_z=trial["init_z"], init_th=trial["init_th"],
+                                   init_v_z=trial["init_v_z"], init_v_th=trial["init_v_th"])
+
+    plant.set_params(**{key: trial[key] for key in ("p_m", "p_l", "p_mu", "c_m", "c_mu")})
+
+    model = SinglePendulumWithCart(init_z=plant.z, init_th=plant.th, init_v_z=plant.v_z, init_v_th=plant.v_th)
+    # the prediction model of MPC and the discrete LQR hold the input over the sampling time
+    options = dict(controller_options or {})
+    if trial["controller"] == "MPC" or (trial["controller"] == "LQR" and options.get("dt") is not None):
+        options["dt"] = sampling_time
+
+    controller = CONTROLLERS[trial["controller"]](model, **options)
+
+    if early_stop:
+        plant.set_events(default_events(th_limit=th_limit, z_limit=z_limit))
+
+    diverged = False
+    steps = 0
+
+    for steps in range(1, simulation_time + 1):
+        model.z, model.th, model.v_z, model.v_th = plant.z, plant.th, plant.v_z, plant.v_th
+
+        try:
+            f = controller.calc_input(model)[0, 0]
+        except (ValueError, np.linalg.LinAlgError):
+            diverged = True
+            break
+
+        plant.update_state(input_f=f, dt=sampling_time)
+
+        if not (abs(plant.th) < th_limit and abs(plant.z) < z_limit):
+            diverged = True
+            break
+
+        if plant.terminal_event is not None:
+            diverged = plant.terminal_event.name != "settled"
+            break
+
+    metrics = calc_summary_metrics(plant.history_z, plant.history_th, plant.history_input_f,
+                                   sampling_time, diverged=diverged)
+
+    result = dict(trial)
+    result.update(metrics)
+    result["diverged"] = diverged
+    result["steps"] = steps
+
+    if return_history:
+        history = np.full((len(HISTORY_CHANNELS), simulation_time), np.nan)
+        history[:, :len(plant.history)] = plant.history.as_array()[:len(HISTORY_CHANNELS)]
+        result["history"] = history
+
+    return result
+
+def run_campaign(trials, processes=None, chunksize=4, **kwargs):
+    """
+    Parameters
+    ------------
+    trials : list of dict
+        settings of the trials
+    processes : int, optional
+        number of worker processes, default is None (number of cores)
+    chunksize : int
+        number of trials sent to a worker at once, default is 4
+    kwargs : dict
+        passed to run_trial
+
+    Returns
+    ---------
+    results : list of dict
+        results of the trials in the order of trials
+    """
+    return list(iter_campaign(trials, processes=processes, chunksize=chunksize, **kwargs))
+
+def iter_campaign(trials, processes=None, chunksize=4, **kwargs):
+    """
+    same as run_campaign, but yields the results in the order of trials as they finish
+    """
+    worker = _TrialWorker(kwargs)
+
+    if processes == 1:
+        for trial in trials:
+            yield worker(trial)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap(worker, trials, chunksize=chunksize):
+            yield result
+
+def save_campaign_trajectories(trials, path, simulation_time=2000, sampling_time=0.01, **kwargs):
+    """
+    run the campaign and save the trajectories of all trials to one trajectory file
+
+    Parameters
+    ------------
+    trials : list of dict
+        settings of the trials
+    path : str
+        path of the trajectory file, the columns are z, th, v_z, v_th, input_f of
+        shape(trials, simulation_time) padded by nan after the divergence
+    simulation_time : int
+        maximum number of the simulation steps, default is 2000
+    sampling_time : float in seconds
+        sampling time of the control, default is 0.01
+    kwargs : dict
+        passed to iter_campaign
+
+    Returns
+    ---------
+    results : list of dict
+        results of the trials in the order of trials, without the histories
+    """
+    specs = {name: ((len(trials), simulation_time), np.float64) for name in HISTORY_CHANNELS}
+    metadata = {"dt": sampling_time, "trials": [{key: value for key, value in trial.items()} for trial in trials]}
+
+    results = []
+
+    # each trajectory is written as it arrives, the file is never fully in memory
+    with TrajectoryWriter(path, specs, metadata=metadata) as writer:
+        for i, result in enumerate(iter_campaign(trials, simulation_time=simulation_time,
+                                                 sampling_time=sampling_time, return_history=True, **kwargs)):
+            history = result.pop("history")
+            for channel, values in zip(HISTORY_CHANNELS, history):
+                writer[channel][i] = values
+            results.append(result)
+
+    return results
+
+class _TrialWorker():
+    """picklable run_trial with fixed keyword arguments
+    """
+    def __init__(self, kwargs):
+        self.kwargs = kwargs
+
+    def __call__(self, trial):
+        return run_trial(trial, **self.kwargs)
+
+def write_results(results, path):
+    """
+    Parameters
+    ------------
+    results : list of dict
+    path : str
+        path of the csv file
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+def summarize(results):
+    """
+    Parameters
+    ------------
+    results : list of dict
+
+    Returns
+    ---------
+    summary : dict
+        aggregated metrics of each controller
+    """
+    summary = {}
+
+    for name in sorted(set(result["controller"] for result in results)):
+        rows = [result for result in results if result["controller"] == name]
+        settling_times = np.array([row["settling_time"] for row in rows if row["success"]])
+
+        summary[name] = {
+            "trials": len(rows),
+            "success_rate": np.mean([row["success"] for row in rows]),
+            "divergence_rate": np.mean([row["diverged"] for row in rows]),
+            "median_settling_time": np.median(settling_times) if len(settling_times) else math.nan,
+            "p95_settling_time": np.percentile(settling_times, 95) if len(settling_times) else math.nan,
+            "mean_max_abs_z": np.mean([row["max_abs_z"] for row in rows]),
+            "mean_control_effort": np.mean([row["control_effort"] for row in rows]),
+        }
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness campaign")
+    parser.add_argument("--trials", type=int, default=100, help="number of trials of each controller")
+    parser.add_argument("--controllers", nargs="+", default=["LQR", "SDRE"], choices=sorted(CONTROLLERS))
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--param-scale", type=float, default=0.2, help="relative parameter perturbation")
+    parser.add_argument("--steps", type=int, default=2000, help="maximum simulation steps")
+    parser.add_argument("--dt", type=float, default=0.01, help="sampling time [s]")
+    parser.add_argument("--early-stop", action="store_true", help="stop each trial when the plant has settled")
+    parser.add_argument("--output", default="campaign_results.csv", help="path of the result table")
+    parser.add_argument("--save-trajectories", help="path of the trajectory file of all trials (.traj)")
+    args = parser.parse_args()
+
+    trials = make_trials(args.trials, args.controllers, seed=args.seed, param_scale=args.param_scale)
+
+    if args.save_trajectories is None:
+        results = run_campaign(trials, processes=args.processes,
+                               simulation_time=args.steps, sampling_time=args.dt, early_stop=args.early_stop)
+    else:
+        results = save_campaign_trajectories(trials, args.save_trajectories, processes=args.processes,
+                                             simulation_time=args.steps, sampling_time=args.dt,
+                                             early_stop=args.early_stop)
+
+    write_results(results, args.output)
+
+    for name, summary in summarize(results).items():
+        print("{0} : {1}".format(name, ", ".join("{0} = {1:.4g}".format(key, value)
+                                                 for key, value in summary.items())))
+    print("results are saved to {0}".format(os.path.abspath(args.output)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import collections
+import numpy as np
+
+# level of the diagnostics, each level records the fields of the lower levels
+LEVELS = {
+    "off": 0,
+    "gain": 1, # feedback gain K and closed loop eigenvalues
+    "full": 2, # and the frozen A and B
+}
+
+class DiagnosticsRecorder():
+    """
+    structured diagnostics of the controller, recorded per step instead of printed
+
+    Attributes
+    ------------
+    level : int
+        one of LEVELS
+    every : int
+        one of every steps is recorded
+    num_calls : int
+        number of the steps offered to the recorder
+    records : collections.deque of dict
+        recorded steps, the oldest records are dropped over the capacity
+
+    Notes
+    --------
+    the controllers call sample() once per step and compute the fields only if it returns True,
+    so a recorder with the level "off" (or no recorder) costs nothing in the control loop
+    """
+
+    def __init__(self, level="gain", every=1, capacity=100000):
+        """
+        Parameters
+        ------------
+        level : str or int
+            "off", "gain" or "full", default is "gain"
+        every : int
+            sampling rate, one of every steps is recorded, default is 1
+        capacity : int
+            maximum number of the records kept in memory, default is 100000
+        """
+        if isinstance(level, str):
+            if level not in LEVELS:
+                raise ValueError("level should be chosen from {0}".format(", ".join(LEVELS)))
+            level = LEVELS[level]
+
+        if every < 1:
+            raise ValueError("every should be positive")
+
+        self.level = level
+        self.every = every
+        self.num_calls = 0
+        self.records = collections.deque(maxlen=capacity)
+
+    def sample(self):
+        """
+        Returns
+        ---------
+        record : bool
+            True if the current step should be recorded
+        """
+        if self.level == 0:
+            return False
+
+        step = self.num_calls
+        self.num_calls += 1
+
+        return step % self.every == 0
+
+    def record(self, **fields):
+        """
+        Parameters
+        ------------
+        fields : dict
+            name : value of the step, numpy arrays are copied
+        """
+        self.records.append({"step": self.num_calls - 1,
+                             **{name: np.array(value) for name, value in fields.items()}})
+
+    def __len__(self):
+        return len(self.records)
+
+    def as_arrays(self):
+        """
+        Returns
+        ---------
+        arrays : dict
+            name : numpy.ndarray, shape(records, ...) stacked over the recorded steps
+        """
+        if not self.records:
+            return {}
+
+        return {name: np.stack([record[name] for record in self.records]) for name in self.records[0]}
+
+    def save(self, path):
+        """
+        Parameters
+        ------------
+        path : str
+            path of the npz file, the arrays are stacked over the recorded steps
+        """
+        np.savez(path, level=self.level, every=self.every, **self.as_arrays())
+
+    def clear(self):
+        self.num_calls = 0
+        self.records.clear()
@@ -1,6 +1,27 @@
 import math
 import numpy as np
 
+def set_default_rc_params():
+    '''
+    Set the default setting of figures
+
+    Notes
+    -------
+    this is called when the drawers are created,
+    so matplotlib is not imported or configured by simulation only runs
+    '''
+    import matplotlib
+
+    rcParams = matplotlib.rcParams
+
+    rcParams['font.family'] = 'Times New Roman' # Fonts
+    rcParams["mathtext.fontset"] = 'stix' # math fonts
+    rcParams['xtick.direction'] = 'in' # x axis in
+    rcParams['ytick.direction'] = 'in' # y axis in 
+    rcParams["font.size"] = 10
+    rcParams['axes.linewidth'] = 1.0 # axis line width
+    rcParams['axes.grid'] = True # make grid
+
 def circle_make(center_x, center_y, radius):
     '''
     Create circle matrix
@@ -21,14 +42,12 @@ def circle_make(center_x, center_y, radius):
 
     point_num = 100 # 分解能
 
-    circle_xs = []
-    circle_ys = []
+    angles = np.arange(point_num + 1) * 2 * math.pi / point_num
 
-    for i in range(point_num + 1):
-        circle_xs.append(center_x + radius * math.cos(i*2*math.pi/point_num))
-        circle_ys.append(center_y + radius * math.sin(i*2*math.pi/point_num))
+    circle_xs = center_x + radius * np.cos(angles)
+    circle_ys = center_y + radius * np.sin(angles)
 
-    return np.array(circle_xs), np.array(circle_ys)
+    return circle_xs, circle_ys
 
 def square_make(center_x, center_y, width=1.0, height=1.0):
     '''
@@ -0,0 +1,231 @@
+import math
+import numpy as np
+
+class CartPoleDynamics():
+    """
+    motion equation of the pendulum with cart
+
+    Attributes
+    ------------
+    p_m, p_l, p_j, p_mu, c_m, c_mu, g : float
+        parameters of the pendulum, see SinglePendulumWithCart
+
+    Notes
+    --------
+    the state vector x is [z, th, v_z, v_th]
+    the products of the parameters are precomputed when the class is created,
+    so each evaluation calculates sin(th) and cos(th) once for all 4 derivatives
+    create it again if the parameters are changed
+    """
+
+    def __init__(self, p_m, p_l, p_j, p_mu, c_m, c_mu, g):
+        self.p_m = p_m
+        self.p_l = p_l
+        self.p_j = p_j
+        self.p_mu = p_mu
+        self.c_m = c_m
+        self.c_mu = c_mu
+        self.g = g
+
+        self.mass = p_m + c_m
+        self.inerter_mass = p_j + p_m * (p_l**2)
+        self.m_l = p_m * p_l
+
+        # alpha = alpha_0 + alpha_1 * sin(th)^2
+        self.alpha_0 = p_j * self.mass + c_m * p_m * (p_l**2)
+        self.alpha_1 = (p_m**2) * (p_l**2)
+
+        # numerators of v_z and v_th derivatives
+        self.z_input = self.inerter_mass
+        self.z_v_z = - c_mu * self.inerter_mass
+        self.z_v_th = p_mu * self.m_l
+        self.z_v_th2 = self.inerter_mass * self.m_l
+        self.z_gravity = - self.alpha_1 * g
+
+        self.th_input = - self.m_l
+        self.th_v_z = c_mu * self.m_l
+        self.th_v_th = - p_mu * self.mass
+        self.th_v_th2 = - self.alpha_1
+        self.th_gravity = self.mass * self.m_l * g
+
+    @classmethod
+    def from_pendulum(cls, pendulum):
+        """
+        Parameters
+        ------------
+        pendulum : pendulum class
+
+        Returns
+        ---------
+        dynamics : CartPoleDynamics class
+        """
+        return cls(pendulum.p_m, pendulum.p_l, pendulum.p_j, pendulum.p_mu,
+                   pendulum.c_m, pendulum.c_mu, pendulum.g)
+
+    def derivative(self, z, th, v_z, v_th, input_f):
+        """
+        Parameters
+        ------------
+        z : float in meters
+            cart position in z-coordinate
+        th : float in radians
+            pendulum angle
+        v_z : float in m/s
+            cart velocity in z-coordinate
+        v_th : float in rad/s
+            pendulum angle velocity
+        input_f : float in N
+            input for the system
+
+        Returns
+        -----------
+        y : tuple of float
+            Differential coefficient of (z, th, v_z, v_th)
+        """
+        sin_th = math.sin(th)
+        cos_th = math.cos(th)
+
+        alpha = self.alpha_0 + self.alpha_1 * sin_th * sin_th
+        v_th2 = v_th * v_th
+
+        d_v_z = (self.z_input * input_f + self.z_v_z * v_z + self.z_v_th * cos_th * v_th +
+                 (self.z_v_th2 * v_th2 + self.z_gravity * cos_th) * sin_th) / alpha
+        d_v_th = ((self.th_input * input_f + self.th_v_z * v_z) * cos_th + self.th_v_th * v_th +
+                  (self.th_v_th2 * cos_th * v_th2 + self.th_gravity) * sin_th) / alpha
+
+        return v_z, v_th, d_v_z, d_v_th
+
+    def derivatives(self, states, input_f):
+        """
+        Parameters
+        ------------
+        states : numpy.ndarray, shape(N, 4)
+            states, each row is [z, th, v_z, v_th]
+        input_f : numpy.ndarray, shape(N, ) in N
+            inputs for the systems
+
+        Returns
+        -----------
+        y : numpy.ndarray, shape(N, 4)
+            Differential coefficient of states
+        """
+        th = states[:, 1]
+        v_z = states[:, 2]
+        v_th = states[:, 3]
+
+        sin_th = np.sin(th)
+        cos_th = np.cos(th)
+
+        alpha = self.alpha_0 + self.alpha_1 * sin_th * sin_th
+        v_th2 = v_th * v_th
+
+        y = np.empty_like(states)
+        y[:, 0] = v_z
+        y[:, 1] = v_th
+        y[:, 2] = (self.z_input * input_f + self.z_v_z * v_z + self.z_v_th * cos_th * v_th +
+                   (self.z_v_th2 * v_th2 + self.z_gravity * cos_th) * sin_th) / alpha
+        y[:, 3] = ((self.th_input * input_f + self.th_v_z * v_z) * cos_th + self.th_v_th * v_th +
+                   (self.th_v_th2 * cos_th * v_th2 + self.th_gravity) * sin_th) / alpha
+
+        return y
+
+    def energy(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : float in radians
+            pendulum angle
+        v_th : float in rad/s
+            pendulum angle velocity
+
+        Returns
+        ---------
+        energy : float in J
+            energy of the pendulum about the pivot, 0 at rest upright and - 2 m l g hanging
+        """
+        return 0.5 * self.inerter_mass * v_th * v_th + self.m_l * self.g * (math.cos(th) - 1.)
+
+    def input_for_acceleration(self, th, v_z, v_th, acceleration):
+        """
+        Parameters
+        ------------
+        th : float in radians
+        v_z : float in m/s
+        v_th : float in rad/s
+        acceleration : float in m/s^2
+            desired acceleration of the cart
+
+        Returns
+        ---------
+        input_f : float in N
+            input which gives the acceleration, the inverse of the derivative of v_z
+        """
+        sin_th = math.sin(th)
+        cos_th = math.cos(th)
+
+        alpha = self.alpha_0 + self.alpha_1 * sin_th * sin_th
+
+        rest = self.z_v_z * v_z + self.z_v_th * cos_th * v_th + (self.z_v_th2 * v_th * v_th + self.z_gravity * cos_th) * sin_th
+
+        return (alpha * acceleration - rest) / self.z_input
+
+    def linearize(self):
+        """
+        linearize the motion equation around the upright equilibrium (x = 0, f = 0)
+
+        Returns
+        ---------
+        A : numpy.ndarray, shape(4, 4)
+            Matrix A of state equation
+        B : numpy.ndarray, shape(4, 1)
+            Matrix B of state equation
+        """
+        A = np.array([[0.0, 0.0, 1.0, 0.0],
+                      [0.0, 0.0, 0.0, 1.0],
+                      [0.0, 0.0, 0.0, 0.0],
+                      [0.0, 0.0, 0.0, 0.0]])
+
+        A[2, 1] = self.z_gravity / self.alpha_0
+        A[2, 2] = self.z_v_z / self.alpha_0
+        A[2, 3] = self.z_v_th / self.alpha_0
+
+        A[3, 1] = self.th_gravity / self.alpha_0
+        A[3, 2] = self.th_v_z / self.alpha_0
+        A[3, 3] = self.th_v_th / self.alpha_0
+
+        B = np.array([[0.0],
+                      [0.0],
+                      [self.z_input / self.alpha_0],
+                      [self.th_input / self.alpha_0]])
+
+        return A, B
+
+    def discretize(self, dt):
+        """
+        exact zero order hold discretization of the linearized motion equation,
+        x[k+1] = Ad x[k] + Bd u[k], scipy is imported at the first call
+
+        Parameters
+        ------------
+        dt : float in seconds
+            sampling time
+
+        Returns
+        ---------
+        Ad : numpy.ndarray, shape(4, 4)
+            expm(A dt)
+        Bd : numpy.ndarray, shape(4, 1)
+            integral of expm(A s) B over [0, dt]
+        """
+        from scipy.linalg import expm
+
+        A, B = self.linearize()
+
+        # expm([[A, B], [0, 0]] dt) = [[Ad, Bd], [0, I]]
+        augmented = np.zeros((5, 5))
+        augmented[:4, :4] = A
+        augmented[:4, 4:] = B
+
+        phi = expm(augmented * dt)
+
+        return phi[:4, :4], phi[:4, 4:]
@@ -0,0 +1,311 @@
+import collections
+import math
+import numpy as np
+
+# event found by EventMonitor, time in seconds and state [z, th, v_z, v_th] at the event
+EventRecord = collections.namedtuple("EventRecord", ["name", "time", "state"])
+
+class Event():
+    """
+    event of the simulation, the value is positive until the event happens
+
+    Attributes
+    ------------
+    name : str
+    terminal : bool
+        if True, the simulation should stop at the event
+    hold_time : float in seconds
+        the event is reported after the value stays non positive for hold_time,
+        the time of the event is still the crossing
+    localize : bool
+        if True, the crossing is localized inside the step, otherwise it is the end of the step
+
+    Notes
+    --------
+    the subclasses define value(state), the event happens when the value crosses zero from positive,
+    a nan value is regarded as non positive
+    """
+    name = "event"
+    terminal = True
+    hold_time = 0.0
+    localize = True
+
+    def value(self, state):
+        """
+        Parameters
+        ------------
+        state : numpy.ndarray, shape(4, )
+            [z, th, v_z, v_th]
+
+        Returns
+        ---------
+        value : float
+        """
+        raise NotImplementedError
+
+class Fallen(Event):
+    """|th| exceeds th_limit, th is wrapped to [-pi, pi]
+    """
+    name = "fallen"
+
+    def __init__(self, th_limit=math.pi / 2.):
+        """
+        Parameters
+        ------------
+        th_limit : float in radians
+            default is pi / 2
+        """
+        self.th_limit = th_limit
+
+    def value(self, state):
+        return self.th_limit - abs(math.remainder(state[1], 2. * math.pi))
+
+class TrackLimit(Event):
+    """|z| exceeds the half length of the track
+    """
+    name = "track_limit"
+
+    def __init__(self, z_limit=5.0):
+        """
+        Parameters
+        ------------
+        z_limit : float in meters
+            default is 5.0
+        """
+        self.z_limit = z_limit
+
+    def value(self, state):
+        return self.z_limit - abs(state[0])
+
+class NonFinite(Event):
+    """the state is nan or overflows
+    """
+    name = "non_finite"
+    localize = False # the trajectory is not defined inside the step
+
+    def __init__(self, max_abs=1e6):
+        """
+        Parameters
+        ------------
+        max_abs : float
+            the state over this value is regarded as the overflow, default is 1e6
+        """
+        self.max_abs = max_abs
+
+    def value(self, state):
+        return self.max_abs - max(abs(value) for value in state) # nan stays nan
+
+class Settled(Event):
+    """the state stays within the tolerances for hold_time, th is wrapped to [-pi, pi]
+    """
+    name = "settled"
+
+    def __init__(self, th_tolerance=0.02, z_tolerance=0.05, velocity_tolerance=0.05, hold_time=1.0,
+                 reference_z=0.0):
+        """
+        Parameters
+        ------------
+        th_tolerance : float in radians
+            default is 0.02
+        z_tolerance : float in meters
+            tolerance of the cart position from reference_z, default is 0.05
+        velocity_tolerance : float
+            tolerance of v_z in m/s and v_th in rad/s, default is 0.05
+        hold_time : float in seconds
+            default is 1.0
+        reference_z : float in meters
+            settled cart position, default is 0.0
+        """
+        self.tolerances = (z_tolerance, th_tolerance, velocity_tolerance, velocity_tolerance)
+        self.hold_time = hold_time
+        self.reference_z = reference_z
+
+    def value(self, state):
+        z, th, v_z, v_th = state
+        deviations = (abs(z - self.reference_z), abs(math.remainder(th, 2. * math.pi)), abs(v_z), abs(v_th))
+
+        return max(deviation / tolerance for deviation, tolerance in zip(deviations, self.tolerances)) - 1.
+
+def default_events(th_limit=math.pi / 2., z_limit=5.0, hold_time=1.0, reference_z=0.0):
+    """
+    Returns
+    ---------
+    events : list of Event
+        settled, fallen, track limit and non finite, all terminal
+    """
+    return [NonFinite(), Fallen(th_limit), TrackLimit(z_limit), Settled(hold_time=hold_time, reference_z=reference_z)]
+
+class EventMonitor():
+    """
+    detects the events at every step of a simulator
+
+    Attributes
+    ------------
+    events : list of Event
+    records : list of EventRecord
+        events happened so far, each event is reported once
+    terminal : EventRecord or None
+        the first terminal event
+
+    Notes
+    --------
+    the values are checked at the end of each step, and the crossing inside the step is found
+    by the regula falsi (Illinois) on the cubic Hermite interpolation of the step,
+    which has the same order as the step of the 4th Runge-Kutta method
+    the derivatives of the interpolation are only evaluated for the steps which have a crossing
+    """
+
+    def __init__(self, events, time, state):
+        """
+        Parameters
+        ------------
+        events : list of Event
+        time : float in seconds
+            time of the initial state
+        state : array-like, shape(4, )
+            initial state [z, th, v_z, v_th]
+        """
+        self.events = list(events)
+        self.records = []
+        self.terminal = None
+
+        state = np.array(state, dtype=np.float64)
+
+        self._values = [event.value(state) for event in self.events]
+        self._fired = [False] * len(self.events)
+
+        # the events which start on the event side are crossed at the initial time
+        self._crossings = [None if value > 0. else (time, state) for value in self._values]
+
+        self._check_hold(time)
+
+    def step(self, time, state, next_state, dt, derivative=None):
+        """
+        Parameters
+        ------------
+        time : float in seconds
+            time at the start of the step
+        state : array-like, shape(4, )
+            state at the start of the step
+        next_state : array-like, shape(4, )
+            state at the end of the step
+        dt : float in seconds
+            length of the step
+        derivative : callable, optional
+            derivative(state) of the motion equation with the input of the step,
+            default is None (linear interpolation of the step, e.g. the discrete time model)
+
+        Returns
+        ---------
+        terminal : EventRecord or None
+            the first terminal event
+        """
+        next_state = np.array(next_state, dtype=np.float64)
+        interpolation = None
+
+        for i, event in enumerate(self.events):
+            if self._fired[i]:
+                continue
+
+            value = event.value(next_state)
+
+            if value > 0.:
+                self._crossings[i] = None
+            elif self._crossings[i] is None:
+                if self._values[i] > 0. and event.localize:
+                    if interpolation is None:
+                        interpolation = _HermiteStep(state, next_state, dt, derivative)
+                    self._crossings[i] = _localize(event, interpolation, self._values[i], value, time)
+                else:
+                    self._crossings[i] = (time + dt, next_state)
+
+            self._values[i] = value
+
+        self._check_hold(time + dt)
+
+        return self.terminal
+
+    def _check_hold(self, time):
+        """report the crossings which are held for the hold time of the events
+        """
+        for i, event in enumerate(self.events):
+            crossing = self._crossings[i]
+            if self._fired[i] or crossing is None or time - crossing[0] < event.hold_time - 1e-9:
+                continue
+
+            self._fired[i] = True
+            record = EventRecord(event.name, crossing[0], crossing[1])
+            self.records.append(record)
+
+            if event.terminal and (self.terminal is None or record.time < self.terminal.time):
+                self.terminal = record
+
+class _HermiteStep():
+    """cubic Hermite interpolation of one step
+    """
+
+    def __init__(self, state, next_state, dt, derivative):
+        self.state = np.array(state, dtype=np.float64)
+        self.next_state = next_state
+        self.dt = dt
+
+        if derivative is None:
+            self.slopes = None
+        else:
+            self.slopes = (np.asarray(derivative(self.state)) * dt, np.asarray(derivative(next_state)) * dt)
+
+    def __call__(self, s):
+        """
+        Parameters
+        ------------
+        s : float
+            fraction of the step, 0 <= s <= 1
+        """
+        if self.slopes is None:
+            return self.state + s * (self.next_state - self.state)
+
+        s2 = s * s
+        s3 = s2 * s
+
+        return (2. * s3 - 3. * s2 + 1.) * self.state + (s3 - 2. * s2 + s) * self.slopes[0] \
+            + (-2. * s3 + 3. * s2) * self.next_state + (s3 - s2) * self.slopes[1]
+
+def _localize(event, interpolation, value, next_value, time, tol=1e-10, max_iter=50):
+    """
+    find the crossing of the value by the Illinois method
+
+    Returns
+    ---------
+    crossing : tuple
+        (time, state) of the crossing
+    """
+    low, high = 0., 1.
+    low_value, high_value = value, next_value
+    side = 0
+
+    if not math.isfinite(high_value):
+        high_value = -abs(low_value) # the bracket still holds
+
+    for _ in range(max_iter):
+        s = (low * high_value - high * low_value) / (high_value - low_value)
+        if not low < s < high:
+            s = 0.5 * (low + high)
+
+        s_value = event.value(interpolation(s))
+
+        if s_value > 0.:
+            low, low_value = s, s_value
+            if side == 1:
+                high_value *= 0.5
+            side = 1
+        else:
+            high = s
+            high_value = s_value if math.isfinite(s_value) else -abs(low_value)
+            if side == -1:
+                low_value *= 0.5
+            side = -1
+
+        if high - low < tol:
+            break
+
+    return float(time + high * interpolation.dt), interpolation(high)
@@ -0,0 +1,173 @@
+import numpy as np
+
+class StateHistory():
+    """
+    time history store backed by one contiguous float64 buffer
+
+    Attributes
+    ------------
+    channels : list of str
+        names of the recorded channels
+    capacity : int
+        number of samples which can be stored without growing
+    ring : bool
+        if True, the store keeps only the latest capacity samples
+    width : int or None
+        if None, each channel records a float per sample,
+        else each channel records an array of shape(width, ) per sample
+
+    Notes
+    --------
+    the buffer is laid out as shape(channels, samples[, width]),
+    so the history of each channel is a contiguous, zero-copy numpy view
+
+    in the ring mode every sample is written twice (at i and i + capacity),
+    then the latest capacity samples are always a contiguous slice of the buffer
+    and views stay zero-copy even after the buffer wraps around
+
+    in the growing mode the buffer is reallocated when it is full,
+    views taken before that refer to the old buffer
+    """
+
+    def __init__(self, channels, capacity=1024, ring=False, width=None):
+        """
+        Parameters
+        ------------
+        channels : list of str
+            names of the recorded channels
+        capacity : int
+            initial (or, in the ring mode, fixed) number of samples, default is 1024
+        ring : bool
+            if True, use the fixed capacity ring buffer mode, default is False
+        width : int or None
+            number of values per channel and sample, default is None (a float)
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be greater than 0')
+
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self.ring = ring
+        self.width = width
+
+        self._index = {name: i for i, name in enumerate(self.channels)}
+
+        length = 2 * self.capacity if self.ring else self.capacity
+        self._buffer = np.empty(self._buffer_shape(length), dtype=np.float64)
+
+        self._size = 0 # number of valid samples
+        self._head = 0 # next writing position (ring mode)
+
+    def _buffer_shape(self, length):
+        """
+        Parameters
+        ------------
+        length : int
+            number of samples of the buffer
+
+        Returns
+        ---------
+        shape : tuple
+        """
+        if self.width is None:
+            return (len(self.channels), length)
+
+        return (len(self.channels), length, self.width)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, values):
+        """
+        Parameters
+        ------------
+        values : array-like, shape(channels[, width])
+            one sample of every channel, the order is same as channels
+        """
+        if self.ring:
+            self._buffer[:, self._head] = values
+            self._buffer[:, self._head + self.capacity] = values
+            self._head = (self._head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            return
+
+        if self._size == self._buffer.shape[1]:
+            self._grow()
+
+        self._buffer[:, self._size] = values
+        self._size += 1
+
+    def extend(self, samples):
+        """
+        Parameters
+        ------------
+        samples : array-like, shape(channels, T[, width])
+            T samples of every channel, the order is same as channels
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+
+        if self.ring:
+            for i in range(samples.shape[1]):
+                self.append(samples[:, i])
+            return
+
+        num = samples.shape[1]
+        while self._size + num > self._buffer.shape[1]:
+            self._grow()
+
+        self._buffer[:, self._size:self._size + num] = samples
+        self._size += num
+
+    def _grow(self):
+        """
+        double the buffer size, the stored samples are copied once
+        """
+        new_buffer = np.empty(self._buffer_shape(2 * self._buffer.shape[1]), dtype=np.float64)
+        new_buffer[:, :self._size] = self._buffer[:, :self._size]
+        self._buffer = new_buffer
+        self.capacity = new_buffer.shape[1]
+
+    def _window(self):
+        """
+        Returns
+        ---------
+        window : slice
+            the valid samples of the buffer in time order
+        """
+        if self.ring and self._size == self.capacity:
+            return slice(self._head, self._head + self.capacity)
+
+        return slice(0, self._size)
+
+    def view(self, name):
+        """
+        Parameters
+        ------------
+        name : str
+            name of the channel
+
+        Returns
+        ---------
+        history : numpy.ndarray, shape(samples[, width])
+            zero-copy view of the channel in time order
+        """
+        return self._buffer[self._index[name], self._window()]
+
+    def __getitem__(self, name):
+        return self.view(name)
+
+    def as_array(self):
+        """
+        Returns
+        ---------
+        histories : numpy.ndarray, shape(channels, samples[, width])
+            zero-copy view of all channels in time order
+        """
+        return self._buffer[:, self._window()]
+
+    def clear(self):
+        """
+        drop all samples, the buffer is kept
+        """
+        self._size = 0
+        self._head = 0
@@ -0,0 +1,243 @@
+import math
+import numpy as np
+
+class ButcherTableau():
+    """
+    Butcher tableau of an embedded explicit Runge-Kutta method
+
+    Attributes
+    ------------
+    c : numpy.ndarray, shape(s, )
+        nodes
+    a : numpy.ndarray, shape(s, s)
+        Runge-Kutta matrix
+    b : numpy.ndarray, shape(s, )
+        weights of the propagated solution
+    e : numpy.ndarray, shape(s, )
+        difference between the weights of the propagated and embedded solution
+    error_order : int
+        order of the embedded (lower order) solution
+    fsal : bool
+        True if the last stage is the derivative at the new state (first same as last)
+    dense : numpy.ndarray, shape(s, q) or None
+        coefficients of the continuous extension, the state at the fraction theta of a step is
+        y + h sum_i k_i sum_j dense[i, j] theta^(j + 1), None is the cubic Hermite interpolation
+    """
+
+    def __init__(self, c, a, b, b_hat, error_order, fsal, dense=None):
+        self.c = np.array(c, dtype=np.float64)
+        self.a = np.array(a, dtype=np.float64)
+        self.b = np.array(b, dtype=np.float64)
+        self.e = self.b - np.array(b_hat, dtype=np.float64)
+        self.error_order = error_order
+        self.fsal = fsal
+        self.dense = None if dense is None else np.array(dense, dtype=np.float64)
+
+# Bogacki-Shampine 3(2), 3 derivative evaluations per step with FSAL
+BOGACKI_SHAMPINE = ButcherTableau(
+    c=[0., 1. / 2., 3. / 4., 1.],
+    a=[[0., 0., 0., 0.],
+       [1. / 2., 0., 0., 0.],
+       [0., 3. / 4., 0., 0.],
+       [2. / 9., 1. / 3., 4. / 9., 0.]],
+    b=[2. / 9., 1. / 3., 4. / 9., 0.],
+    b_hat=[7. / 24., 1. / 4., 1. / 3., 1. / 8.],
+    error_order=2, fsal=True,
+    dense=[[1., -4. / 3., 5. / 9.],
+           [0., 1., -2. / 3.],
+           [0., 4. / 3., -8. / 9.],
+           [0., -1., 1.]])
+
+# Dormand-Prince 5(4), 6 derivative evaluations per step with FSAL
+DORMAND_PRINCE = ButcherTableau(
+    c=[0., 1. / 5., 3. / 10., 4. / 5., 8. / 9., 1., 1.],
+    a=[[0., 0., 0., 0., 0., 0., 0.],
+       [1. / 5., 0., 0., 0., 0., 0., 0.],
+       [3. / 40., 9. / 40., 0., 0., 0., 0., 0.],
+       [44. / 45., -56. / 15., 32. / 9., 0., 0., 0., 0.],
+       [19372. / 6561., -25360. / 2187., 64448. / 6561., -212. / 729., 0., 0., 0.],
+       [9017. / 3168., -355. / 33., 46732. / 5247., 49. / 176., -5103. / 18656., 0., 0.],
+       [35. / 384., 0., 500. / 1113., 125. / 192., -2187. / 6784., 11. / 84., 0.]],
+    b=[35. / 384., 0., 500. / 1113., 125. / 192., -2187. / 6784., 11. / 84., 0.],
+    b_hat=[5179. / 57600., 0., 7571. / 16695., 393. / 640., -92097. / 339200., 187. / 2100., 1. / 40.],
+    error_order=4, fsal=True,
+    # 4th order continuous extension of Dormand and Prince (Hairer, Norsett and Wanner)
+    dense=[[1., -8048581381. / 2820520608., 8663915743. / 2820520608., -12715105075. / 11282082432.],
+           [0., 0., 0., 0.],
+           [0., 131558114200. / 32700410799., -68118460800. / 10900136933., 87487479700. / 32700410799.],
+           [0., -1754552775. / 470086768., 14199869525. / 1410260304., -10690763975. / 1880347072.],
+           [0., 127303824393. / 49829197408., -318862633887. / 49829197408., 701980252875. / 199316789632.],
+           [0., -282668133. / 205662961., 2019193451. / 616988883., -1453857185. / 822651844.],
+           [0., 40617522. / 29380423., -110615467. / 29380423., 69997945. / 29380423.]])
+
+TABLEAUS = {"bs23": BOGACKI_SHAMPINE, "dopri5": DORMAND_PRINCE}
+
+def integrate_adaptive(func, y, duration, h, tableau, rtol=1e-6, atol=1e-8, min_step=1e-10, k0=None,
+                       num_samples=1):
+    """
+    Integrate dy/dt = func(y) over the duration by an embedded Runge-Kutta method
+
+    Parameters
+    -------
+    func : callable
+        func(y) returns the derivative, numpy.ndarray, shape(n, )
+    y : numpy.ndarray, shape(n, )
+        initial state
+    duration : float in seconds
+        integration time, the last step is shortened to end exactly on it
+    h : float in seconds
+        initial step size, e.g. the last accepted step size of the previous call
+    tableau : ButcherTableau class
+    rtol : float
+        relative tolerance, default is 1e-6
+    atol : float
+        absolute tolerance, default is 1e-8
+    min_step : float in seconds
+        minimum step size, default is 1e-10
+    k0 : numpy.ndarray, shape(n, ), optional
+        derivative at the initial state, e.g. the last derivative of the previous call
+        with the same input, default is None (evaluated)
+    num_samples : int
+        number of the samples at the equally divided times of the duration, default is 1
+
+    Returns
+    -------
+    ys : numpy.ndarray, shape(num_samples, n)
+        states at the sample times, the last one is the state after the duration
+    h : float in seconds
+        proposed step size of the next call
+    num_evals : int
+        number of the derivative evaluations
+    num_rejected : int
+        number of the rejected steps
+    k_last : numpy.ndarray, shape(n, )
+        derivative at the returned state
+
+    Notes
+    -------
+    the step size is controlled by the mixed absolute and relative error (RMS norm),
+    the input of the system should be constant over the duration
+    the steps are not limited by the sample times, the samples inside a step are
+    given by the continuous extension (dense output) of the tableau, which uses the stages
+    of the step and has the order of the embedded solution, so the samples keep the tolerance,
+    the tableaus without it use the cubic Hermite polynomial of the states and derivatives at both ends
+    """
+    num_stages = len(tableau.c)
+    exponent = -1. / (tableau.error_order + 1.)
+
+    sample_times = duration * np.arange(1, num_samples + 1) / num_samples
+    ys = np.empty((num_samples, ) + y.shape)
+    sample_index = 0
+
+    t = 0.0
+    h = min(h, duration)
+    num_evals = 0
+    num_rejected = 0
+
+    k = np.empty((num_stages, ) + y.shape)
+
+    if k0 is None:
+        k[0] = func(y)
+        num_evals += 1
+    else:
+        k[0] = k0
+
+    while t < duration:
+        # the last step ends on the duration, does not change the proposed step size
+        last_step = t + h >= duration * (1. - 1e-12)
+        step = duration - t if last_step else h
+
+        for i in range(1, num_stages):
+            k[i] = func(y + step * np.dot(tableau.a[i, :i], k[:i]))
+        num_evals += num_stages - 1
+
+        y_new = y + step * np.dot(tableau.b, k)
+        error = step * np.dot(tableau.e, k)
+
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        error_norm = math.sqrt(np.mean((error / scale)**2))
+
+        if error_norm <= 1.0 or step <= min_step:
+            t_new = duration if last_step else t + step
+
+            if tableau.fsal:
+                k_new = k[-1].copy()
+            else:
+                k_new = func(y_new)
+                num_evals += 1
+
+            while sample_index < num_samples and sample_times[sample_index] <= t_new * (1. + 1e-12):
+                if sample_index == num_samples - 1 and last_step:
+                    ys[sample_index] = y_new
+                elif tableau.dense is not None and tableau.fsal:
+                    ys[sample_index] = _dense(y, k, tableau.dense, step, sample_times[sample_index] - t)
+                else:
+                    ys[sample_index] = _hermite(y, y_new, k[0], k_new, step, sample_times[sample_index] - t)
+                sample_index += 1
+
+            t = t_new
+            y = y_new
+            k[0] = k_new
+
+            factor = 5.0 if error_norm == 0.0 else min(5.0, max(0.2, 0.9 * error_norm**exponent))
+            if not last_step or factor < 1.0:
+                h = step * factor
+        else:
+            num_rejected += 1
+            h = max(min_step, step * max(0.2, 0.9 * error_norm**exponent))
+
+    return ys, h, num_evals, num_rejected, k[0].copy()
+
+def _dense(y0, k, dense, step, s):
+    """
+    continuous extension of the tableau inside a step
+
+    Parameters
+    -------
+    y0 : numpy.ndarray
+        state at the start of the step
+    k : numpy.ndarray, shape(stages, n)
+        stages of the step, the last one is the derivative at the end of the step
+    dense : numpy.ndarray, shape(stages, q)
+        coefficients of the continuous extension
+    step : float in seconds
+    s : float in seconds
+        time from the start of the step
+
+    Returns
+    -------
+    y : numpy.ndarray
+        interpolated state
+    """
+    theta = min(max(s / step, 0.0), 1.0)
+    powers = np.cumprod(np.full(dense.shape[1], theta))
+
+    return y0 + step * np.dot(np.dot(dense, powers), k)
+
+def _hermite(y0, y1, f0, f1, step, s):
+    """
+    cubic Hermite interpolation inside a step
+
+    Parameters
+    -------
+    y0, y1 : numpy.ndarray
+        states at the start and the end of the step
+    f0, f1 : numpy.ndarray
+        derivatives at the start and the end of the step
+    step : float in seconds
+    s : float in seconds
+        time from the start of the step
+
+    Returns
+    -------
+    y : numpy.ndarray
+        interpolated state
+    """
+    theta = min(max(s / step, 0.0), 1.0)
+
+    h00 = 2. * theta**3 - 3. * theta**2 + 1.
+    h10 = theta**3 - 2. * theta**2 + theta
+    h01 = -2. * theta**3 + 3. * theta**2
+    h11 = theta**3 - theta**2
+
+    return h00 * y0 + h10 * step * f0 + h01 * y1 + h11 * step * f1
@@ -0,0 +1,59 @@
+import math
+import numpy as np
+
+def calc_summary_metrics(history_z, history_th, history_input_f, dt, diverged=False,
+                         th_tolerance=0.02, z_tolerance=0.05, reference_z=0.0):
+    """
+    Calculate summary metrics of a closed loop trajectory
+
+    Parameters
+    -------
+    history_z : array-like
+        time history of cart position in meters
+    history_th : array-like
+        time history of pendulum angle in radians
+    history_input_f : array-like
+        time history of input in N
+    dt : float in seconds
+        sampling time of the histories
+    diverged : bool
+        True if the simulation was stopped by the divergence, default is False
+    th_tolerance : float in radians
+        tolerance of the settled angle, default is 0.02
+    z_tolerance : float in meters
+        tolerance of the settled cart position, default is 0.05
+    reference_z : float or array-like in meters
+        settled cart position or its time history, default is 0.0
+
+    Returns
+    -------
+    metrics : dict
+        settling_time : float in seconds, nan if not settled
+        max_abs_z : float in meters
+        control_effort : float in N^2 s, integral of the squared input
+        success : bool, True if settled and not diverged
+    """
+    zs = np.asarray(history_z, dtype=np.float64)
+    ths = np.asarray(history_th, dtype=np.float64)
+    fs = np.asarray(history_input_f, dtype=np.float64)
+
+    outside = (np.abs(ths) > th_tolerance) | (np.abs(zs - reference_z) > z_tolerance) | ~np.isfinite(zs)
+    outside_indices = np.flatnonzero(outside)
+
+    if diverged or len(zs) == 0:
+        settling_time = math.nan
+    elif len(outside_indices) == 0:
+        settling_time = 0.0
+    elif outside_indices[-1] == len(zs) - 1:
+        settling_time = math.nan # still moving at the end
+    else:
+        settling_time = (outside_indices[-1] + 1) * dt
+
+    metrics = {
+        "settling_time": settling_time,
+        "max_abs_z": float(np.max(np.abs(zs))) if len(zs) else math.nan,
+        "control_effort": float(np.sum(fs**2) * dt),
+        "success": (not diverged) and not math.isnan(settling_time),
+    }
+
+    return metrics
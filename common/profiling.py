@@ -0,0 +1,233 @@
+import functools
+import json
+import os
+import threading
+import time
+
+class Profiler():
+    """
+    named timers and counters of a run
+
+    Attributes
+    ------------
+    enabled : bool
+        if False, the sections and counters do nothing
+    trace : bool
+        if True, every timed section is kept as an event of the trace file
+    timers : dict
+        name : [count, total, max] of the timed sections in seconds
+    counters : dict
+        name : accumulated value of the counters
+    events : list of tuple
+        (name, start, end, thread id) of the timed sections
+
+    Notes
+    --------
+    the profiler is enabled by the flag of main.py (--profile) or the environment variable PENDULUM_PROFILE=1
+    each process has its own profiler, worker processes of the campaign are not collected
+    the trace file is the chrome trace event format, which is loaded by chrome://tracing or Perfetto
+    """
+
+    def __init__(self, enabled=False, trace=True, max_events=1000000):
+        """
+        Parameters
+        ------------
+        enabled : bool
+            default is False
+        trace : bool
+            keep the events for the trace file, default is True
+        max_events : int
+            the events after this number are not kept, the timers are still updated, default is 1000000
+        """
+        self.enabled = enabled
+        self.trace = trace
+        self.max_events = max_events
+
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def enable(self, enabled=True, trace=True):
+        """
+        Parameters
+        ------------
+        enabled : bool
+        trace : bool
+            keep the events for the trace file, default is True
+        """
+        self.enabled = enabled
+        self.trace = trace
+
+    def section(self, name):
+        """
+        Parameters
+        ------------
+        name : str
+            name of the timer
+
+        Returns
+        ---------
+        section : context manager
+            times the block when the profiler is enabled
+        """
+        if not self.enabled:
+            return _NULL_SECTION
+
+        return _Section(self, name)
+
+    def count(self, name, value=1):
+        """
+        Parameters
+        ------------
+        name : str
+            name of the counter
+        value : int or float
+            added to the counter, default is 1
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name, start, end):
+        """
+        Parameters
+        ------------
+        name : str
+            name of the timer
+        start : float in seconds
+            time.perf_counter() at the start of the section
+        end : float in seconds
+            time.perf_counter() at the end of the section
+        """
+        elapsed = end - start
+        timer = self.timers.get(name)
+
+        if timer is None:
+            self.timers[name] = [1, elapsed, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+            if elapsed > timer[2]:
+                timer[2] = elapsed
+
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def summary(self):
+        """
+        Returns
+        ---------
+        summary : dict
+            name : {count, total, mean, max} of each timer in seconds, and the counters
+        """
+        summary = {}
+
+        for name, (count, total, maximum) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            summary[name] = {"count": count, "total": total, "mean": total / count, "max": maximum}
+
+        for name, value in sorted(self.counters.items()):
+            summary[name] = {"count": value}
+
+        return summary
+
+    def report(self):
+        """
+        Returns
+        ---------
+        report : str
+            table of the timers sorted by the total time, and the counters
+        """
+        lines = ["{0:<32} {1:>10} {2:>12} {3:>12} {4:>12}".format("timer", "count", "total [ms]",
+                                                                  "mean [us]", "max [us]")]
+
+        for name, (count, total, maximum) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            lines.append("{0:<32} {1:>10} {2:>12.3f} {3:>12.3f} {4:>12.3f}".format(
+                name, count, total * 1e3, total / count * 1e6, maximum * 1e6))
+
+        for name, value in sorted(self.counters.items()):
+            lines.append("{0:<32} {1:>10}".format(name, value))
+
+        return "\n".join(lines)
+
+    def save_trace(self, path):
+        """
+        Parameters
+        ------------
+        path : str
+            path of the trace file (.json)
+        """
+        pid = os.getpid()
+
+        events = [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6}
+                  for name, start, end, tid in self.events]
+
+        end = max([event["ts"] + event["dur"] for event in events] or [0.0])
+        events.extend({"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": end, "args": {"value": value}}
+                      for name, value in self.counters.items())
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+class _Section():
+    """timed block of the enabled profiler
+    """
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+class _NullSection():
+    """block of the disabled profiler, does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+_NULL_SECTION = _NullSection()
+
+# profiler of this process
+profiler = Profiler(enabled=os.environ.get("PENDULUM_PROFILE", "0") not in ("", "0"))
+
+def profiled(name):
+    """decorator timing every call of the function as the named section
+
+    Parameters
+    ------------
+    name : str
+        name of the timer
+
+    Notes
+    --------
+    when the profiler is disabled, the call costs one attribute check
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, start, time.perf_counter())
+
+        return wrapper
+
+    return decorator
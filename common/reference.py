@@ -0,0 +1,336 @@
+import inspect
+import math
+import numpy as np
+
+class Reference():
+    """
+    precomputed reference of cart position
+
+    Attributes
+    ------------
+    dt : float in seconds
+        sampling time of the samples
+    z : numpy.ndarray, shape(steps + 1, )
+        reference of cart position at t = k dt in meters
+    v_z : numpy.ndarray, shape(steps + 1, )
+        reference of cart velocity in m/s
+    a_z : numpy.ndarray, shape(steps + 1, )
+        reference of cart acceleration in m/s^2, used by the feedforward
+
+    Notes
+    --------
+    the samples out of the range are held at the last sample (at rest)
+    """
+
+    def __init__(self, z, v_z, a_z, dt):
+        self.z = np.asarray(z, dtype=np.float64)
+        self.v_z = np.asarray(v_z, dtype=np.float64)
+        self.a_z = np.asarray(a_z, dtype=np.float64)
+        self.dt = dt
+
+    def __len__(self):
+        return len(self.z)
+
+    def at(self, step):
+        """
+        Parameters
+        ------------
+        step : int
+
+        Returns
+        ---------
+        sample : tuple of float
+            (z, v_z, a_z) of the step
+        """
+        if step >= len(self.z):
+            return float(self.z[-1]), 0.0, 0.0
+
+        return float(self.z[step]), float(self.v_z[step]), float(self.a_z[step])
+
+def _times(steps, dt):
+    return np.arange(steps + 1) * dt
+
+def step_reference(steps, dt, amplitude=0.5, start_time=1.0):
+    """
+    Parameters
+    ------------
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    amplitude : float in meters
+        position after the step, default is 0.5
+    start_time : float in seconds
+        time of the step, default is 1.0
+
+    Returns
+    ---------
+    reference : Reference class
+        the velocity and acceleration are zero, the step is not feedforwarded
+    """
+    times = _times(steps, dt)
+    z = np.where(times >= start_time, amplitude, 0.0)
+
+    return Reference(z, np.zeros_like(z), np.zeros_like(z), dt)
+
+def sine_reference(steps, dt, amplitude=0.2, period=10.0, phase=0.0):
+    """
+    Parameters
+    ------------
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    amplitude : float in meters
+        default is 0.2
+    period : float in seconds
+        default is 10.0
+    phase : float in radians
+        default is 0.0
+
+    Returns
+    ---------
+    reference : Reference class
+    """
+    omega = 2. * math.pi / period
+    angles = omega * _times(steps, dt) + phase
+
+    return Reference(amplitude * np.sin(angles), amplitude * omega * np.cos(angles),
+                     - amplitude * omega**2 * np.sin(angles), dt)
+
+def ramp_reference(steps, dt, slope=0.1, start_time=1.0, end_time=None):
+    """
+    Parameters
+    ------------
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    slope : float in m/s
+        default is 0.1
+    start_time : float in seconds
+        default is 1.0
+    end_time : float in seconds, optional
+        the position is held after it, default is None (the end of the simulation)
+
+    Returns
+    ---------
+    reference : Reference class
+        the acceleration at the corners is not feedforwarded
+    """
+    times = _times(steps, dt)
+    end_time = times[-1] if end_time is None else end_time
+
+    moving = (times >= start_time) & (times < end_time)
+    z = slope * (np.clip(times, start_time, end_time) - start_time)
+
+    return Reference(z, np.where(moving, slope, 0.0), np.zeros_like(z), dt)
+
+def spline_reference(steps, dt, waypoints):
+    """
+    Parameters
+    ------------
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    waypoints : array-like, shape(N, 2)
+        (time, z) of the waypoints, N >= 2, the cart is at rest at the first and last ones
+
+    Returns
+    ---------
+    reference : Reference class
+        the clamped cubic spline through the waypoints, scipy is imported at the call
+    """
+    from scipy.interpolate import CubicSpline
+
+    waypoints = np.asarray(waypoints, dtype=np.float64)
+    if waypoints.ndim != 2 or waypoints.shape[0] < 2 or waypoints.shape[1] != 2:
+        raise ValueError("waypoints should be pairs of (time, z), at least 2")
+
+    spline = CubicSpline(waypoints[:, 0], waypoints[:, 1], bc_type="clamped")
+    times = np.clip(_times(steps, dt), waypoints[0, 0], waypoints[-1, 0])
+    inside = (_times(steps, dt) >= waypoints[0, 0]) & (_times(steps, dt) <= waypoints[-1, 0])
+
+    return Reference(spline(times), np.where(inside, spline(times, 1), 0.0),
+                     np.where(inside, spline(times, 2), 0.0), dt)
+
+def file_reference(steps, dt, path):
+    """
+    Parameters
+    ------------
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    path : str
+        .npy or text (comma or white space separated) file of the columns (time, z)
+
+    Returns
+    ---------
+    reference : Reference class
+        z is linearly interpolated on the sampling times,
+        the velocity and acceleration are the central differences
+    """
+    if path.endswith(".npy"):
+        table = np.load(path)
+    else:
+        with open(path) as f:
+            delimiter = "," if "," in f.readline() else None
+        table = np.loadtxt(path, delimiter=delimiter, ndmin=2)
+
+    z = np.interp(_times(steps, dt), table[:, 0], table[:, 1])
+    v_z = np.gradient(z, dt)
+
+    return Reference(z, v_z, np.gradient(v_z, dt), dt)
+
+# name : generator(steps, dt, **params)
+REFERENCES = {
+    "step": step_reference,
+    "sine": sine_reference,
+    "ramp": ramp_reference,
+    "spline": spline_reference,
+    "file": file_reference,
+}
+
+def check_reference_params(name, params):
+    """
+    Parameters
+    ------------
+    name : str
+        "step", "sine", "ramp", "spline" or "file"
+    params : dict
+        parameters of the generator
+
+    Raises
+    --------
+    ValueError
+        if the name is unknown, a required parameter is missing or a parameter is unknown
+    """
+    if name not in REFERENCES:
+        raise ValueError("reference should be chosen from {0}".format(", ".join(REFERENCES)))
+
+    arguments = list(inspect.signature(REFERENCES[name]).parameters.values())[2:] # after steps and dt
+
+    required = [argument.name for argument in arguments if argument.default is inspect.Parameter.empty]
+    missing = [key for key in required if key not in params]
+    if missing:
+        raise ValueError("reference {0} requires the parameters {1}".format(name, ", ".join(missing)))
+
+    unknown = sorted(set(params) - set(argument.name for argument in arguments))
+    if unknown:
+        raise ValueError("unknown parameters of reference {0} : {1}".format(name, ", ".join(unknown)))
+
+def make_reference(name, steps, dt, **params):
+    """
+    Parameters
+    ------------
+    name : str
+        "step", "sine", "ramp", "spline" or "file"
+    steps : int
+        number of the simulation steps
+    dt : float in seconds
+        sampling time
+    params : dict
+        parameters of the generator
+
+    Returns
+    ---------
+    reference : Reference class
+    """
+    check_reference_params(name, params)
+
+    return REFERENCES[name](steps, dt, **params)
+
+class Feedforward():
+    """
+    static feedforward of the cart reference on the linearized motion equation
+
+    Notes
+    --------
+    for the reference velocity v and acceleration a of the cart with v_th = 0,
+    the angle th_ref and the input f_ff which give d v_z / dt = a and d v_th / dt = 0 solve
+
+        [a, 0] = A[2:, 1] th_ref + A[2:, 2] v + B[2:] f_ff
+
+    the controllers feed back x - [z_ref, th_ref, v, 0] and add f_ff,
+    so the cart follows a moving reference without the lag of the pure feedback
+    """
+
+    def __init__(self, A, B):
+        """
+        Parameters
+        ------------
+        A : numpy.ndarray, shape(4, 4)
+            Matrix A of the linearized state equation
+        B : numpy.ndarray, shape(4, 1)
+            Matrix B of the linearized state equation
+        """
+        self._inverse = np.linalg.inv(np.array([[A[2, 1], B[2, 0]],
+                                                [A[3, 1], B[3, 0]]]))
+        self._velocity = np.array([A[2, 2], A[3, 2]])
+
+    def __call__(self, v_z, a_z):
+        """
+        Parameters
+        ------------
+        v_z : float in m/s
+            reference of cart velocity
+        a_z : float in m/s^2
+            reference of cart acceleration
+
+        Returns
+        ---------
+        th_ref : float in radians
+        f_ff : float in N
+        """
+        th_ref, f_ff = np.dot(self._inverse, np.array([a_z, 0.0]) - self._velocity * v_z)
+
+        return float(th_ref), float(f_ff)
+
+    def reference_state(self, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        Parameters
+        ------------
+        reference_z : float in meters, optional
+        reference_v_z : float in m/s, optional
+        reference_a_z : float in m/s^2, optional
+            None is 0.0
+
+        Returns
+        ---------
+        x_ref : numpy.ndarray, shape(4, )
+            [z_ref, th_ref, v_ref, 0]
+        f_ff : float in N
+        """
+        reference_v_z = 0.0 if reference_v_z is None else reference_v_z
+        th_ref, f_ff = self(reference_v_z, 0.0 if reference_a_z is None else reference_a_z)
+
+        return np.array([0.0 if reference_z is None else reference_z, th_ref, reference_v_z, 0.0]), f_ff
+
+    def reference_states(self, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        reference_state of many systems
+
+        Parameters
+        ------------
+        reference_z : float or numpy.ndarray, shape(N, ) in meters, optional
+        reference_v_z : float or numpy.ndarray, shape(N, ) in m/s, optional
+        reference_a_z : float or numpy.ndarray, shape(N, ) in m/s^2, optional
+            None is 0.0
+
+        Returns
+        ---------
+        x_ref : numpy.ndarray, shape(4, ) or shape(N, 4)
+            [z_ref, th_ref, v_ref, 0] of each system
+        f_ff : float or numpy.ndarray, shape(N, ) in N
+        """
+        z = np.asarray(0.0 if reference_z is None else reference_z, dtype=np.float64)
+        v = np.asarray(0.0 if reference_v_z is None else reference_v_z, dtype=np.float64)
+        a = np.asarray(0.0 if reference_a_z is None else reference_a_z, dtype=np.float64)
+
+        rhs = (a - self._velocity[0] * v, - self._velocity[1] * v)
+        th_ref = self._inverse[0, 0] * rhs[0] + self._inverse[0, 1] * rhs[1]
+        f_ff = self._inverse[1, 0] * rhs[0] + self._inverse[1, 1] * rhs[1]
+
+        return np.stack(np.broadcast_arrays(z, th_ref, v, np.zeros_like(z)), axis=-1), f_ff
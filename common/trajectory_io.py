@@ -0,0 +1,262 @@
+import json
+import struct
+import numpy as np
+
+MAGIC = b"PNDTRAJ1"
+ALIGNMENT = 64 # bytes, every column starts on this boundary
+
+# parameters of the pendulum stored in the metadata
+PENDULUM_PARAMS = ["p_m", "p_l", "p_j", "p_mu", "c_m", "c_mu", "c_width", "c_height", "c_wheel_size", "g"]
+
+class TrajectoryWriter():
+    """
+    create a trajectory file and fill its columns in place
+
+    Attributes
+    ------------
+    path : str
+    columns : dict of numpy.memmap
+        writable views of the columns in the file
+
+    Notes
+    --------
+    the file is laid out as
+
+        MAGIC (8 bytes) | header length (uint64, little endian) | json header | columns
+
+    every column is a C-contiguous little endian array aligned to 64 bytes,
+    the header has the name, dtype, shape and offset of each column and the metadata
+    the columns are allocated when the file is created, so large campaign outputs
+    can be written piece by piece without keeping them in memory
+    """
+
+    def __init__(self, path, specs, metadata=None):
+        """
+        Parameters
+        ------------
+        path : str
+            path of the file
+        specs : dict
+            name : (shape, dtype) of each column
+        metadata : dict, optional
+            json serializable information of the trajectory
+        """
+        self.path = path
+
+        header = {"version": 1, "metadata": metadata or {}, "columns": []}
+
+        # the offsets depend on the header length, fix it by iterating
+        header_size = 0
+        while True:
+            offset = _align(len(MAGIC) + 8 + header_size)
+            header["columns"] = []
+
+            for name, (shape, dtype) in specs.items():
+                dtype = np.dtype(dtype).newbyteorder("<")
+                shape = [int(size) for size in (shape if isinstance(shape, (tuple, list)) else (shape, ))]
+                header["columns"].append({"name": name, "dtype": dtype.str, "shape": shape, "offset": offset})
+                offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+
+            encoded = json.dumps(header).encode()
+            if len(encoded) == header_size:
+                break
+            header_size = len(encoded)
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(encoded)
+            f.truncate(offset)
+
+        self.columns = {}
+        for column in header["columns"]:
+            self.columns[column["name"]] = np.memmap(path, dtype=column["dtype"], mode="r+",
+                                                     offset=column["offset"], shape=tuple(column["shape"]))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+
+    def close(self):
+        self.flush()
+        self.columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TrajectoryFile():
+    """
+    read a trajectory file by memory mapping
+
+    Attributes
+    ------------
+    path : str
+    metadata : dict
+    names : list of str
+        names of the columns
+
+    Notes
+    --------
+    each column is returned as a read-only numpy.memmap,
+    slicing it only reads the touched pages of the file
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ------------
+        path : str
+            path of the file
+        """
+        self.path = path
+
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{0} is not a trajectory file".format(path))
+            header_size, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size).decode())
+
+        self.metadata = header["metadata"]
+        self._columns = {column["name"]: column for column in header["columns"]}
+        self.names = list(self._columns)
+
+        self._cache = {}
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        """
+        Parameters
+        ------------
+        name : str
+
+        Returns
+        ---------
+        column : numpy.memmap
+        """
+        if name not in self._cache:
+            column = self._columns[name]
+            self._cache[name] = np.memmap(self.path, dtype=column["dtype"], mode="r",
+                                          offset=column["offset"], shape=tuple(column["shape"]))
+
+        return self._cache[name]
+
+class TrajectoryPendulum():
+    """
+    pendulum loaded from a trajectory file, used by FigDrawer and AnimDrawer
+
+    Attributes
+    ------------
+    history_z, history_th, history_v_z, history_v_th, history_input_f : numpy.memmap
+        time histories of the run
+    history_time : numpy.memmap
+        time of each sample in seconds
+    history_reference_z : numpy.memmap or None
+        reference of cart position
+    history_error_z : numpy.memmap or None
+        tracking error z - reference_z
+    K : numpy.ndarray or None
+        feedback gain of the controller
+    dt : float in seconds
+        sampling time
+    metadata : dict
+    """
+
+    def __init__(self, trajectory):
+        """
+        Parameters
+        ------------
+        trajectory : TrajectoryFile class
+        """
+        self.metadata = trajectory.metadata
+
+        for key in PENDULUM_PARAMS:
+            setattr(self, key, self.metadata["params"][key])
+
+        self.dt = self.metadata["dt"]
+
+        self.history_time = trajectory["time"]
+        self.history_z = trajectory["z"]
+        self.history_th = trajectory["th"]
+        self.history_v_z = trajectory["v_z"]
+        self.history_v_th = trajectory["v_th"]
+        self.history_input_f = trajectory["input_f"]
+
+        self.history_reference_z = trajectory["reference_z"] if "reference_z" in trajectory else None
+        self.history_error_z = trajectory["error_z"] if "error_z" in trajectory else None
+        self.K = np.array(trajectory["K"]) if "K" in trajectory else None
+
+        if len(self.history_z) == 0:
+            raise ValueError("{0} has no samples".format(trajectory.path))
+
+        self.z, self.th, self.v_z, self.v_th = (float(self.history_z[-1]), float(self.history_th[-1]),
+                                                float(self.history_v_z[-1]), float(self.history_v_th[-1]))
+
+def save_pendulum_trajectory(path, pendulum, dt, controller=None, reference_z=None, metadata=None):
+    """
+    Parameters
+    ------------
+    path : str
+        path of the file
+    pendulum : SinglePendulumWithCart class
+    dt : float in seconds
+        sampling time of the histories
+    controller : controller class, optional
+        its feedback gain K is saved if it has
+    reference_z : array-like, optional
+        time history of the reference of cart position,
+        default is the history of the pendulum if it records the reference
+    metadata : dict, optional
+        additional information, e.g. name of the scenario
+    """
+    num_samples = len(pendulum.history_z)
+    if num_samples == 0:
+        raise ValueError("the pendulum has no history to save")
+
+    columns = {"time": np.arange(1, num_samples + 1) * dt,
+               "z": pendulum.history_z, "th": pendulum.history_th,
+               "v_z": pendulum.history_v_z, "v_th": pendulum.history_v_th,
+               "input_f": pendulum.history_input_f}
+
+    if reference_z is None:
+        reference_z = getattr(pendulum, "history_reference_z", None)
+
+    if reference_z is not None:
+        columns["reference_z"] = np.asarray(reference_z, dtype=np.float64)
+        columns["error_z"] = columns["z"] - columns["reference_z"]
+
+    if controller is not None and getattr(controller, "K", None) is not None:
+        columns["K"] = np.asarray(controller.K, dtype=np.float64)
+
+    info = {"dt": dt, "params": {key: float(getattr(pendulum, key)) for key in PENDULUM_PARAMS},
+            "controller": None if controller is None else type(controller).__name__}
+    info.update(metadata or {})
+
+    specs = {name: (np.shape(value), np.float64) for name, value in columns.items()}
+
+    with TrajectoryWriter(path, specs, metadata=info) as writer:
+        for name, value in columns.items():
+            writer[name][...] = value
+
+def load_pendulum_trajectory(path):
+    """
+    Parameters
+    ------------
+    path : str
+        path of the file saved by save_pendulum_trajectory
+
+    Returns
+    ---------
+    pendulum : TrajectoryPendulum class
+    """
+    return TrajectoryPendulum(TrajectoryFile(path))
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
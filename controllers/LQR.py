@@ -1,6 +1,11 @@
 import math
 import numpy as np
-from control.matlab import lqr
+from controllers.riccati import lqr, dlqr
+
+from controllers.gain_cache import GainCache, default_gain_cache
+from common.dynamics import CartPoleDynamics
+from common.reference import Feedforward
+from common.profiling import profiled, profiler
 
 class LQR():
     """
@@ -17,55 +22,88 @@ class LQR():
         Matrix R of evaluation function 
     Q : numpy.ndarray
         Matrix R of evaluation function 
+    K : numpy.ndarray
+        feedback gain
+    P : numpy.ndarray
+        solution of the Riccati equation
+    e : numpy.ndarray
+        closed loop eigenvalues
+    dt : float or None
+        sampling time of the discrete time LQR, None is the continuous time LQR
+    Ad : numpy.ndarray or None
+        Matrix A of the zero order hold discretized state equation
+    Bd : numpy.ndarray or None
+        Matrix B of the zero order hold discretized state equation
+    feedforward : Feedforward class
+        angle and input of the cart reference velocity and acceleration
     
     Notes
     ---------
     this control method is calculated by the LQR methods 
     the state vector x is [z, th, v_z, v_th]
+
+    the solution (K, P, e) is shared through the gain cache,
+    controllers with the same plant parameters and weights skip the Riccati solve
     """
 
-    def __init__(self, pendulum):
+    def __init__(self, pendulum, Q=None, R=None, cache=default_gain_cache, dt=None):
+        """
+        Parameters
+        ------------
+        pendulum : SinglePendulumWithCart class
+        Q : array-like, optional
+            Matrix Q of evaluation function, default is diag(10, 10, 10, 10)
+        R : float, optional
+            Matrix R of evaluation function, default is 100.0
+        cache : GainCache class or None, optional
+            cache of the solutions, default is the shared cache of the process
+            if None, the Riccati equation is always solved
+        dt : float in seconds, optional
+            if given, the gain is the discrete time LQR of the exactly discretized system,
+            which is optimal for the input held over dt, default is None (continuous time)
+        """
         # controllers
 
-        alpha_0 = pendulum.p_j * (pendulum.p_m + pendulum.c_m) + pendulum.c_m * pendulum.p_m * (pendulum.p_l**2)
-        inerter_mass = pendulum.p_j + pendulum.p_m * (pendulum.p_l**2) 
-        mass = pendulum.p_m + pendulum.c_m
-        
-        self.A = np.array([[0.0, 0.0, 1.0, 0.0], 
-                           [0.0, 0.0, 0.0, 1.0],
-                           [0.0, 0.0, 0.0, 0.0],
-                           [0.0, 0.0, 0.0, 0.0]])
-
-        self.A[2, 1] = - (pendulum.p_m**2) * (pendulum.p_l**2) * pendulum.g / alpha_0
-        self.A[2, 2] = - pendulum.c_mu * inerter_mass / alpha_0
-        self.A[2, 3] = pendulum.p_mu * pendulum.p_m * pendulum.p_l / alpha_0
-
-        self.A[3, 1] = mass * pendulum.p_m * pendulum.p_l * pendulum.g / alpha_0
-        self.A[3, 2] = pendulum.c_mu * pendulum.p_m * pendulum.p_l / alpha_0
-        self.A[3, 3] = - pendulum.p_mu * mass / alpha_0
-
-        self.B = np.array([[0.0], 
-                           [0.0],
-                           [0.0],
-                           [0.0]])
-
-        self.B[2, 0] = inerter_mass / alpha_0
-        self.B[3, 0] = -pendulum.p_m * pendulum.p_l / alpha_0
+        self.A, self.B = CartPoleDynamics.from_pendulum(pendulum).linearize()
         
         self.C = np.array([[1.0, 0.0, 0.0, 0.0], 
                            [0.0, 1.0, 0.0, 0.0]])
 
-        self.R = 100.0
+        self.R = 100.0 if R is None else R
+
+        self.Q = np.diag([10, 10, 10, 10]) if Q is None else np.array(Q)
+
+        self.feedforward = Feedforward(self.A, self.B)
 
-        self.Q = np.diag([10, 10, 10, 10])
+        self.dt = dt
+        self.Ad = None
+        self.Bd = None
 
-        self.K, self.P, self.e = lqr(self.A, self.B, self.Q, self.R)
+        if dt is None:
+            solve = lambda: lqr(self.A, self.B, self.Q, self.R)
+        else:
+            self.Ad, self.Bd = CartPoleDynamics.from_pendulum(pendulum).discretize(dt)
+            solve = lambda: dlqr(self.Ad, self.Bd, self.Q, self.R)
 
-    def calc_input(self, pendulum, reference_z=None):
+        with profiler.section("LQR.design"):
+            if cache is None:
+                self.K, self.P, self.e = solve()
+            else:
+                key = GainCache.make_key(pendulum, self.Q, self.R, dt=dt)
+                self.K, self.P, self.e = cache.get_or_solve(key, solve)
+
+    @profiled("LQR.calc_input")
+    def calc_input(self, pendulum, reference_z=None, reference_v_z=None, reference_a_z=None):
         """
         Parameters
         -------------
         pendulum : pendulum class
+        reference_z : float, optional
+            reference of cart position
+        reference_v_z : float, optional
+            reference of cart velocity
+        reference_a_z : float, optional
+            reference of cart acceleration
 
         Returns
         ----------
@@ -74,9 +112,42 @@ class LQR():
         """
         
         state = np.array([[pendulum.z], [pendulum.th], [pendulum.v_z], [pendulum.v_th]])
-        f = - np.dot(self.K, state)
+
+        if reference_z is None and reference_v_z is None and reference_a_z is None:
+            return - np.dot(self.K, state)
+
+        x_ref, f_ff = self.feedforward.reference_state(reference_z, reference_v_z, reference_a_z)
+        f = - np.dot(self.K, state - x_ref[:, np.newaxis]) + f_ff
 
         return f
         
 
+    @profiled("LQR.calc_inputs")
+    def calc_inputs(self, pendulum, states=None, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        Parameters
+        -------------
+        pendulum : BatchSinglePendulumWithCart class
+        states : numpy.ndarray, shape(N, 4), optional
+            each row is [z, th, v_z, v_th], default is the states of pendulum
+        reference_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart position
+        reference_v_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart velocity
+        reference_a_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart acceleration
+
+        Returns
+        ----------
+        f : numpy.ndarray, shape(N, ) in [N]
+            inputs of the systems, same as calc_input of each state
+        """
+        if states is None:
+            states = pendulum.states
+
+        if reference_z is None and reference_v_z is None and reference_a_z is None:
+            return - np.dot(states, self.K[0])
+
+        x_ref, f_ff = self.feedforward.reference_states(reference_z, reference_v_z, reference_a_z)
 
+        return - np.dot(states - x_ref, self.K[0]) + f_ff
@@ -0,0 +1,417 @@
+import math
+import numpy as np
+from controllers.riccati import dlqr
+
+from common.dynamics import CartPoleDynamics
+from common.profiling import profiled
+
+class MPC():
+    """
+    Attributes
+    ------------
+    Ad : numpy.ndarray
+        Matrix A of the zero order hold discretized state equation
+    Bd : numpy.ndarray
+        Matrix B of the zero order hold discretized state equation
+    R : float
+        weight of the input
+    Q : numpy.ndarray
+        Matrix Q of evaluation function
+    P : numpy.ndarray
+        terminal weight, solution of the discrete Riccati equation
+    K : numpy.ndarray
+        discrete time LQR gain, the unconstrained MPC input is same as it
+    horizon : int
+        number of the predicted steps
+    dt : float in seconds
+        sampling time of the prediction
+    input_limit : float in N or None
+        bound of |f|
+    z_limit : float in meters or None
+        bound of |z| over the horizon
+    U : numpy.ndarray, shape(horizon, )
+        planned inputs of the last step
+    c : numpy.ndarray, shape(horizon, )
+        planned perturbations from the LQR inputs of the last step
+    rho : float
+        current penalty of the ADMM, adapted to the balance of the residuals
+    history_iterations : list of int
+        number of the ADMM iterations of each step
+    num_not_converged : int
+        number of steps which reached max_iter
+    diagnostics : DiagnosticsRecorder class or None
+        records the iterations, residuals, rho and convergence of the sampled steps
+
+    Notes
+    ---------
+    the state vector x is [z, th, v_z, v_th]
+    the prediction model is the linearized motion equation discretized at dt,
+    the inputs are pre-stabilized by the discrete time LQR, u_k = -K x_k + c_k,
+    and the predicted states are condensed as X = Phi x0 + Gamma c,
+    so the QP only has the perturbations c as variables and is well conditioned for long horizons
+
+        minimize 1/2 c^T H c + q(x0)^T c + z_penalty / 2 * |violation of the z bound|^2
+        subject to l(x0) <= U(x0, c) <= u(x0)
+
+    with the terminal weight P of the discrete Riccati equation, c = 0 is the unconstrained solution
+
+    the input bound is hard, the cart position bound is soft, so the QP is feasible
+    even if the horizon can not keep |z| <= z_limit, the penalty is handled by
+    the z update (proximal operator) of the ADMM, the rows of the input are scaled to the unit norm
+    and the rows of z to z_row_scale
+
+    H, C and the inverse of the ADMM system are calculated once,
+    each step only updates q, l, u and warm starts from the shifted last solution
+    rho is adapted every adapt_interval iterations to the ratio of the primal and dual residuals
+    (as OSQP), the steep penalty of the z bound otherwise needs thousands of iterations,
+    rho moves on a grid of powers of 2, so the inverses of the ADMM system are cached
+    a step which reaches max_iter applies the last iterate, is counted in num_not_converged
+    and is recorded by the diagnostics
+    """
+
+    def __init__(self, pendulum, Q=None, R=None, horizon=100, dt=0.01, input_limit=10.0, z_limit=None,
+                 z_penalty=1e6, rho=None, sigma=1e-6, alpha=1.6, tol=1e-4, max_iter=200, adapt_interval=25,
+                 z_row_scale=0.2, diagnostics=None):
+        """
+        Parameters
+        ------------
+        pendulum : SinglePendulumWithCart class
+        Q : array-like, optional
+            Matrix Q of evaluation function, default is diag(10, 10, 10, 10)
+        R : float, optional
+            Matrix R of evaluation function, default is 100.0
+        horizon : int
+            number of the predicted steps, default is 100
+            the horizon should cover the motion of the cart (about 1 s) to keep the z bound
+        dt : float in seconds
+            sampling time of the control, default is 0.01
+        input_limit : float in N, optional
+            bound of |f|, None is unbounded, default is 10.0
+        z_limit : float in meters, optional
+            bound of |z| over the horizon, None is unbounded, default is None
+        z_penalty : float
+            weight of the quadratic penalty of the z bound violation in m^2, default is 1e6
+        rho : float, optional
+            penalty of the ADMM, default is None (a quarter of the mean diagonal of H)
+        sigma : float
+            regularization of the ADMM, default is 1e-6
+        alpha : float
+            relaxation of the ADMM, default is 1.6
+        tol : float
+            tolerance of the primal and dual residuals, default is 1e-4
+        max_iter : int
+            maximum number of the ADMM iterations of each step, default is 200
+        adapt_interval : int or None
+            rho is adapted every adapt_interval iterations, None keeps rho, default is 25
+        z_row_scale : float
+            norm of the z rows relative to the input rows, the smaller norm is the lower penalty of the ADMM
+            on the steep soft bound, default is 0.2
+        diagnostics : DiagnosticsRecorder class, optional
+            records the ADMM statistics of the sampled steps, default is None
+        """
+        self.dt = dt
+        self.horizon = horizon
+        self.input_limit = input_limit
+        self.z_limit = z_limit
+        self.z_penalty = z_penalty
+
+        self.R = 100.0 if R is None else R
+        self.Q = np.diag([10., 10., 10., 10.]) if Q is None else np.array(Q, dtype=np.float64)
+
+        self.Ad, self.Bd = CartPoleDynamics.from_pendulum(pendulum).discretize(dt)
+        self.K, self.P, _ = dlqr(self.Ad, self.Bd, self.Q, self.R)
+
+        self.rho = rho
+        self.sigma = sigma
+        self.alpha = alpha
+        self.tol = tol
+        self.max_iter = max_iter
+        self.adapt_interval = adapt_interval
+        self.z_row_scale = z_row_scale
+
+        self._factorizations = {} # exponent of rho : (rho, inverse of the ADMM system, soft ratio)
+
+        self._condense()
+
+        self.U = np.zeros(horizon)
+        self.c = np.zeros(horizon)
+        self._y = None # multipliers of the constraints
+
+        self.history_iterations = []
+        self.num_not_converged = 0
+
+        self.diagnostics = diagnostics
+
+    def _condense(self):
+        """
+        calculate the condensed prediction matrices, the QP matrices and the ADMM system
+        """
+        N = self.horizon
+        n = self.Ad.shape[0]
+
+        A_cl = self.Ad - np.dot(self.Bd, self.K)
+
+        # x_k = Phi_k x0 + sum_j Gamma_kj c_j, k = 1 ... N
+        Phi = np.empty((N, n, n))
+        Gamma = np.zeros((N, n, N))
+
+        A_power = np.eye(n)
+        for k in range(N):
+            A_power = np.dot(A_cl, A_power)
+            Phi[k] = A_power
+
+            Gamma[k, :, k] = self.Bd[:, 0]
+            if k > 0:
+                Gamma[k, :, :k] = np.dot(A_cl, Gamma[k - 1, :, :k])
+
+        # u_k = -K x_k + c_k, U = U_x x0 + U_c c
+        K = self.K[0]
+        self._U_x = np.vstack((-K, -np.einsum("j,kji->ki", K, Phi[:-1])))
+        self._U_c = np.eye(N)
+        self._U_c[1:] -= np.einsum("j,kjm->km", K, Gamma[:-1])
+
+        # stage weight Q, terminal weight P
+        weights = np.repeat(self.Q[np.newaxis], N, axis=0)
+        weights[-1] = self.P
+
+        Q_Gamma = np.einsum("kij,kjm->kim", weights, Gamma)
+
+        self._H = 2. * (np.einsum("kin,kim->nm", Gamma, Q_Gamma) + self.R * np.dot(self._U_c.T, self._U_c))
+        self._F = 2. * (np.einsum("kin,kij->nj", Q_Gamma, Phi) + self.R * np.dot(self._U_c.T, self._U_x)) # q = F x0
+
+        self._Phi_z = Phi[:, 0, :] # predicted z = Phi_z x0 + Gamma_z U
+        Gamma_z = Gamma[:, 0, :]
+
+        rows = []
+        soft_weights = []
+
+        if self.input_limit is not None:
+            rows.append(self._U_c)
+            soft_weights.append(np.full(N, np.inf)) # hard
+
+        if self.z_limit is not None:
+            rows.append(Gamma_z)
+            soft_weights.append(np.full(N, self.z_penalty))
+
+        C = np.vstack(rows) if rows else np.zeros((0, N))
+
+        # the rows are scaled to the unit norm, the penalty is scaled to keep the cost
+        self._row_scale = 1. / np.maximum(np.linalg.norm(C, axis=1), 1e-12)
+        if self.z_limit is not None:
+            self._row_scale[-N:] *= self.z_row_scale # the z rows take a lower penalty of the ADMM
+        self._C = C * self._row_scale[:, np.newaxis]
+        self._soft_weights = np.concatenate(soft_weights) / self._row_scale**2 if soft_weights else np.zeros(0)
+
+        if self.rho is None:
+            self.rho = 0.25 * np.mean(np.diag(self._H))
+
+        self._rho_base = self.rho
+        self._set_rho(0)
+
+    def _set_rho(self, exponent):
+        """
+        Parameters
+        ------------
+        exponent : int
+            rho is the initial rho times 2^exponent
+        """
+        if exponent not in self._factorizations:
+            rho = self._rho_base * 2.**exponent
+            N = self.horizon
+
+            # x update of the ADMM, (H + sigma I + rho C^T C) x = sigma x - q + C^T (rho z - y)
+            kkt_inv = np.linalg.inv(self._H + self.sigma * np.eye(N) + rho * np.dot(self._C.T, self._C))
+
+            # z update of the soft rows, z = p + (v - p) * rho / (rho + weight), p is the projection of v
+            soft_ratio = rho / (rho + self._soft_weights)
+
+            self._factorizations[exponent] = (rho, kkt_inv, soft_ratio)
+
+        self._rho_exponent = exponent
+        self.rho, self._kkt_inv, self._soft_ratio = self._factorizations[exponent]
+
+    def _bounds(self, error, reference_z):
+        """
+        Parameters
+        ------------
+        error : numpy.ndarray, shape(4, )
+            state from the reference
+        reference_z : float
+            reference of cart position
+
+        Returns
+        ---------
+        lower : numpy.ndarray
+        upper : numpy.ndarray
+            bounds of C v
+        """
+        N = self.horizon
+        lower = []
+        upper = []
+
+        if self.input_limit is not None:
+            lqr_inputs = np.dot(self._U_x, error)
+            lower.append(-self.input_limit - lqr_inputs)
+            upper.append(self.input_limit - lqr_inputs)
+
+        if self.z_limit is not None:
+            free_z = np.dot(self._Phi_z, error) + reference_z
+            lower.append(-self.z_limit - free_z)
+            upper.append(self.z_limit - free_z)
+
+        if not lower:
+            return np.zeros(0), np.zeros(0)
+
+        return np.concatenate(lower) * self._row_scale, np.concatenate(upper) * self._row_scale
+
+    @profiled("MPC.calc_input")
+    def calc_input(self, pendulum, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        Parameters
+        -------------
+        pendulum : pendulum class
+        reference_z : float, optional
+            reference of cart position
+        reference_v_z : float, optional
+            reference of cart velocity
+        reference_a_z : float, optional
+            not used, the prediction holds the reference over the horizon
+
+        Returns
+        ----------
+        f : numpy.ndarray, shape(1, 1) in [N]
+            input of the system
+        """
+        reference_z = 0.0 if reference_z is None else reference_z
+
+        error = np.array([pendulum.z - reference_z, pendulum.th, pendulum.v_z, pendulum.v_th])
+        if reference_v_z is not None:
+            error[2] -= reference_v_z
+
+        q = np.dot(self._F, error)
+        lower, upper = self._bounds(error, reference_z)
+
+        self.c = self._solve(q, lower, upper)
+        self.U = np.dot(self._U_x, error) + np.dot(self._U_c, self.c)
+
+        f = self.U[0]
+        if self.input_limit is not None:
+            # the ADMM iterate satisfies the bound only within the tolerance
+            f = min(max(f, -self.input_limit), self.input_limit)
+
+        return np.array([[f]])
+
+    def _solve(self, q, lower, upper):
+        """
+        solve the condensed QP by the ADMM warm started from the shifted last solution
+
+        Parameters
+        ------------
+        q : numpy.ndarray, shape(horizon, )
+        lower : numpy.ndarray
+        upper : numpy.ndarray
+
+        Returns
+        ---------
+        c : numpy.ndarray, shape(horizon, )
+            planned perturbations from the LQR inputs
+        """
+        C = self._C
+
+        if C.shape[0] == 0:
+            self.history_iterations.append(0)
+            return np.zeros(self.horizon)
+
+        # warm start, the plan and the multipliers of the last step shifted by one step
+        x = self._shift(self.c)
+        z = np.clip(np.dot(C, x), lower, upper)
+        y = np.zeros(C.shape[0]) if self._y is None else self._shift(self._y)
+
+        C_T = C.T
+        rho = self.rho
+        alpha = self.alpha
+        kkt_inv = self._kkt_inv
+        soft_ratio = self._soft_ratio
+
+        converged = False
+
+        for iterations in range(1, self.max_iter + 1):
+            x = np.dot(kkt_inv, self.sigma * x - q + np.dot(C_T, rho * z - y))
+            C_x = np.dot(C, x)
+
+            relaxed = alpha * C_x + (1. - alpha) * z
+            z_prev = z
+            v = relaxed + y / rho
+            projection = np.clip(v, lower, upper)
+            z = projection + (v - projection) * soft_ratio
+            y = y + rho * (relaxed - z)
+
+            primal = np.max(np.abs(C_x - z))
+            dual = np.max(np.abs(rho * np.dot(C_T, z - z_prev)))
+
+            if primal < self.tol and dual < self.tol:
+                converged = True
+                break
+
+            if self.adapt_interval and iterations % self.adapt_interval == 0 and \
+                    self._adapt_rho(x, z, y, q, C_x, primal):
+                rho, kkt_inv, soft_ratio = self.rho, self._kkt_inv, self._soft_ratio
+
+        self._y = y
+
+        self.history_iterations.append(iterations)
+        if not converged:
+            self.num_not_converged += 1
+
+        if self.diagnostics is not None and self.diagnostics.sample():
+            self.diagnostics.record(iterations=iterations, primal=primal, dual=dual, rho=self.rho,
+                                    converged=converged)
+
+        return x
+
+    def _adapt_rho(self, x, z, y, q, C_x, primal):
+        """
+        move rho to the ratio of the normalized primal and dual residuals of the QP
+
+        Returns
+        ---------
+        changed : bool
+            True if rho and the ADMM system are changed
+        """
+        H_x = np.dot(self._H, x)
+        C_T_y = np.dot(self._C.T, y)
+
+        primal_scale = max(np.max(np.abs(C_x)), np.max(np.abs(z)), 1e-12)
+        dual = np.max(np.abs(H_x + q + C_T_y))
+        dual_scale = max(np.max(np.abs(H_x)), np.max(np.abs(q)), np.max(np.abs(C_T_y)), 1e-12)
+
+        if dual == 0.0:
+            return False
+
+        ratio = math.sqrt((primal / primal_scale) / (dual / dual_scale))
+        exponent = self._rho_exponent + int(round(math.log2(max(ratio, 1e-12))))
+        exponent = min(max(exponent, -30), 30)
+
+        # only a change over the factor 4 pays the new inverse
+        if abs(exponent - self._rho_exponent) < 2:
+            return False
+
+        self._set_rho(exponent)
+
+        return True
+
+    def _shift(self, values):
+        """
+        Parameters
+        ------------
+        values : numpy.ndarray, shape(blocks * horizon, )
+            values of each step over the horizon, e.g. the inputs
+
+        Returns
+        ---------
+        shifted : numpy.ndarray, shape(blocks * horizon, )
+            values advanced by one step, the last step is zero
+        """
+        blocks = values.reshape(-1, self.horizon)
+
+        return np.concatenate((blocks[:, 1:], np.zeros((blocks.shape[0], 1))), axis=1).ravel()
@@ -1,6 +1,28 @@
 import math
 import numpy as np
-from control.matlab import lqr
+from controllers.riccati import lqr, solve_care
+from controllers.gain_schedule import table_is_valid
+from common.dynamics import CartPoleDynamics
+from common.profiling import profiled
+from common.reference import Feedforward
+
+# weights of _freeze_weight, each *_boost is added by the sigmoid schedule of the state,
+# boost / (1 + exp(steepness * (|th| - th_switch))) for R, Q_th and Q_v_z (large near the upright),
+# boost / (1 + exp(-steepness * (|z| - z_switch))) for Q_z (large near the end of the track)
+DEFAULT_WEIGHTS = {
+    "R": 10000.0,
+    "Q_z": 1000.0,
+    "Q_th": 1.0,
+    "Q_v_z": 1000.0,
+    "Q_v_th": 1000.0,
+    "R_boost": 0.0,
+    "Q_z_boost": 0.0,
+    "Q_th_boost": 0.0,
+    "Q_v_z_boost": 0.0,
+    "th_switch": 0.1,
+    "z_switch": 2.5,
+    "steepness": 100.0,
+}
 
 class SDRE():
     """
@@ -17,6 +39,22 @@ class SDRE():
         Matrix R of evaluation function 
     Q : numpy.ndarray
         Matrix R of evaluation function 
+    gain_table : SDREGainTable class or None
+        precomputed gain schedule, if None the Riccati equation is solved every step
+    solver : str
+        Riccati solver of each step, "control" (control.matlab.lqr) or "newton"
+    P : numpy.ndarray or None
+        solution of the Riccati equation of the last step
+    history_iterations : list of int
+        number of the Newton iterations of each step, 0 if the Schur method was used
+    num_fallbacks : int
+        number of steps which were solved by the Schur method (newton solver)
+    diagnostics : DiagnosticsRecorder class or None
+        recorder of the frozen matrices, gains and closed loop eigenvalues
+    weights : dict
+        DEFAULT_WEIGHTS overwritten by the weights of the constructor
+    feedforward : Feedforward class
+        angle and input of the cart reference velocity and acceleration on the upright linearized model
     
     Notes
     ---------
@@ -24,7 +62,36 @@ class SDRE():
     the state vector x is [z, th, v_z, v_th]
     """
 
-    def __init__(self, pendulum):
+    def __init__(self, pendulum, gain_table=None, solver="control", Q=None, R=None, diagnostics=None, weights=None):
+        """
+        Parameters
+        ------------
+        pendulum : SinglePendulumWithCart class
+        gain_table : SDREGainTable class, optional
+            precomputed gain schedule over (th, v_th), default is None
+            the exact gain is used when the state is out of the table,
+            it should be built with the same weights, Q, R and plant parameters
+        solver : str, optional
+            "control" solves by control.matlab.lqr,
+            "newton" solves by the Newton-Kleinman iteration warm started from the previous P,
+            default is "control"
+        Q : array-like, optional
+            constant Matrix Q of evaluation function, default is None (the weight of _freeze_weight)
+        R : float, optional
+            constant Matrix R of evaluation function, default is None (the weight of _freeze_weight)
+        diagnostics : DiagnosticsRecorder class, optional
+            records the frozen A and B, K and the closed loop eigenvalues of the sampled steps, default is None
+        weights : dict, optional
+            keys of DEFAULT_WEIGHTS, the weights and the schedule of _freeze_weight, default is None
+            Q and R overwrite them
+        """
+        if solver not in ("control", "newton"):
+            raise ValueError("solver should be chosen from control, newton")
+
+        unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError("unknown weights : {0}".format(sorted(unknown)))
+
         # controllers
         # initialize
         self.A = np.array([[0.0, 0.0, 1.0, 0.0], 
@@ -43,11 +110,39 @@ class SDRE():
         self.R = 0.0
         self.Q = np.zeros((4, 4))
 
-    def calc_input(self, pendulum, reference_z=None):
+        self.gain_table = gain_table
+        self.solver = solver
+
+        self._constant_Q = None if Q is None else np.array(Q, dtype=np.float64)
+        self._constant_R = R
+
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+        if gain_table is not None:
+            if not table_is_valid(self):
+                raise ValueError("gain_table needs Q_z_boost = 0, the weight of z depends on the cart position")
+            gain_table.check_compatible(self, pendulum)
+
+        self.feedforward = Feedforward(*CartPoleDynamics.from_pendulum(pendulum).linearize())
+
+        self.P = None
+        self.history_iterations = []
+        self.num_fallbacks = 0
+
+        self.diagnostics = diagnostics
+
+    @profiled("SDRE.calc_input")
+    def calc_input(self, pendulum, reference_z=None, reference_v_z=None, reference_a_z=None):
         """
         Parameters
         -------------
         pendulum : pendulum class
+        reference_z : float, optional
+            reference of cart position
+        reference_v_z : float, optional
+            reference of cart velocity
+        reference_a_z : float, optional
+            reference of cart acceleration
 
         Returns
         ----------
@@ -55,21 +150,112 @@ class SDRE():
             input of the system
         """
 
-        # freeze the state
-        self._freeze_state(pendulum)
-        self._freeze_weight(pendulum)
+        K = None
+
+        if self.gain_table is not None:
+            K = self.gain_table.interpolate(pendulum.th, pendulum.v_th)
+
+        frozen = K is None
+
+        if frozen:
+            # freeze the state
+            self._freeze_state(pendulum)
+            self._freeze_weight(pendulum)
 
-        K, P, e  = lqr(self.A, self.B, self.Q, self.R)
+            K = self._solve_riccati()
+
+        if self.diagnostics is not None and self.diagnostics.sample():
+            self._record_diagnostics(pendulum, K, frozen)
         
         state = np.array([[pendulum.z], [pendulum.th], [pendulum.v_z], [pendulum.v_th]])
 
-        if reference_z is not None:
-            state = np.array([[pendulum.z - reference_z], [pendulum.th], [pendulum.v_z], [pendulum.v_th]])
+        if reference_z is None and reference_v_z is None and reference_a_z is None:
+            return - np.dot(K, state)
 
-        f = - np.dot(K, state)
+        x_ref, f_ff = self.feedforward.reference_state(reference_z, reference_v_z, reference_a_z)
+        f = - np.dot(K, state - x_ref[:, np.newaxis]) + f_ff
 
         return f
 
+    @profiled("SDRE.calc_inputs")
+    def calc_inputs(self, pendulum, states=None, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        Parameters
+        -------------
+        pendulum : BatchSinglePendulumWithCart class
+            parameters of the plant
+        states : numpy.ndarray, shape(N, 4), optional
+            each row is [z, th, v_z, v_th], default is the states of pendulum
+        reference_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart position
+        reference_v_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart velocity
+        reference_a_z : float or numpy.ndarray, shape(N, ), optional
+            reference of cart acceleration
+
+        Returns
+        ----------
+        f : numpy.ndarray, shape(N, ) in [N]
+            inputs of the systems, same as calc_input of each state
+
+        Notes
+        ---------
+        the frozen A and B of all states are calculated at once,
+        the gains are looked up from the gain table and
+        the Riccati equation is solved only for the states out of the table,
+        each state is solved on its own without the warm start,
+        so P, history_iterations, num_fallbacks and the diagnostics are not changed
+        """
+        if states is None:
+            states = pendulum.states
+
+        states = np.asarray(states, dtype=np.float64)
+
+        K = np.full((states.shape[0], 4), np.nan)
+
+        if self.gain_table is not None:
+            K = self.gain_table.interpolate_batch(states[:, 1], states[:, 3])
+
+        missing = np.flatnonzero(np.isnan(K).any(axis=1))
+
+        if len(missing):
+            As, Bs = self._calc_state_matrices_batch(pendulum, states[missing, 1], states[missing, 3])
+            solve = lqr if self.solver == "control" else solve_care
+
+            for index, A, B in zip(missing, As, Bs):
+                Q, R = self._weight_matrices(states[index, 0], states[index, 1])
+                K[index] = solve(A, B, Q, R)[0][0]
+
+        if reference_z is None and reference_v_z is None and reference_a_z is None:
+            return - np.einsum("ij,ij->i", K, states)
+
+        x_ref, f_ff = self.feedforward.reference_states(reference_z, reference_v_z, reference_a_z)
+
+        return - np.einsum("ij,ij->i", K, states - x_ref) + f_ff
+
+    @profiled("SDRE.solve_riccati")
+    def _solve_riccati(self):
+        """
+        solve the Riccati equation of the frozen system
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(1, 4)
+            feedback gain
+        """
+        if self.solver == "control":
+            K, self.P, e = lqr(self.A, self.B, self.Q, self.R)
+            return K
+
+        K, self.P, e, iterations, fallback = solve_care(self.A, self.B, self.Q, self.R, P0=self.P)
+
+        self.history_iterations.append(iterations)
+        if fallback:
+            self.num_fallbacks += 1
+
+        return K
+
+    @profiled("SDRE.freeze_state")
     def _freeze_state(self, pendulum):
         """
         freeze state
@@ -79,6 +265,44 @@ class SDRE():
         pendulum : pendulum class
 
         """
+        self._calc_state_matrices(pendulum, self.A, self.B)
+
+    def _record_diagnostics(self, pendulum, K, frozen):
+        """
+        record the step to the diagnostics
+
+        Parameters
+        ------------
+        pendulum : pendulum class
+        K : numpy.ndarray, shape(1, 4)
+            feedback gain of the step
+        frozen : bool
+            True if A and B are frozen at the state of this step,
+            otherwise (the gain table) they are calculated only for the diagnostics
+        """
+        if not frozen:
+            self._freeze_state(pendulum)
+
+        fields = {"K": K, "eig": np.linalg.eigvals(self.A - np.dot(self.B, K))}
+
+        if self.diagnostics.level >= 2:
+            fields["A"] = self.A
+            fields["B"] = self.B
+
+        self.diagnostics.record(**fields)
+
+    def _calc_state_matrices(self, pendulum, A, B):
+        """
+        calculate the state dependent coefficient matrices
+
+        Parameters
+        ------------
+        pendulum : pendulum class
+        A : numpy.ndarray, shape(4, 4)
+            Matrix A of state equation, the lower rows are overwritten
+        B : numpy.ndarray, shape(4, 1)
+            Matrix B of state equation, the lower rows are overwritten
+        """
 
         M = np.array([[pendulum.c_m + pendulum.p_m , pendulum.p_m * pendulum.p_l * math.cos(pendulum.th)],
                       [pendulum.p_m * pendulum.p_l * math.cos(pendulum.th), pendulum.p_j + pendulum.p_m * (pendulum.p_l**2.)]])
@@ -91,13 +315,62 @@ class SDRE():
 
         L = np.array([[1.0], [0.0]])
 
-        self.A[2:, :2] = - np.dot(np.linalg.inv(M), G)
-        self.A[2:, 2:] = - np.dot(np.linalg.inv(M), N)
-        self.B[2:, :] = np.dot(np.linalg.inv(M), L)
-
-        print("A = {0}".format(self.A))
-        print("B = {0}".format(self.B))
+        A[2:, :2] = - np.dot(np.linalg.inv(M), G)
+        A[2:, 2:] = - np.dot(np.linalg.inv(M), N)
+        B[2:, :] = np.dot(np.linalg.inv(M), L)
         
+    def _calc_state_matrices_batch(self, pendulum, th, v_th):
+        """
+        calculate the state dependent coefficient matrices of many states
+
+        Parameters
+        ------------
+        pendulum : pendulum class
+            parameters of the plant
+        th : numpy.ndarray, shape(N, ) in radians
+        v_th : numpy.ndarray, shape(N, ) in rad/s
+
+        Returns
+        ---------
+        A : numpy.ndarray, shape(N, 4, 4)
+            Matrix A of state equation of each state
+        B : numpy.ndarray, shape(N, 4, 1)
+            Matrix B of state equation of each state
+
+        Notes
+        ---------
+        same as _calc_state_matrices, the 2x2 M is inverted in the closed form
+        """
+        m_11 = pendulum.c_m + pendulum.p_m
+        m_12 = pendulum.p_m * pendulum.p_l * np.cos(th)
+        m_22 = pendulum.p_j + pendulum.p_m * (pendulum.p_l**2.)
+
+        det = m_11 * m_22 - m_12 * m_12
+
+        # inverse of M = [[m_22, -m_12], [-m_12, m_11]] / det
+        inv_11 = m_22 / det
+        inv_12 = - m_12 / det
+        inv_22 = m_11 / det
+
+        n_12 = - pendulum.p_m * pendulum.p_l * np.sin(th) * v_th
+        g_22 = - pendulum.g * pendulum.p_m * pendulum.p_l * self._h_batch(th)
+
+        num = len(th)
+
+        A = np.zeros((num, 4, 4))
+        A[:, 0, 2] = 1.0
+        A[:, 1, 3] = 1.0
+        A[:, 2, 1] = - inv_12 * g_22
+        A[:, 3, 1] = - inv_22 * g_22
+        A[:, 2, 3] = - inv_11 * n_12
+        A[:, 3, 3] = - inv_12 * n_12
+
+        B = np.zeros((num, 4, 1))
+        B[:, 2, 0] = inv_11
+        B[:, 3, 0] = inv_12
+
+        return A, B
+
     def _freeze_weight(self, pendulum):
         """
         freeze the weight
@@ -106,12 +379,57 @@ class SDRE():
         -----------
         pendulum : pendulunm class
         """
+        self._schedule_weight(pendulum.z, pendulum.th)
+
+    def _schedule_weight(self, z, th):
+        """
+        freeze the weight of the state
+
+        Parameters
+        -----------
+        z : float in meters
+        th : float in radians
+        """
+        Q, self.R = self._weight_matrices(z, th)
+        self.Q[:, :] = Q
 
-        self.R = 10000.0 # + 10000.0 / (1.0 + math.exp(100.0*((abs(pendulum.th)-0.1))))
-        self.Q[0, 0] = 1000.0  # + 10000.0 / (1.0 + math.exp(-100.0*((abs(pendulum.z)-2.5))))
-        self.Q[1, 1] = 1.0 # + 10000.0 / (1.0 + math.exp(100.0*((abs(pendulum.th)-0.1))))
-        self.Q[2, 2] = 1000.0 # + 10000.0 / (1.0 + math.exp(100.0*((abs(pendulum.th)-0.1))))
-        self.Q[3, 3] = 1000.0
+    def _weight_matrices(self, z, th):
+        """
+        Parameters
+        -----------
+        z : float in meters
+        th : float in radians
+
+        Returns
+        ---------
+        Q : numpy.ndarray, shape(4, 4)
+            Matrix Q of evaluation function at the state
+        R : float
+            Matrix R of evaluation function at the state
+        """
+        weights = self.weights
+
+        upright = 0.0
+        if weights["R_boost"] or weights["Q_th_boost"] or weights["Q_v_z_boost"]:
+            upright = 1.0 / (1.0 + math.exp(min(weights["steepness"] * (abs(th) - weights["th_switch"]), 700.)))
+
+        track_end = 0.0
+        if weights["Q_z_boost"]:
+            track_end = 1.0 / (1.0 + math.exp(min(-weights["steepness"] * (abs(z) - weights["z_switch"]), 700.)))
+
+        R = weights["R"] + weights["R_boost"] * upright
+        Q = np.diag([weights["Q_z"] + weights["Q_z_boost"] * track_end,
+                     weights["Q_th"] + weights["Q_th_boost"] * upright,
+                     weights["Q_v_z"] + weights["Q_v_z_boost"] * upright,
+                     weights["Q_v_th"]])
+
+        if self._constant_Q is not None:
+            Q = self._constant_Q
+
+        if self._constant_R is not None:
+            R = self._constant_R
+
+        return Q, R
 
     def _h(self, th):
         """
@@ -128,3 +446,14 @@ class SDRE():
 
         return h
 
+    def _h_batch(self, th):
+        """
+        same as _h for numpy.ndarray
+        """
+        threshold = 0.001
+        ep = 0.01
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            h = (np.sin(th) + 0.01 * np.exp(-100 * ((np.abs(th) - math.pi)**2))) / (th + ep)
+
+        return np.where(np.abs(th) < threshold, 1., h)
@@ -0,0 +1,135 @@
+import math
+import numpy as np
+
+from controllers.LQR import LQR
+from common.dynamics import CartPoleDynamics
+from common.profiling import profiled
+
+class SwingUp():
+    """
+    Attributes
+    ------------
+    lqr : LQR class
+        balancing controller near the upright position
+    dynamics : CartPoleDynamics class
+        motion equation of the design, used for the energy and the input of the cart acceleration
+    mode : str
+        "swing" (energy shaping) or "balance" (LQR)
+    switch_times : list of tuple
+        (step, mode) of each mode change
+    num_steps : int
+        number of calc_input calls
+
+    Notes
+    ---------
+    the state vector x is [z, th, v_z, v_th], th = 0 is upright and th = pi is hanging
+
+    the swing phase shapes the energy of the pendulum E = 1/2 J' v_th^2 + m l g (cos(th) - 1)
+    to the upright energy 0 by the cart acceleration
+
+        a = sat(k E) sign(v_th cos(th)) - k_z (z - reference_z) - k_v v_z
+
+    which gives dE/dt = - m l cos(th) v_th a >= 0 while E < 0 (without the cart terms),
+    the acceleration is turned into the input by the inverse of the motion equation,
+    so the swing phase solves no Riccati equation
+
+    the balance phase starts when |th| (wrapped to [-pi, pi]) is below catch_angle
+    and goes back to the swing phase when it exceeds release_angle (hysteresis)
+    """
+
+    def __init__(self, pendulum, Q=None, R=None, energy_gain=20.0, max_acceleration=8.0,
+                 z_gain=1.0, v_z_gain=2.0, catch_angle=0.3, release_angle=0.6):
+        """
+        Parameters
+        ------------
+        pendulum : SinglePendulumWithCart class
+        Q : array-like, optional
+            Matrix Q of evaluation function of the LQR, default is the weight of LQR
+        R : float, optional
+            Matrix R of evaluation function of the LQR, default is the weight of LQR
+        energy_gain : float in m/s^2/J
+            gain k of the energy error, default is 20.0
+        max_acceleration : float in m/s^2
+            saturation of the energy shaping acceleration, default is 8.0
+        z_gain : float in 1/s^2
+            gain k_z of the cart position in the swing phase, default is 1.0
+        v_z_gain : float in 1/s
+            gain k_v of the cart velocity in the swing phase, default is 2.0
+        catch_angle : float in radians
+            the balance phase starts below this angle, default is 0.3
+        release_angle : float in radians
+            the swing phase starts again over this angle, default is 0.6
+        """
+        if release_angle < catch_angle:
+            raise ValueError("release_angle should be larger than catch_angle")
+
+        self.lqr = LQR(pendulum, Q=Q, R=R)
+        self.dynamics = CartPoleDynamics.from_pendulum(pendulum)
+
+        self.energy_gain = energy_gain
+        self.max_acceleration = max_acceleration
+        self.z_gain = z_gain
+        self.v_z_gain = v_z_gain
+        self.catch_angle = catch_angle
+        self.release_angle = release_angle
+
+        self.mode = "swing"
+        self.switch_times = []
+        self.num_steps = 0
+
+    @profiled("SwingUp.calc_input")
+    def calc_input(self, pendulum, reference_z=None, reference_v_z=None, reference_a_z=None):
+        """
+        Parameters
+        -------------
+        pendulum : pendulum class
+        reference_z : float, optional
+            reference of cart position
+        reference_v_z : float, optional
+            reference of cart velocity, used in the balance phase
+        reference_a_z : float, optional
+            reference of cart acceleration, used in the balance phase
+
+        Returns
+        ----------
+        f : numpy.ndarray, shape(1, 1) in [N]
+            input of the system
+        """
+        reference_z = 0.0 if reference_z is None else reference_z
+
+        th = math.remainder(pendulum.th, 2. * math.pi) # upright is th = 2 pi n
+        self._update_mode(abs(th))
+        self.num_steps += 1
+
+        if self.mode == "balance":
+            x_ref, f_ff = self.lqr.feedforward.reference_state(reference_z, reference_v_z, reference_a_z)
+            state = np.array([pendulum.z, th, pendulum.v_z, pendulum.v_th])
+            return np.array([[f_ff - np.dot(self.lqr.K[0], state - x_ref)]])
+
+        energy = self.dynamics.energy(th, pendulum.v_th)
+
+        pumping = pendulum.v_th * math.cos(th)
+        direction = 1. if pumping >= 0. else -1. # also kicks the pendulum at rest
+
+        acceleration = min(max(self.energy_gain * energy, -self.max_acceleration), self.max_acceleration) * direction
+        acceleration -= self.z_gain * (pendulum.z - reference_z) + self.v_z_gain * pendulum.v_z
+
+        f = self.dynamics.input_for_acceleration(th, pendulum.v_z, pendulum.v_th, acceleration)
+
+        return np.array([[f]])
+
+    def _update_mode(self, abs_th):
+        """
+        Parameters
+        ------------
+        abs_th : float in radians
+            |th| wrapped to [0, pi]
+        """
+        if self.mode == "swing" and abs_th < self.catch_angle:
+            self.mode = "balance"
+        elif self.mode == "balance" and abs_th > self.release_angle:
+            self.mode = "swing"
+        else:
+            return
+
+        self.switch_times.append((self.num_steps, self.mode))
@@ -0,0 +1,174 @@
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+class GainCache():
+    """
+    cache of the LQR solutions (K, P, e) keyed by the plant parameters and weights
+
+    Attributes
+    ------------
+    maxsize : int
+        maximum number of solutions kept in memory
+    directory : str or None
+        if not None, solutions are also stored in this directory as .npz files
+    hits : int
+        number of lookups served from the cache
+    misses : int
+        number of lookups which solved the Riccati equation
+
+    Notes
+    --------
+    the memory store is evicted in least recently used order
+    the disk store is never evicted, remove the directory to clear it
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        """
+        Parameters
+        ------------
+        maxsize : int
+            maximum number of solutions kept in memory, default is 128
+        directory : str or None
+            directory of the disk store, default is None (memory only)
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+
+        self._store = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(pendulum, Q, R, dt=None):
+        """
+        Parameters
+        ------------
+        pendulum : pendulum class
+        Q : array-like
+            Matrix Q of evaluation function
+        R : array-like
+            Matrix R of evaluation function
+        dt : float, optional
+            sampling time of the discrete time solution, default is None (continuous time)
+
+        Returns
+        ---------
+        key : str
+            hash of (p_m, p_l, p_j, p_mu, c_m, c_mu, g, Q, R) and dt
+        """
+        params = np.array([pendulum.p_m, pendulum.p_l, pendulum.p_j, pendulum.p_mu,
+                           pendulum.c_m, pendulum.c_mu, pendulum.g], dtype=np.float64)
+
+        sha = hashlib.sha1()
+        for value in (params, Q, R):
+            value = np.ascontiguousarray(value, dtype=np.float64)
+            sha.update(str(value.shape).encode())
+            sha.update(value.tobytes())
+
+        if dt is not None:
+            sha.update("dt={0!r}".format(float(dt)).encode())
+
+        return sha.hexdigest()
+
+    def get(self, key):
+        """
+        Parameters
+        ------------
+        key : str
+
+        Returns
+        ---------
+        solution : tuple of numpy.ndarray or None
+            (K, P, e), None if the key is not stored
+        """
+        if key in self._store:
+            self._store.move_to_end(key)
+            return self._store[key]
+
+        path = self._path(key)
+        if path is not None and os.path.exists(path):
+            with np.load(path) as data:
+                solution = (data["K"], data["P"], data["e"])
+            self._put_memory(key, solution)
+            return solution
+
+        return None
+
+    def put(self, key, solution):
+        """
+        Parameters
+        ------------
+        key : str
+        solution : tuple of numpy.ndarray
+            (K, P, e)
+
+        Returns
+        ---------
+        solution : tuple of numpy.ndarray
+            stored (read-only) solution
+        """
+        solution = tuple(np.array(value) for value in solution)
+        self._put_memory(key, solution)
+
+        path = self._path(key)
+        if path is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first, other processes may read the same key
+            temp_path = "{0}.{1}.tmp.npz".format(path[:-4], os.getpid())
+            np.savez(temp_path, K=solution[0], P=solution[1], e=solution[2])
+            os.replace(temp_path, path)
+
+        return solution
+
+    def get_or_solve(self, key, solver):
+        """
+        Parameters
+        ------------
+        key : str
+        solver : callable
+            called without arguments when the key is not stored, returns (K, P, e)
+
+        Returns
+        ---------
+        solution : tuple of numpy.ndarray
+            (K, P, e)
+        """
+        solution = self.get(key)
+
+        if solution is not None:
+            self.hits += 1
+            return solution
+
+        self.misses += 1
+        return self.put(key, solver())
+
+    def clear(self):
+        """
+        clear the memory store
+        """
+        self._store.clear()
+
+    def __len__(self):
+        return len(self._store)
+
+    def _put_memory(self, key, solution):
+        for value in solution:
+            value.setflags(write=False) # shared by all controllers
+
+        self._store[key] = solution
+        self._store.move_to_end(key)
+
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def _path(self, key):
+        if self.directory is None:
+            return None
+
+        return os.path.join(self.directory, "{0}.npz".format(key))
+
+# shared by all LQR controllers in the process
+default_gain_cache = GainCache()
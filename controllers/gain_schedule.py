@@ -0,0 +1,362 @@
+import math
+import copy
+import numpy as np
+
+from controllers.riccati import lqr
+from common.profiling import profiled
+
+def table_is_valid(controller):
+    """
+    Parameters
+    ------------
+    controller : SDRE class
+
+    Returns
+    ---------
+    valid : bool
+        True if the scheduled weights of the controller only depend on (th, v_th)
+    """
+    return controller.weights["Q_z_boost"] == 0 or controller._constant_Q is not None
+
+# parameters of the plant in the frozen A and B of SDRE
+PLANT_PARAMS = ("p_m", "p_l", "p_j", "c_m", "g")
+
+class SDREGainTable():
+    """
+    gain scheduling table of the SDRE controller over (th, v_th)
+
+    Attributes
+    ------------
+    ths : numpy.ndarray, shape(num_th, )
+        grid of pendulum angle in radians
+    v_ths : numpy.ndarray, shape(num_v_th, )
+        grid of pendulum angle velocity in rad/s
+    gains : numpy.ndarray, shape(num_th, num_v_th, 4)
+        feedback gain K at each grid point, nan where the Riccati equation has no solution
+    order : int
+        interpolation order, 0 (nearest), 1 (bilinear) or 3 (bicubic spline)
+    max_abs_error : float
+        maximum absolute gain error against the exact SDRE at the cell centers
+    max_rel_error : float
+        maximum relative gain error (in the norm of K) against the exact SDRE at the cell centers
+    weights : dict
+        weights of the controller the table was built with
+    Q : numpy.ndarray or None
+        constant Matrix Q of the controller
+    R : float or None
+        constant Matrix R of the controller
+    params : dict
+        parameters of the plant (PLANT_PARAMS) the table was built with
+
+    Notes
+    --------
+    the SDRE gain only depends on (th, v_th) because the frozen A, B are functions of them
+    this is valid as long as SDRE._freeze_weight does not depend on z or v_z (Q_z_boost of the weights is 0),
+    otherwise the table raises ValueError
+    the table keeps the weights and the plant parameters it was built with,
+    SDRE raises ValueError for a table of other weights or another plant (check_compatible)
+
+    the error is measured at the cell centers, where the interpolation error of
+    the nearest and bilinear tables is the largest
+    """
+
+    def __init__(self, controller, pendulum, th_range=(-1.2, 1.2), v_th_range=(-6.0, 6.0),
+                 num_th=49, num_v_th=49, order=1, check_error=True):
+        """
+        Parameters
+        ------------
+        controller : SDRE class
+            the gains are calculated by its state and weight freezing
+        pendulum : SinglePendulumWithCart class
+            parameters of the plant
+        th_range : tuple of float
+            range of the pendulum angle in radians, default is (-1.2, 1.2)
+        v_th_range : tuple of float
+            range of the pendulum angle velocity in rad/s, default is (-6.0, 6.0)
+        num_th : int
+            number of grid points of the angle, default is 49
+        num_v_th : int
+            number of grid points of the angle velocity, default is 49
+        order : int
+            interpolation order, 0, 1 or 3, default is 1
+        check_error : bool
+            if True, the error against the exact SDRE is measured, default is True
+        """
+        if order not in (0, 1, 3):
+            raise ValueError('order must be 0, 1 or 3')
+
+        if not table_is_valid(controller):
+            raise ValueError('the gain table needs Q_z_boost = 0, the weight of z depends on the cart position')
+
+        self.order = order
+
+        self.ths = np.linspace(th_range[0], th_range[1], num_th)
+        self.v_ths = np.linspace(v_th_range[0], v_th_range[1], num_v_th)
+
+        self.weights = dict(controller.weights)
+        self.Q = None if controller._constant_Q is None else controller._constant_Q.copy()
+        self.R = controller._constant_R
+        self.params = {key: float(getattr(pendulum, key)) for key in PLANT_PARAMS}
+
+        self._controller = controller
+        self._pendulum = copy.copy(pendulum) # only the parameters are used
+        self._pendulum.z = 0.0
+        self._pendulum.v_z = 0.0
+
+        self.gains = self._solve_grid(self.ths, self.v_ths)
+
+        self._set_interpolator()
+
+        self.max_abs_error = None
+        self.max_rel_error = None
+
+        if check_error:
+            self.check_error()
+
+    def check_compatible(self, controller, pendulum):
+        """
+        Parameters
+        ------------
+        controller : SDRE class
+            controller which looks the gains up from the table
+        pendulum : SinglePendulumWithCart class
+            plant of the controller
+
+        Raises
+        ---------
+        ValueError
+            if the weights, the constant Q and R or the plant parameters differ from the table
+        """
+        if controller.weights != self.weights:
+            changed = sorted(key for key in self.weights if controller.weights[key] != self.weights[key])
+            raise ValueError("the gain table was built with other weights : {0}".format(changed))
+
+        if ((self.Q is None) != (controller._constant_Q is None)
+                or (self.Q is not None and not np.array_equal(self.Q, controller._constant_Q))
+                or self.R != controller._constant_R):
+            raise ValueError("the gain table was built with other Q or R")
+
+        changed = sorted(key for key in PLANT_PARAMS if float(getattr(pendulum, key)) != self.params[key])
+        if changed:
+            raise ValueError("the gain table was built for other plant parameters : {0}".format(changed))
+
+    def _solve_gain(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : float in radians
+        v_th : float in rad/s
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(4, )
+            exact SDRE gain, nan if the Riccati equation has no solution
+        """
+        self._pendulum.th = th
+        self._pendulum.v_th = v_th
+
+        A = self._controller.A.copy()
+        B = self._controller.B.copy()
+
+        self._controller._calc_state_matrices(self._pendulum, A, B)
+        self._controller._freeze_weight(self._pendulum)
+
+        try:
+            K, _, _ = lqr(A, B, self._controller.Q, self._controller.R)
+        except (ValueError, np.linalg.LinAlgError):
+            return np.full(4, np.nan)
+
+        return np.asarray(K).flatten()
+
+    def _solve_grid(self, ths, v_ths):
+        """
+        Parameters
+        ------------
+        ths : numpy.ndarray
+        v_ths : numpy.ndarray
+
+        Returns
+        ---------
+        gains : numpy.ndarray, shape(len(ths), len(v_ths), 4)
+        """
+        gains = np.empty((len(ths), len(v_ths), 4))
+
+        for i, th in enumerate(ths):
+            for j, v_th in enumerate(v_ths):
+                gains[i, j] = self._solve_gain(th, v_th)
+
+        return gains
+
+    def _set_interpolator(self):
+        """
+        make the spline of each gain element for the bicubic interpolation
+        """
+        self._splines = None
+
+        if self.order == 3:
+            from scipy.interpolate import RectBivariateSpline
+            self._splines = [RectBivariateSpline(self.ths, self.v_ths, self.gains[:, :, k], kx=3, ky=3)
+                             for k in range(4)]
+
+    def contains(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : float in radians
+        v_th : float in rad/s
+
+        Returns
+        ---------
+        contained : bool
+            True if the state is inside the grid
+        """
+        return self.ths[0] <= th <= self.ths[-1] and self.v_ths[0] <= v_th <= self.v_ths[-1]
+
+    @profiled("SDRE.gain_table")
+    def interpolate(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : float in radians
+        v_th : float in rad/s
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(1, 4) or None
+            interpolated gain, None if the state is out of the grid
+            or the neighbouring grid points have no solution
+        """
+        if not self.contains(th, v_th):
+            return None
+
+        if self.order == 3:
+            K = np.array([spline.ev(th, v_th) for spline in self._splines])
+        else:
+            K = self._interpolate_linear(th, v_th)
+
+        if np.any(np.isnan(K)):
+            return None
+
+        return K.reshape(1, 4)
+
+    def interpolate_batch(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : numpy.ndarray, shape(N, ) in radians
+        v_th : numpy.ndarray, shape(N, ) in rad/s
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(N, 4)
+            interpolated gains, nan rows where the state is out of the grid
+            or the neighbouring grid points have no solution
+        """
+        th = np.asarray(th, dtype=np.float64)
+        v_th = np.asarray(v_th, dtype=np.float64)
+
+        inside = (self.ths[0] <= th) & (th <= self.ths[-1]) & (self.v_ths[0] <= v_th) & (v_th <= self.v_ths[-1])
+
+        # out of grid states are clipped for the lookup and masked after
+        th = np.clip(th, self.ths[0], self.ths[-1])
+        v_th = np.clip(v_th, self.v_ths[0], self.v_ths[-1])
+
+        if self.order == 3:
+            K = np.stack([spline.ev(th, v_th) for spline in self._splines], axis=-1)
+        else:
+            K = self._interpolate_linear(th, v_th)
+
+        K[~inside] = np.nan
+
+        return K
+
+    def _interpolate_linear(self, th, v_th):
+        """
+        Parameters
+        ------------
+        th : float or numpy.ndarray, shape(N, ) in radians
+        v_th : float or numpy.ndarray, shape(N, ) in rad/s
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(4, ) or shape(N, 4)
+            nearest (order 0) or bilinear (order 1) interpolated gain
+        """
+        d_th = self.ths[1] - self.ths[0]
+        d_v_th = self.v_ths[1] - self.v_ths[0]
+
+        x = (th - self.ths[0]) / d_th
+        y = (v_th - self.v_ths[0]) / d_v_th
+
+        if np.ndim(x) > 0:
+            return self._interpolate_linear_batch(x, y)
+
+        if self.order == 0:
+            return self.gains[int(round(x)), int(round(y))]
+
+        i = min(int(x), len(self.ths) - 2)
+        j = min(int(y), len(self.v_ths) - 2)
+        t = x - i
+        u = y - j
+
+        return (1. - t) * (1. - u) * self.gains[i, j] + t * (1. - u) * self.gains[i + 1, j] +\
+               (1. - t) * u * self.gains[i, j + 1] + t * u * self.gains[i + 1, j + 1]
+
+    def _interpolate_linear_batch(self, x, y):
+        """
+        Parameters
+        ------------
+        x : numpy.ndarray, shape(N, )
+            angle in the grid index
+        y : numpy.ndarray, shape(N, )
+            angle velocity in the grid index
+
+        Returns
+        ---------
+        K : numpy.ndarray, shape(N, 4)
+        """
+        if self.order == 0:
+            return self.gains[np.rint(x).astype(int), np.rint(y).astype(int)]
+
+        i = np.minimum(x.astype(int), len(self.ths) - 2)
+        j = np.minimum(y.astype(int), len(self.v_ths) - 2)
+        t = (x - i)[:, np.newaxis]
+        u = (y - j)[:, np.newaxis]
+
+        return (1. - t) * (1. - u) * self.gains[i, j] + t * (1. - u) * self.gains[i + 1, j] +\
+               (1. - t) * u * self.gains[i, j + 1] + t * u * self.gains[i + 1, j + 1]
+
+    def check_error(self):
+        """
+        measure the error against the exact SDRE at the cell centers
+
+        Returns
+        ---------
+        max_abs_error : float
+            maximum absolute error of the gain elements
+        max_rel_error : float
+            maximum of |K_table - K_exact| / |K_exact|
+        """
+        th_centers = (self.ths[:-1] + self.ths[1:]) / 2.
+        v_th_centers = (self.v_ths[:-1] + self.v_ths[1:]) / 2.
+
+        exact_gains = self._solve_grid(th_centers, v_th_centers)
+
+        abs_errors = []
+        rel_errors = []
+
+        for i, th in enumerate(th_centers):
+            for j, v_th in enumerate(v_th_centers):
+                K = self.interpolate(th, v_th)
+
+                if K is None or np.any(np.isnan(exact_gains[i, j])):
+                    continue
+
+                error = K.flatten() - exact_gains[i, j]
+                abs_errors.append(np.max(np.abs(error)))
+                rel_errors.append(np.linalg.norm(error) / np.linalg.norm(exact_gains[i, j]))
+
+        self.max_abs_error = max(abs_errors) if abs_errors else math.nan
+        self.max_rel_error = max(rel_errors) if rel_errors else math.nan
+
+        return self.max_abs_error, self.max_rel_error
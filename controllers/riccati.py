@@ -0,0 +1,129 @@
+import numpy as np
+
+def lqr(A, B, Q, R):
+    """
+    control.matlab.lqr, python-control is imported at the first call
+
+    Parameters
+    ------------
+    A : numpy.ndarray, shape(n, n)
+    B : numpy.ndarray, shape(n, m)
+    Q : numpy.ndarray, shape(n, n)
+    R : float or numpy.ndarray, shape(m, m)
+
+    Returns
+    ---------
+    K : numpy.ndarray, shape(m, n)
+        feedback gain, u = -K x
+    P : numpy.ndarray, shape(n, n)
+        solution of the Riccati equation
+    e : numpy.ndarray, shape(n, )
+        closed loop eigenvalues
+    """
+    from control.matlab import lqr as control_lqr
+
+    return control_lqr(A, B, Q, R)
+
+def solve_care(A, B, Q, R, P0=None, tol=1e-9, max_iter=20):
+    """
+    solve the continuous algebraic Riccati equation
+    A^T P + P A - P B R^-1 B^T P + Q = 0
+
+    Parameters
+    ------------
+    A : numpy.ndarray, shape(n, n)
+    B : numpy.ndarray, shape(n, m)
+    Q : numpy.ndarray, shape(n, n)
+    R : float or numpy.ndarray, shape(m, m)
+    P0 : numpy.ndarray, shape(n, n), optional
+        initial guess, e.g. the solution of the previous control step
+        it must make A - B R^-1 B^T P0 stable, default is None (Schur method)
+    tol : float
+        relative tolerance of the Newton iteration, default is 1e-9
+    max_iter : int
+        maximum number of the Newton iterations, default is 20
+
+    Returns
+    ---------
+    K : numpy.ndarray, shape(m, n)
+        feedback gain, u = -K x
+    P : numpy.ndarray, shape(n, n)
+        solution of the Riccati equation
+    e : numpy.ndarray, shape(n, )
+        closed loop eigenvalues
+    iterations : int
+        number of the Newton iterations, 0 if the Schur method was used
+    fallback : bool
+        True if the Schur method was used
+
+    Notes
+    --------
+    Newton-Kleinman iteration warm started from P0,
+    each step solves the Lyapunov equation Ak^T P + P Ak + Q + K^T R K = 0
+    as a n^2 x n^2 linear system, which is cheap for the 4x4 pendulum
+    if P0 is not stabilizing or the iteration does not converge,
+    the Schur method of scipy is used
+    """
+    n = A.shape[0]
+    R = np.atleast_2d(R).astype(np.float64)
+    R_inv = np.linalg.inv(R)
+
+    if P0 is not None:
+        K = np.dot(R_inv, np.dot(B.T, P0))
+        A_k = A - np.dot(B, K)
+
+        if np.all(np.linalg.eigvals(A_k).real < 0.0):
+            eye = np.eye(n)
+            P = P0
+
+            for iterations in range(1, max_iter + 1):
+                Q_k = Q + np.dot(K.T, np.dot(R, K))
+                # vec(A_k^T P + P A_k) = (I kron A_k^T + A_k^T kron I) vec(P)
+                lyap = np.kron(eye, A_k.T) + np.kron(A_k.T, eye)
+                P_next = np.linalg.solve(lyap, -Q_k.reshape(-1)).reshape(n, n)
+                P_next = (P_next + P_next.T) / 2.
+
+                converged = np.linalg.norm(P_next - P) <= tol * np.linalg.norm(P_next)
+                P = P_next
+
+                K = np.dot(R_inv, np.dot(B.T, P))
+                A_k = A - np.dot(B, K)
+
+                if converged:
+                    return K, P, np.linalg.eigvals(A_k), iterations, False
+
+    from scipy.linalg import solve_continuous_are
+    P = solve_continuous_are(A, B, Q, R)
+    K = np.dot(R_inv, np.dot(B.T, P))
+
+    return K, P, np.linalg.eigvals(A - np.dot(B, K)), 0, True
+
+def dlqr(A, B, Q, R):
+    """
+    discrete time LQR, x[k+1] = A x[k] + B u[k], scipy is imported at the first call
+
+    Parameters
+    ------------
+    A : numpy.ndarray, shape(n, n)
+    B : numpy.ndarray, shape(n, m)
+    Q : numpy.ndarray, shape(n, n)
+    R : float or numpy.ndarray, shape(m, m)
+
+    Returns
+    ---------
+    K : numpy.ndarray, shape(m, n)
+        feedback gain, u[k] = -K x[k]
+    P : numpy.ndarray, shape(n, n)
+        solution of the discrete algebraic Riccati equation
+    e : numpy.ndarray, shape(n, )
+        closed loop eigenvalues, inside the unit circle
+    """
+    from scipy.linalg import solve_discrete_are
+
+    R = np.atleast_2d(R).astype(np.float64)
+
+    P = solve_discrete_are(A, B, Q, R)
+    B_P = np.dot(B.T, P)
+    K = np.linalg.solve(R + np.dot(B_P, B), np.dot(B_P, A))
+
+    return K, P, np.linalg.eigvals(A - np.dot(B, K))
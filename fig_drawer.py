@@ -3,18 +3,13 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as ani
 import matplotlib.font_manager as fon
 import sys
+import os
 import math
 # del fon.weight_dict['roman']
 # fon._rebuild()
 
-# default setting of figures
-plt.rcParams['font.family'] = 'Times New Roman' # Fonts
-plt.rcParams["mathtext.fontset"] = 'stix' # math fonts
-plt.rcParams['xtick.direction'] = 'in' # x axis in
-plt.rcParams['ytick.direction'] = 'in' # y axis in 
-plt.rcParams["font.size"] = 10
-plt.rcParams['axes.linewidth'] = 1.0 # axis line width
-plt.rcParams['axes.grid'] = True # make grid
+from common.drawing_tools import set_default_rc_params
+from common.profiling import profiled
 
 class FigDrawer():
     """create figure of path and robot
@@ -37,16 +32,23 @@ class FigDrawer():
         this figure shows the inputs
     input_f_axis : axis of matplotlib
         this axis shows the u_vs
+    dt : float in seconds or None
+        sampling time of the histories, the default of draw_fig
     """
-    def __init__(self, pendulum, controller):
+    def __init__(self, pendulum, controller, dt=None):
         """
         Parameters
         ------------
         pendulum : SinglePendulumWithCart class
         controller : controller class
+        dt : float in seconds, optional
+            sampling time of the histories, default is None (0.01 [s] if draw_fig is not given it)
         """
         self.pendulum = pendulum
         self.controller = controller
+        self.dt = dt
+
+        set_default_rc_params()
 
         # setting up figure
         self.time_history_fig = plt.figure(dpi=100)
@@ -58,20 +60,62 @@ class FigDrawer():
         self.input_fig = plt.figure(dpi=100)
         self.input_f_axis = self.input_fig.add_subplot(111)
         
-    def draw_fig(self, dt=0.01):
+    @classmethod
+    def from_file(cls, path):
+        """
+        Parameters
+        ------------
+        path : str
+            trajectory file saved by common.trajectory_io.save_pendulum_trajectory
+
+        Returns
+        ---------
+        drawer : FigDrawer class
+            drawer of the saved run at the sampling time of the file, the simulation is not executed again
+        """
+        from common.trajectory_io import load_pendulum_trajectory
+
+        pendulum = load_pendulum_trajectory(path)
+
+        return cls(pendulum, None, dt=pendulum.dt)
+
+    @profiled("draw.fig")
+    def draw_fig(self, dt=None, save_path=None, show=True):
         """draw the figures
 
         Parameters
         -----------
-        dt : float in seconds
-            sampling time of system default is 1 [ms]
+        dt : float in seconds, optional
+            sampling time of system, default is None (dt of the drawer, otherwise 0.01 [s])
+        save_path : str, optional
+            if not None, the time history figure is saved to this path
+            and the input figure is saved to the path with "_input" suffix (e.g. result_input.png)
+            default is None
+        show : bool, optional
+            if True, the figures are shown in the window, default is True
 
         """
-        self.dt = dt
+        if len(self.pendulum.history_z) == 0:
+            raise ValueError("the pendulum has no history to draw")
+
+        if dt is not None:
+            self.dt = dt
+        elif self.dt is None:
+            self.dt = 0.01
+
         self._set_axis()
         self._draw_fig()
 
-        plt.show()
+        if save_path is not None:
+            root, ext = os.path.splitext(save_path)
+            self.time_history_fig.savefig(save_path)
+            self.input_fig.savefig(root + "_input" + (ext or ".png"))
+
+        if show:
+            plt.show()
+        else:
+            plt.close(self.time_history_fig)
+            plt.close(self.input_fig)
 
     
     def _set_axis(self):
@@ -101,22 +145,24 @@ class FigDrawer():
         """
         self._draw_time_history()
         self._draw_input()
-
-        plt.show()
     
     def _draw_time_history(self):
         """plot time histories of state 
         """
         times = np.arange(len(self.pendulum.history_z)) * self.dt
         self.z_axis.plot(times, self.pendulum.history_z, label="z")
+        # the pendulum records the reference of 0 when no reference is set
+        reference_z = getattr(self.pendulum, "history_reference_z", None)
+        if reference_z is not None and np.any(reference_z):
+            self.z_axis.plot(times, reference_z, linestyle="--", label="reference_z")
+            self.z_axis.legend()
         self.th_axis.plot(times, self.pendulum.history_th, label="th")
         self.v_z_axis.plot(times, self.pendulum.history_v_z, label="v_z")
         self.v_th_axis.plot(times, self.pendulum.history_v_th, label="v_th")
-        plt.legend()
     
     def _draw_input(self):
         """plot time histories of input
         """
         times = np.arange(len(self.pendulum.history_input_f)) * self.dt
         self.input_f_axis.plot(times, self.pendulum.history_input_f, label="input")
-        plt.legend()
+        self.input_f_axis.legend()
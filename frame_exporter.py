@@ -0,0 +1,373 @@
+# headless video / frame export of the pendulum animation
+import argparse
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import numpy as np
+
+from common.drawing_tools import circle_make, square_make, set_default_rc_params
+from common.profiling import profiled
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm", ".gif")
+
+class FrameRenderer():
+    """rasterize the frames of the pendulum with cart without pyplot
+
+    Attributes
+    ------------
+    figure : matplotlib.figure.Figure
+    canvas : matplotlib.backends.backend_agg.FigureCanvasAgg
+    width : int
+        width of the frame in pixels
+    height : int
+        height of the frame in pixels
+
+    Notes
+    ------------
+    the axis and grid are drawn once and restored as the background of each frame,
+    only the pendulum and cart lines are drawn per frame
+    """
+
+    def __init__(self, settings):
+        """
+        Parameters
+        ------------
+        settings : dict
+            history_z, history_th, p_l, c_width, c_height, c_wheel_size, width, height, dpi
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        set_default_rc_params()
+
+        self.history_z = settings["history_z"]
+        self.history_th = settings["history_th"]
+        self.p_l = settings["p_l"]
+
+        dpi = settings["dpi"]
+        self.figure = Figure(figsize=(settings["width"] / dpi, settings["height"] / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axis = self.figure.add_subplot(111)
+
+        self._set_axis(settings)
+
+        self.p_img, = self.axis.plot([], [], color="m", linewidth=2.5, animated=True)
+        self.c_imgs = [self.axis.plot([], [], color="k", animated=True)[0] for _ in range(3)]
+
+        # outlines at z = 0, composed of [cart, wheel 1, wheel 2]
+        center_x = settings["c_width"]/2 - settings["c_wheel_size"]
+        center_y = - settings["c_height"]/2 - settings["c_wheel_size"]
+
+        self.c_shapes = [square_make(0.0, 0.0, width=settings["c_width"], height=settings["c_height"]),
+                         circle_make(center_x, center_y, settings["c_wheel_size"]),
+                         circle_make(-center_x, center_y, settings["c_wheel_size"])]
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+        self.width, self.height = self.canvas.get_width_height()
+
+    def _set_axis(self, settings):
+        """ initialize the axis, same as AnimDrawer
+
+        Parameters
+        ------------
+        settings : dict
+        """
+        self.axis.set_xlabel(r'$\it{x}$ [m]')
+        self.axis.set_ylabel(r'$\it{y}$ [m]')
+        self.axis.set_aspect('equal', adjustable='box')
+
+        margin = 1.0
+        self.axis.set_xlim(settings["min_z"] - margin, settings["max_z"] + margin)
+        self.axis.set_ylim(-0.5, 1.25)
+
+    @profiled("draw.render_frame")
+    def render(self, i):
+        """
+        Parameters
+        ------------
+        i : int
+            time step of the history
+
+        Returns
+        -----------
+        frame : memoryview
+            RGBA pixels of the frame, shape(height, width, 4)
+        """
+        z = self.history_z[i]
+        th = self.history_th[i]
+
+        self.canvas.restore_region(self.background)
+
+        self.p_img.set_data([z, z + 2 * self.p_l * math.sin(th)], [0.0, 2 * self.p_l * math.cos(th)])
+        self.axis.draw_artist(self.p_img)
+
+        for img, (xs, ys) in zip(self.c_imgs, self.c_shapes):
+            img.set_data(xs + z, ys)
+            self.axis.draw_artist(img)
+
+        return self.canvas.buffer_rgba()
+
+    def save_png(self, i, path):
+        """
+        Parameters
+        ------------
+        i : int
+            time step of the history
+        path : str
+            path of the png file
+        """
+        from matplotlib.image import imsave
+
+        imsave(path, np.asarray(self.render(i)))
+
+class FrameExporter():
+    """export the animation of the pendulum with cart on headless servers
+
+    Attributes
+    ------------
+    settings : dict
+        histories and drawing settings sent to the renderers
+    frame_indices : numpy.ndarray
+        time steps of the history drawn as frames
+    fps : float
+        frame rate of the output
+
+    Notes
+    ------------
+    plt.show() is never called, the frames are rasterized by the Agg canvas
+    and piped to ffmpeg (video) or written as a png sequence (directory)
+    the frames are rendered in chunks, optionally by worker processes
+    """
+
+    def __init__(self, history_z, history_th, dt, p_l, c_width, c_height, c_wheel_size,
+                 fps=30., width=960, height=540, dpi=100):
+        """
+        Parameters
+        ------------
+        history_z : array-like
+            time history of cart position in meters
+        history_th : array-like
+            time history of pendulum angle in radians
+        dt : float in seconds
+            sampling time of the histories
+        p_l, c_width, c_height, c_wheel_size : float in meters
+            geometry of the pendulum and cart
+        fps : float
+            target frame rate, the history is decimated to keep the real time, default is 30
+        width : int
+            width of the frame in pixels, default is 960
+        height : int
+            height of the frame in pixels, default is 540
+        dpi : int
+            resolution of the figure, default is 100
+        """
+        history_z = np.asarray(history_z)
+        history_th = np.asarray(history_th)
+        if len(history_z) == 0:
+            raise ValueError("the history has no frames to export")
+
+        step = max(1, int(round(1. / (fps * dt))))
+        self.frame_indices = np.arange(0, len(history_z), step)
+        self.fps = 1. / (step * dt)
+
+        self.settings = {
+            "history_z": history_z, "history_th": history_th,
+            "min_z": float(np.min(history_z)), "max_z": float(np.max(history_z)),
+            "p_l": p_l, "c_width": c_width, "c_height": c_height, "c_wheel_size": c_wheel_size,
+            "width": width, "height": height, "dpi": dpi,
+        }
+
+    @classmethod
+    def from_pendulum(cls, pendulum, dt, **kwargs):
+        """
+        Parameters
+        ------------
+        pendulum : SinglePendulumWithCart class
+        dt : float in seconds
+            sampling time of the histories
+        kwargs : dict
+            passed to FrameExporter
+
+        Returns
+        ---------
+        exporter : FrameExporter class
+        """
+        return cls(pendulum.history_z, pendulum.history_th, dt, pendulum.p_l,
+                   pendulum.c_width, pendulum.c_height, pendulum.c_wheel_size, **kwargs)
+
+    @profiled("draw.export")
+    def export(self, path, processes=1, chunk_size=64):
+        """
+        Parameters
+        ------------
+        path : str
+            video file (.mp4, .mkv, .avi, .mov, .webm, .gif) piped to ffmpeg,
+            otherwise the directory of the png sequence (frame_00000.png, ...)
+        processes : int
+            number of the rendering processes, default is 1 (in this process)
+        chunk_size : int
+            number of frames rendered by a process at once, default is 64
+
+        Returns
+        ---------
+        num_frames : int
+            number of the exported frames
+        """
+        chunks = [self.frame_indices[i:i + chunk_size] for i in range(0, len(self.frame_indices), chunk_size)]
+
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            self._export_video(path, chunks, processes)
+        else:
+            os.makedirs(path, exist_ok=True)
+            tasks = [(chunk, path, sum(len(c) for c in chunks[:i])) for i, chunk in enumerate(chunks)]
+            for _ in self._map(_write_png_chunk, tasks, processes):
+                pass
+
+        return len(self.frame_indices)
+
+    def _export_video(self, path, chunks, processes):
+        """
+        Parameters
+        ------------
+        path : str
+            path of the video
+        chunks : list of numpy.ndarray
+            time steps of each chunk
+        processes : int
+            number of the rendering processes
+        """
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg is not found, export to a directory to write png frames")
+
+        renderer = FrameRenderer(self.settings)
+        width, height = renderer.width, renderer.height
+
+        command = [ffmpeg, "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "rgba", "-s", "{0}x{1}".format(width, height),
+                   "-r", "{0:.6f}".format(self.fps), "-i", "-"]
+        if not path.lower().endswith(".gif"):
+            command += ["-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        command.append(path)
+
+        writer = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        results = self._map(_render_chunk, chunks, processes, renderer=renderer)
+        broken = False
+
+        try:
+            # the chunks arrive in order, only a few chunks are kept in memory
+            for frames in results:
+                writer.stdin.write(frames)
+        except BrokenPipeError:
+            broken = True # ffmpeg has exited, its error is raised below
+        finally:
+            results.close()
+            try:
+                writer.stdin.close()
+            except BrokenPipeError:
+                broken = True
+            error = writer.stderr.read()
+            writer.wait()
+
+        if broken or writer.returncode != 0:
+            raise RuntimeError("ffmpeg failed with the code {0} : {1}".format(
+                writer.returncode, error.decode(errors="replace").strip()))
+
+    def _map(self, func, tasks, processes, renderer=None):
+        """
+        Parameters
+        ------------
+        func : callable
+            worker function of a task
+        tasks : list
+        processes : int
+        renderer : FrameRenderer class, optional
+            renderer already made in this process, reused when processes is 1
+
+        Returns
+        ---------
+        results : iterator
+            results of the tasks in order
+        """
+        if processes == 1:
+            _init_worker(self.settings, renderer)
+            return _run_serial(func, tasks)
+
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self.settings, ))
+        return _close_after(pool, pool.imap(func, tasks))
+
+def _close_after(pool, results):
+    """yield the results and close the pool
+    """
+    try:
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+
+_renderer = None # renderer of each worker process
+
+def _run_serial(func, tasks):
+    """yield the results in this process and drop the renderer
+    """
+    global _renderer
+    try:
+        for task in tasks:
+            yield func(task)
+    finally:
+        _renderer = None
+
+def _init_worker(settings, renderer=None):
+    global _renderer
+    _renderer = FrameRenderer(settings) if renderer is None else renderer
+
+def _render_chunk(indices):
+    """
+    Parameters
+    ------------
+    indices : numpy.ndarray
+        time steps of the frames
+
+    Returns
+    ---------
+    frames : bytes
+        RGBA pixels of the frames
+    """
+    return b"".join(bytes(_renderer.render(i)) for i in indices)
+
+def _write_png_chunk(task):
+    """
+    Parameters
+    ------------
+    task : tuple
+        (time steps of the frames, directory, number of the first frame)
+    """
+    indices, directory, first = task
+
+    for number, i in enumerate(indices, start=first):
+        _renderer.save_png(i, os.path.join(directory, "frame_{0:05d}.png".format(number)))
+
+def main():
+    parser = argparse.ArgumentParser(description="export the animation from a saved history without a display")
+    parser.add_argument("history", help="trajectory file saved by main.py --save-history (.traj)")
+    parser.add_argument("output", help="video path (.mp4, .gif, ...) or directory of png frames")
+    parser.add_argument("--fps", type=float, default=30.)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=540)
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    from common.trajectory_io import load_pendulum_trajectory
+
+    pendulum = load_pendulum_trajectory(args.history)
+    exporter = FrameExporter.from_pendulum(pendulum, pendulum.dt, fps=args.fps, width=args.width, height=args.height)
+
+    num_frames = exporter.export(args.output, processes=args.processes)
+    print("{0} frames are exported to {1}".format(num_frames, args.output))
+
+if __name__ == '__main__':
+    main()
@@ -1,67 +1,351 @@
 # main program of pendulum control
-import numpy as np
-import matplotlib.pyplot as plt
+import argparse
+import json
 import math
+import sys
+import numpy as np
 
-from simulator import SinglePendulumWithCart
+from simulator import SinglePendulumWithCart, LinearSinglePendulumWithCart
 from controllers.LQR import LQR
 from controllers.SDRE import SDRE
-from anim_drawer import AnimDrawer
-from fig_drawer import FigDrawer
+from controllers.MPC import MPC
+from controllers.SwingUp import SwingUp
+from common.metrics import calc_summary_metrics
+from common.trajectory_io import save_pendulum_trajectory
+from common.profiling import profiler
+from common.diagnostics import DiagnosticsRecorder, LEVELS
+from common.events import default_events
+from common.reference import REFERENCES, check_reference_params, make_reference
 
-def main():
-    print("please set initial state of pendulum angle theta (cart position z is always 0.0)")
+CONTROLLERS = {"LQR": LQR, "SDRE": SDRE, "MPC": MPC, "SwingUp": SwingUp}
 
-    th = float(input())
+# setting of one simulation, every key can be overwritten by the config file or the command line
+DEFAULT_SCENARIO = {
+    "name": "pendulum",
+    "controller": "LQR",
+    "init_z": -0.5,
+    "init_th": 0.0,
+    "init_v_z": 0.0,
+    "init_v_th": -100. * math.pi / 180.,
+    "Q": None, # diagonal or full matrix, None is the default weight of the controller
+    "R": None,
+    "weights": None, # weights and schedule of SDRE, keys of controllers.SDRE.DEFAULT_WEIGHTS
+    "discrete": False, # LQR designed in discrete time at dt
+    "plant": "nonlinear", # "nonlinear" or "linear" (zero order hold discretized linearized model)
+    "horizon": 100, # prediction horizon of MPC in steps
+    "input_limit": 10.0, # bound of |f| of MPC, None is unbounded
+    "z_limit": None, # bound of |z| of MPC, None is unbounded
+    "dt": 0.01,
+    "steps": 2000,
+    "reference": None, # reference of cart position, "step", "sine", "ramp", "spline" or "file", None is 0.0
+    "reference_params": {}, # parameters of the reference generator, e.g. {"amplitude": 0.2, "period": 10.0}
+    "early_stop": False, # stop at the settled, fallen, track limit or non finite event
+    "track_limit": 5.0, # half length of the track of the early stop in meters
+    "render": False, # show the animation and figures in the window
+    "save_animation": None, # path of the animation, e.g. pendulum.mp4
+    "save_figure": None, # path of the figure, e.g. pendulum.png
+    "save_history": None, # path of the trajectory file, e.g. pendulum.traj
+    "export_video": None, # headless export, video path (e.g. pendulum.mp4) or directory of png frames
+    "export_fps": 30.,
+    "export_processes": 1,
+    "profile": None, # path of the trace file of the timers, e.g. pendulum_trace.json
+    "diagnostics": "off", # level of the SDRE and MPC diagnostics, "off", "gain" or "full"
+    "diagnostics_every": 1, # one of every steps is recorded
+    "save_diagnostics": None, # path of the diagnostics, e.g. pendulum_diagnostics.npz
+}
+
+def make_scenario(**settings):
+    """
+    Parameters
+    ------------
+    settings : dict
+        keys of DEFAULT_SCENARIO
+
+    Returns
+    ---------
+    scenario : dict
+        DEFAULT_SCENARIO overwritten by the settings
+    """
+    unknown = set(settings) - set(DEFAULT_SCENARIO)
+    if unknown:
+        raise ValueError("unknown scenario keys : {0}".format(sorted(unknown)))
+
+    scenario = dict(DEFAULT_SCENARIO)
+    scenario.update(settings)
+
+    if scenario["controller"] not in CONTROLLERS:
+        raise ValueError("you should chose controller from LQR , SDRE , MPC , SwingUp!!")
+
+    if scenario["plant"] not in ("nonlinear", "linear"):
+        raise ValueError("plant should be chosen from nonlinear, linear")
+
+    if scenario["reference"] is not None:
+        check_reference_params(scenario["reference"], scenario["reference_params"])
+
+    return scenario
+
+def load_scenarios(path):
+    """
+    Parameters
+    ------------
+    path : str
+        path of the json config file,
+        {"defaults": {...}, "scenarios": [{...}, ...]}
+
+    Returns
+    ---------
+    scenarios : list of dict
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    defaults = config.get("defaults", {})
+    scenarios = []
+
+    for i, settings in enumerate(config.get("scenarios", [{}])):
+        merged = dict(defaults)
+        merged.setdefault("name", "scenario_{0}".format(i))
+        merged.update(settings)
+        scenarios.append(make_scenario(**merged))
+
+    return scenarios
+
+def make_controller(scenario, pendulum):
+    """
+    Parameters
+    ------------
+    scenario : dict
+    pendulum : SinglePendulumWithCart class
+
+    Returns
+    ---------
+    controller : controller class
+    """
+    Q = scenario["Q"]
+    if Q is not None:
+        Q = np.array(Q, dtype=np.float64)
+        Q = np.diag(Q) if Q.ndim == 1 else Q
+
+    diagnostics = None
+    if scenario["diagnostics"] != "off":
+        diagnostics = DiagnosticsRecorder(scenario["diagnostics"], every=scenario["diagnostics_every"])
+
+    if scenario["controller"] == "SDRE":
+        return SDRE(pendulum, Q=Q, R=scenario["R"], diagnostics=diagnostics, weights=scenario["weights"])
+
+    if scenario["controller"] == "MPC":
+        return MPC(pendulum, Q=Q, R=scenario["R"], horizon=scenario["horizon"], dt=scenario["dt"],
+                   input_limit=scenario["input_limit"], z_limit=scenario["z_limit"], diagnostics=diagnostics)
+
+    if scenario["controller"] == "LQR" and scenario["discrete"]:
+        return LQR(pendulum, Q=Q, R=scenario["R"], dt=scenario["dt"])
+
+    return CONTROLLERS[scenario["controller"]](pendulum, Q=Q, R=scenario["R"])
+
+def run_scenario(scenario):
+    """
+    Parameters
+    ------------
+    scenario : dict
+
+    Returns
+    ---------
+    pendulum : SinglePendulumWithCart class
+        simulated pendulum including the histories
+    controller : controller class
+    """
+    plant_class = LinearSinglePendulumWithCart if scenario["plant"] == "linear" else SinglePendulumWithCart
+
+    pendulum = plant_class(init_z=scenario["init_z"], init_th=scenario["init_th"],
+                           init_v_z=scenario["init_v_z"], init_v_th=scenario["init_v_th"],
+                           history_capacity=scenario["steps"])
+
+    controller = make_controller(scenario, pendulum)
+
+    sampling_time = scenario["dt"]
 
-    # pendulum = SinglePendulumWithCart(init_z=-0.1, init_th= -20. * math.pi / 180., init_v_th= 50. * math.pi / 180.)
+    reference = None
+    if scenario["reference"] is not None:
+        reference = make_reference(scenario["reference"], scenario["steps"], sampling_time,
+                                   **scenario["reference_params"])
 
-    pendulum = SinglePendulumWithCart(init_z=-0.5, init_th= th, init_v_th= -100. * math.pi / 180.)
+    if scenario["early_stop"]:
+        # the swing up starts from the fallen angle
+        th_limit = math.inf if scenario["controller"] == "SwingUp" else math.pi / 2.
+        events = default_events(th_limit=th_limit, z_limit=scenario["track_limit"])
+        if reference is not None:
+            events = [event for event in events if event.name != "settled"] # the reference moves
+        pendulum.set_events(events)
+
+    for step in range(scenario["steps"]):
+
+        if reference is None:
+            f = controller.calc_input(pendulum)
+        else:
+            reference_z, reference_v_z, reference_a_z = reference.at(step)
+            f = controller.calc_input(pendulum, reference_z, reference_v_z=reference_v_z,
+                                      reference_a_z=reference_a_z)
+            pendulum.reference_z = reference.at(step + 1)[0] # recorded with the next sample
+
+        pendulum.update_state(input_f=f[0, 0], dt=sampling_time)
+
+        if pendulum.terminal_event is not None:
+            break
+
+    return pendulum, controller
+
+def output_scenario(scenario, pendulum, controller):
+    """
+    save and draw the result of the scenario
+
+    Parameters
+    ------------
+    scenario : dict
+    pendulum : SinglePendulumWithCart class
+    controller : controller class
+    """
+    if scenario["save_history"] is not None:
+        save_pendulum_trajectory(scenario["save_history"], pendulum, scenario["dt"], controller=controller,
+                                 metadata={"name": scenario["name"]})
+
+    if scenario["save_diagnostics"] is not None and getattr(controller, "diagnostics", None) is not None:
+        controller.diagnostics.save(scenario["save_diagnostics"])
+
+    # the drawers import matplotlib, simulation only runs do not pay for it
+    if scenario["export_video"] is not None:
+        from frame_exporter import FrameExporter
+
+        exporter = FrameExporter.from_pendulum(pendulum, scenario["dt"], fps=scenario["export_fps"])
+        exporter.export(scenario["export_video"], processes=scenario["export_processes"])
+
+    if scenario["render"] or scenario["save_animation"] is not None:
+        from anim_drawer import AnimDrawer
+
+        anim = AnimDrawer(pendulum)
+        anim.draw_anim(interval=int(round(scenario["dt"] * 1000)),
+                       save_path=scenario["save_animation"], show=scenario["render"])
+
+    if scenario["render"] or scenario["save_figure"] is not None:
+        from fig_drawer import FigDrawer
+
+        fig = FigDrawer(pendulum, controller)
+        fig.draw_fig(dt=scenario["dt"], save_path=scenario["save_figure"], show=scenario["render"])
+
+def interactive_scenario():
+    """
+    ask the setting of the simulation by the prompts
+
+    Returns
+    ---------
+    scenario : dict
+    """
+    print("please set initial state of pendulum angle theta (cart position z is always 0.0)")
+    th = float(input())
 
     print("please chose controller ! you can chose [LQR], [SDRE]")
     controller = input()
 
-    if controller == "LQR":
-        controller = LQR(pendulum)
-    elif controller == "SDRE":
-        controller = SDRE(pendulum) 
-    else:
-        raise ValueError("you should chose controller from LQR , SDRE!!")
+    print('save_animation?')
+    save_animation = None
+    if int(input()):
+        print('animation_number?')
+        save_animation = 'pendulum_{0}.mp4'.format(int(input()))
+
+    return make_scenario(init_th=th, controller=controller, render=True, save_animation=save_animation)
+
+def parse_args(argv):
+    """
+    Parameters
+    ------------
+    argv : list of str
+        command line arguments
 
-    simulation_time = 2000
-    sampling_time = 0.01
+    Returns
+    ---------
+    scenarios : list of dict
+    """
+    parser = argparse.ArgumentParser(description="simulate the pendulum with cart")
+    parser.add_argument("--config", help="json file of the scenarios, the other options overwrite every scenario")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS))
+    parser.add_argument("--init-z", type=float, help="initial cart position [m]")
+    parser.add_argument("--init-th", type=float, help="initial pendulum angle [rad]")
+    parser.add_argument("--init-v-z", type=float, help="initial cart velocity [m/s]")
+    parser.add_argument("--init-v-th", type=float, help="initial pendulum angle velocity [rad/s]")
+    parser.add_argument("--Q", type=float, nargs=4, help="diagonal of the weight Q")
+    parser.add_argument("--R", type=float, help="weight R")
+    parser.add_argument("--discrete", action="store_true", default=None,
+                        help="design LQR in discrete time at the sampling time")
+    parser.add_argument("--plant", choices=["nonlinear", "linear"], help="simulated model")
+    parser.add_argument("--horizon", type=int, help="prediction horizon of MPC [steps]")
+    parser.add_argument("--input-limit", type=float, help="bound of |f| of MPC [N]")
+    parser.add_argument("--z-limit", type=float, help="bound of |z| of MPC [m]")
+    parser.add_argument("--dt", type=float, help="sampling time [s]")
+    parser.add_argument("--steps", type=int, help="number of simulation steps")
+    parser.add_argument("--reference", choices=sorted(REFERENCES), help="reference of cart position")
+    parser.add_argument("--reference-params", type=json.loads,
+                        help='parameters of the reference as json, e.g. \'{"amplitude": 0.2}\'')
+    parser.add_argument("--early-stop", action="store_true", default=None,
+                        help="stop when the pendulum has settled, fallen, left the track or overflowed")
+    parser.add_argument("--track-limit", type=float, help="half length of the track of the early stop [m]")
+    parser.add_argument("--render", action="store_true", default=None, help="show the animation and figures")
+    parser.add_argument("--save-animation", help="path of the animation")
+    parser.add_argument("--save-figure", help="path of the figure")
+    parser.add_argument("--save-history", help="path of the trajectory file (.traj)")
+    parser.add_argument("--export-video", help="headless export, video path or directory of png frames")
+    parser.add_argument("--export-fps", type=float, help="frame rate of the headless export")
+    parser.add_argument("--export-processes", type=int, help="number of the rendering processes")
+    parser.add_argument("--diagnostics", choices=sorted(LEVELS, key=LEVELS.get), help="level of the SDRE and MPC diagnostics")
+    parser.add_argument("--diagnostics-every", type=int, help="one of every steps is recorded")
+    parser.add_argument("--save-diagnostics", help="path of the diagnostics (.npz)")
+    parser.add_argument("--profile", help="time the simulation, control and drawing, path of the trace file (.json)")
+    args = parser.parse_args(argv)
 
-    reference_z_history = []
+    overrides = {key: value for key, value in vars(args).items() if key != "config" and value is not None}
+
+    if args.config is None:
+        return [make_scenario(**overrides)]
+
+    scenarios = load_scenarios(args.config)
+
+    return [make_scenario(**dict(scenario, **overrides)) for scenario in scenarios]
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv:
+        scenarios = parse_args(argv)
+    else:
+        scenarios = [interactive_scenario()]
 
-    for step in range(simulation_time):
-        
-        time = step * sampling_time
-        """
-        T = 10.0
-        reference_z = 0.2 * math.sin((2 * math.pi) / T * time)
-        reference_z_history.append(reference_z)
-        """
+    for scenario in scenarios:
+        if scenario["profile"] is not None:
+            profiler.reset()
+            profiler.enable()
 
-        reference_z = None
+        pendulum, controller = run_scenario(scenario)
 
-        f = controller.calc_input(pendulum, reference_z)
+        event = pendulum.terminal_event
+        # the swing up settles at th = 2 pi n
+        history_th = np.remainder(pendulum.history_th + math.pi, 2. * math.pi) - math.pi
+        metrics = calc_summary_metrics(pendulum.history_z, history_th, pendulum.history_input_f,
+                                       scenario["dt"], diverged=event is not None and event.name != "settled",
+                                       reference_z=pendulum.history_reference_z)
+        if scenario["reference"] is not None:
+            metrics["rms_error_z"] = float(np.sqrt(np.mean(pendulum.history_error_z**2)))
+        print("{0} : {1}".format(scenario["name"], ", ".join("{0} = {1:.4g}".format(key, value)
+                                                             for key, value in metrics.items())))
 
-        # f[0, 0] = 0.0
-        """
-        if step == 1000:
-            f[0, 0] = 100.0
-        """
-        
-        pendulum.update_state(input_f=f[0, 0], dt=0.01)
+        if event is not None:
+            print("{0} : stopped by {1} at {2:.4g} [s] after {3} steps".format(scenario["name"], event.name,
+                                                                               event.time, len(pendulum.history)))
 
-    anim = AnimDrawer(pendulum)
-    anim.draw_anim(interval=10)
+        output_scenario(scenario, pendulum, controller)
 
-    # plt.plot(range(len(reference_z_history)), reference_z_history)
-    # plt.show()
-    
-    fig = FigDrawer(pendulum, controller)
-    fig.draw_fig(dt=0.01)
+        if scenario["profile"] is not None:
+            profiler.enable(False)
+            print(profiler.report())
+            profiler.save_trace(scenario["profile"])
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,323 @@
+# real time paced control loop with deadline instrumentation
+import argparse
+import math
+import multiprocessing
+import time
+import numpy as np
+
+from simulator import SinglePendulumWithCart
+from controllers.LQR import LQR
+from controllers.SDRE import SDRE
+from controllers.MPC import MPC
+
+CONTROLLERS = {"LQR": LQR, "SDRE": SDRE, "MPC": MPC}
+
+class LocalPlant():
+    """simulated plant in this process
+
+    Attributes
+    ------------
+    pendulum : SinglePendulumWithCart class
+    dt : float in seconds
+        period of the plant ticks
+    input_f : float in N
+        input held by the actuator
+    """
+
+    def __init__(self, init_state, dt=0.01):
+        """
+        Parameters
+        ------------
+        init_state : array-like
+            [z, th, v_z, v_th]
+        dt : float in seconds
+            period of the plant ticks, default is 0.01
+        """
+        self.pendulum = SinglePendulumWithCart(*init_state)
+        self.dt = dt
+        self.input_f = 0.0
+
+    def read_state(self):
+        """
+        Returns
+        ---------
+        state : tuple of float
+            [z, th, v_z, v_th]
+        """
+        return self.pendulum.z, self.pendulum.th, self.pendulum.v_z, self.pendulum.v_th
+
+    def hold(self, num_ticks):
+        """
+        Parameters
+        ------------
+        num_ticks : int
+            number of the periods the plant runs with the held input
+        """
+        self.pendulum.update_state(input_f=self.input_f, dt=self.dt, num_steps=num_ticks)
+
+    def apply_input(self, input_f, hold_ticks=1):
+        """
+        Parameters
+        ------------
+        input_f : float in N
+            new input of the actuator
+        hold_ticks : int
+            number of the periods the previous input is held before input_f is applied,
+            the ticks from the state sample to the end of the computation, default is 1
+        """
+        self.hold(hold_ticks)
+        self.input_f = input_f
+
+    def close(self):
+        pass
+
+class PlantProcess():
+    """simulated plant in another process, a stand-in for the hardware
+
+    Attributes
+    ------------
+    dt : float in seconds
+        period of the plant ticks
+
+    Notes
+    ------------
+    the plant receives the input and returns the state through a pipe,
+    so the loop pays the inter process communication like a hardware interface
+    """
+
+    def __init__(self, init_state, dt=0.01):
+        """
+        Parameters
+        ------------
+        init_state : array-like
+            [z, th, v_z, v_th]
+        dt : float in seconds
+            period of the plant ticks, default is 0.01
+        """
+        self.dt = dt
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_plant_server, args=(child_connection, list(init_state), dt),
+                                                daemon=True)
+        self._process.start()
+
+    def read_state(self):
+        self._connection.send(("state", None))
+        return self._connection.recv()
+
+    def apply_input(self, input_f, hold_ticks=1):
+        self._connection.send(("input", (float(input_f), int(hold_ticks))))
+
+    def close(self):
+        """
+        Returns
+        ---------
+        history : numpy.ndarray, shape(5, steps)
+            time history of [z, th, v_z, v_th, input_f] in the plant process
+        """
+        self._connection.send(("close", None))
+        history = self._connection.recv()
+        self._process.join()
+
+        return history
+
+def _plant_server(connection, init_state, dt):
+    """serve the plant until the close command
+    """
+    plant = LocalPlant(init_state, dt)
+
+    while True:
+        command, value = connection.recv()
+
+        if command == "state":
+            connection.send(plant.read_state())
+        elif command == "input":
+            plant.apply_input(*value)
+        else:
+            connection.send(plant.pendulum.history.as_array()[:5].copy())
+            return
+
+class RealtimeLoop():
+    """control loop ticking at a fixed period on the monotonic clock
+
+    Attributes
+    ------------
+    controller : controller class
+    plant : LocalPlant or PlantProcess class
+    period : float in seconds
+        sampling period, which is the deadline of each step
+    latencies : numpy.ndarray
+        compute time of calc_input of each step
+    jitters : numpy.ndarray
+        delay of the wake up from the scheduled tick of each step
+    step_times : numpy.ndarray
+        time from the scheduled tick to the input applied of each step
+    deadline_misses : int
+        number of steps which applied the input after the period
+
+    Notes
+    ------------
+    the ticks are scheduled on absolute times (start + k * period), so the error does not accumulate,
+    a step which overruns is not repeated, the next tick is the first future one
+    the plant holds the previous input until the tick after the computation ends
+    (one period, or more over an overrun) and applies the new input from it, like a hardware actuator
+    """
+
+    def __init__(self, controller, plant, period=0.01, spin=0.0005, clock=time.perf_counter, sleep=time.sleep):
+        """
+        Parameters
+        ------------
+        controller : controller class
+        plant : LocalPlant or PlantProcess class
+        period : float in seconds
+            sampling period, default is 0.01
+        spin : float in seconds
+            the last part of the wait is busy waiting for the precise wake up, default is 0.0005
+        clock : callable
+            monotonic clock in seconds, default is time.perf_counter
+        sleep : callable
+            sleep of the clock, default is time.sleep
+        """
+        self.controller = controller
+        self.plant = plant
+        self.period = period
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+
+        # the controller reads the state from this pendulum
+        self.model = SinglePendulumWithCart(history_capacity=1)
+
+        self.latencies = np.zeros(0)
+        self.jitters = np.zeros(0)
+        self.step_times = np.zeros(0)
+        self.deadline_misses = 0
+        self.skipped_ticks = 0
+
+    def run(self, steps, reference_z=None, warmup=1):
+        """
+        Parameters
+        ------------
+        steps : int
+            number of the control steps
+        reference_z : float, optional
+            reference of cart position passed to the controller
+        warmup : int
+            number of the untimed calls of calc_input before the first tick,
+            the first call pays the lazy imports and the gain cache, default is 1
+
+        Returns
+        ---------
+        summary : dict
+            statistics of the latency, jitter and deadline misses
+        """
+        latencies = np.empty(steps)
+        jitters = np.empty(steps)
+        step_times = np.empty(steps)
+        self.deadline_misses = 0
+        self.skipped_ticks = 0
+
+        self.model.z, self.model.th, self.model.v_z, self.model.v_th = self.plant.read_state()
+        for _ in range(warmup):
+            self.controller.calc_input(self.model, reference_z)
+
+        clock = self.clock
+        start = clock() + self.period
+        tick = 0
+
+        for step in range(steps):
+            scheduled = start + tick * self.period
+            self._wait_until(scheduled, clock)
+            wake = clock()
+
+            self.model.z, self.model.th, self.model.v_z, self.model.v_th = self.plant.read_state()
+
+            compute_start = clock()
+            f = self.controller.calc_input(self.model, reference_z)[0, 0]
+            compute_end = clock()
+
+            # the next tick is the first one in the future, the previous input is held until it
+            next_tick = tick + 1
+            if compute_end > start + next_tick * self.period:
+                next_tick = int(math.ceil((compute_end - start) / self.period))
+                self.skipped_ticks += next_tick - tick - 1
+
+            self.plant.apply_input(f, next_tick - tick)
+            done = clock()
+
+            latencies[step] = compute_end - compute_start
+            jitters[step] = wake - scheduled
+            step_times[step] = done - scheduled
+
+            if done > scheduled + self.period:
+                self.deadline_misses += 1
+
+            tick = next_tick
+
+        self.latencies = latencies
+        self.jitters = jitters
+        self.step_times = step_times
+
+        return self.summary()
+
+    def _wait_until(self, deadline, clock):
+        """
+        Parameters
+        ------------
+        deadline : float in seconds
+            time of the clock to wake up
+        clock : callable
+        """
+        remaining = deadline - clock() - self.spin
+        if remaining > 0.0:
+            self.sleep(remaining)
+
+        while clock() < deadline:
+            pass
+
+    def summary(self):
+        """
+        Returns
+        ---------
+        summary : dict
+            p50, p99 and max of the latency, jitter and step time in seconds,
+            number of the deadline misses and skipped ticks
+        """
+        summary = {"steps": len(self.latencies), "period": self.period,
+                   "deadline_misses": self.deadline_misses, "skipped_ticks": self.skipped_ticks}
+
+        for name, values in (("latency", self.latencies), ("jitter", self.jitters), ("step_time", self.step_times)):
+            if len(values) == 0:
+                continue
+            summary[name + "_p50"] = float(np.percentile(values, 50))
+            summary[name + "_p99"] = float(np.percentile(values, 99))
+            summary[name + "_max"] = float(np.max(values))
+
+        return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="real time paced control loop against a simulated plant")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="LQR")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--period", type=float, default=0.01, help="sampling period [s]")
+    parser.add_argument("--plant", choices=["local", "process"], default="process",
+                        help="simulated plant in this process or in another process")
+    parser.add_argument("--init-th", type=float, default=0.1, help="initial pendulum angle [rad]")
+    args = parser.parse_args()
+
+    init_state = [0.0, args.init_th, 0.0, 0.0]
+    plant = PlantProcess(init_state, args.period) if args.plant == "process" else LocalPlant(init_state, args.period)
+
+    controller = CONTROLLERS[args.controller](SinglePendulumWithCart(*init_state))
+
+    loop = RealtimeLoop(controller, plant, period=args.period)
+    summary = loop.run(args.steps)
+    plant.close()
+
+    for key, value in summary.items():
+        if isinstance(value, float) and key != "period":
+            print("{0} = {1:.3f} [ms]".format(key, value * 1000.))
+        else:
+            print("{0} = {1}".format(key, value))
+
+if __name__ == '__main__':
+    main()
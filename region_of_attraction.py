@@ -0,0 +1,479 @@
+# region of attraction of the pendulum controllers over a grid of initial states
+import argparse
+import hashlib
+import json
+import math
+import os
+import numpy as np
+
+from simulator import SinglePendulumWithCart, BatchSinglePendulumWithCart
+from controllers.LQR import LQR
+from controllers.SDRE import SDRE
+from controllers.gain_schedule import SDREGainTable
+
+# controllers with calc_inputs, which advance all cells at once
+CONTROLLERS = {"LQR": LQR, "SDRE": SDRE}
+
+STATE_NAMES = ["z", "th", "v_z", "v_th"]
+
+# outcome of each cell
+CONVERGED = 1
+UNDECIDED = 0 # neither converged nor diverged within the steps
+DIVERGED = -1
+
+DEFAULT_SETTINGS = {
+    "steps": 3000,
+    "dt": 0.01,
+    "th_limit": math.pi / 2., # diverged if |th| exceeds it
+    "z_limit": 5.0, # diverged if |z| exceeds it
+    "th_tolerance": 0.02, # converged if the state stays in the tolerances for hold_steps
+    "z_tolerance": 0.05,
+    "velocity_tolerance": 0.05,
+    "hold_steps": 10,
+    "sdre_table": True, # SDRE gains are interpolated from SDREGainTable
+    "sdre_v_th_range": (-10.0, 10.0), # range of the angle velocity of the table in rad/s
+}
+
+def make_grid(z=0.0, th=(-1.2, 1.2, 41), v_z=0.0, v_th=(-6.0, 6.0, 41)):
+    """
+    Parameters
+    ------------
+    z, th, v_z, v_th : float or tuple of (low, high, num)
+        fixed initial value or evenly spaced values of each state
+
+    Returns
+    ---------
+    axes : dict
+        name : numpy.ndarray, values of each state
+    states : numpy.ndarray, shape(cells, 4)
+        initial states of the cells, each row is [z, th, v_z, v_th],
+        the cells are in the order of numpy.meshgrid(z, th, v_z, v_th, indexing="ij")
+
+    Notes
+    --------
+    a grid of 2 * num - 1 points over the same range contains the points of num,
+    so the refined grid reuses all cells of the coarse one in the cache
+    """
+    axes = {}
+
+    for name, value in zip(STATE_NAMES, (z, th, v_z, v_th)):
+        if np.isscalar(value):
+            axes[name] = np.array([value], dtype=np.float64)
+        else:
+            low, high, num = value
+            axes[name] = np.linspace(low, high, int(num))
+
+    grids = np.meshgrid(*[axes[name] for name in STATE_NAMES], indexing="ij")
+    states = np.stack([grid.ravel() for grid in grids], axis=1)
+
+    return axes, states
+
+def make_controller(name, pendulum, settings):
+    """
+    Parameters
+    ------------
+    name : str
+        "LQR" or "SDRE"
+    pendulum : SinglePendulumWithCart class
+        nominal plant of the design
+    settings : dict
+        DEFAULT_SETTINGS updated by the user
+
+    Returns
+    ---------
+    controller : LQR or SDRE class
+    """
+    if name not in CONTROLLERS:
+        raise ValueError("controller should be chosen from {0}".format(", ".join(CONTROLLERS)))
+
+    controller = CONTROLLERS[name](pendulum)
+
+    if name == "SDRE" and settings["sdre_table"]:
+        # the states out of the table are solved exactly
+        controller.gain_table = SDREGainTable(controller, pendulum, th_range=(-settings["th_limit"], settings["th_limit"]),
+                                              v_th_range=settings["sdre_v_th_range"], check_error=False)
+
+    return controller
+
+def simulate_cells(controller, pendulum, states, settings):
+    """
+    Parameters
+    ------------
+    controller : LQR or SDRE class
+    pendulum : SinglePendulumWithCart class
+        parameters of the plant
+    states : numpy.ndarray, shape(cells, 4)
+        initial states, each row is [z, th, v_z, v_th]
+    settings : dict
+        DEFAULT_SETTINGS updated by the user
+
+    Returns
+    ---------
+    outcomes : numpy.ndarray, shape(cells, ), int8
+        CONVERGED, UNDECIDED or DIVERGED
+    times : numpy.ndarray, shape(cells, ) in seconds
+        time when the cell converged or diverged, the simulation time if undecided
+
+    Notes
+    --------
+    all cells are advanced as one batch, the cells are removed from the batch
+    as soon as they converge or diverge, so the cost follows the slowest cells
+    """
+    states = np.asarray(states, dtype=np.float64).reshape(-1, 4)
+    num = states.shape[0]
+
+    outcomes = np.full(num, UNDECIDED, dtype=np.int8)
+    times = np.full(num, settings["steps"] * settings["dt"])
+
+    batch = BatchSinglePendulumWithCart(states, record_history=False)
+    batch.set_params(**{key: getattr(pendulum, key) for key in ("p_m", "p_l", "p_j", "p_mu", "c_m", "c_mu", "g")})
+
+    active = np.arange(num) # cell index of each row of the batch
+    held = np.zeros(num, dtype=np.int64) # consecutive steps in the tolerances
+
+    tolerances = np.array([settings["z_tolerance"], settings["th_tolerance"],
+                           settings["velocity_tolerance"], settings["velocity_tolerance"]])
+
+    for step in range(1, settings["steps"] + 1):
+        f, failed = _calc_inputs(controller, batch)
+        batch.update_state(input_f=f, dt=settings["dt"])
+
+        current = batch.states
+        diverged = failed | ~np.isfinite(current).all(axis=1) \
+            | (np.abs(current[:, 1]) > settings["th_limit"]) | (np.abs(current[:, 0]) > settings["z_limit"])
+
+        inside = (np.abs(current) < tolerances).all(axis=1)
+        held = np.where(inside, held + 1, 0)
+        converged = ~diverged & (held >= settings["hold_steps"])
+
+        outcomes[active[diverged]] = DIVERGED
+        outcomes[active[converged]] = CONVERGED
+        times[active[diverged | converged]] = step * settings["dt"]
+
+        keep = ~(diverged | converged)
+        if not keep.all():
+            active = active[keep]
+            held = held[keep]
+            batch.states = current[keep]
+            batch.num = len(active)
+
+        if len(active) == 0:
+            break
+
+    return outcomes, times
+
+def _calc_inputs(controller, batch):
+    """
+    Returns
+    ---------
+    f : numpy.ndarray, shape(N, ) in N
+        inputs of the cells, zero where the controller failed
+    failed : numpy.ndarray, shape(N, ), bool
+        True where the Riccati equation has no solution
+    """
+    try:
+        return controller.calc_inputs(batch), np.zeros(batch.num, dtype=bool)
+    except (ValueError, np.linalg.LinAlgError):
+        pass
+
+    # find the failed cells one by one, only the steps which have them pay for it
+    f = np.zeros(batch.num)
+    failed = np.zeros(batch.num, dtype=bool)
+
+    for i in range(batch.num):
+        try:
+            f[i] = controller.calc_inputs(batch, states=batch.states[i:i + 1])[0]
+        except (ValueError, np.linalg.LinAlgError):
+            failed[i] = True
+
+    return f, failed
+
+class BasinCache():
+    """
+    store of the simulated cells of one controller and settings
+
+    Attributes
+    ------------
+    path : str or None
+        if not None, the cells are stored in this .npz file
+    key : str
+        hash of the controller, plant parameters and settings
+    cells : dict
+        rounded initial state : (outcome, time)
+
+    Notes
+    --------
+    the cells are keyed by the initial state rounded to the decimals,
+    so the grids of different resolutions share the common cells
+    a file of the other key is ignored and overwritten
+    """
+
+    def __init__(self, path=None, key="", decimals=9):
+        """
+        Parameters
+        ------------
+        path : str, optional
+            path of the .npz file, default is None (memory only)
+        key : str
+            hash of the controller, plant parameters and settings, default is ""
+        decimals : int
+            decimals of the rounded initial state, default is 9
+        """
+        self.path = path
+        self.key = key
+        self.decimals = decimals
+        self.cells = {}
+
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def make_key(name, pendulum, settings):
+        """
+        Parameters
+        ------------
+        name : str
+            name of the controller
+        pendulum : SinglePendulumWithCart class
+            nominal plant of the design
+        settings : dict
+
+        Returns
+        ---------
+        key : str
+            hash of the name, parameters of the plant and settings
+        """
+        params = [pendulum.p_m, pendulum.p_l, pendulum.p_j, pendulum.p_mu, pendulum.c_m, pendulum.c_mu, pendulum.g]
+
+        sha = hashlib.sha1()
+        sha.update(json.dumps({"controller": name, "params": params, "settings": settings}, sort_keys=True).encode())
+
+        return sha.hexdigest()
+
+    def _load(self):
+        with np.load(self.path) as data:
+            if str(data["key"]) != self.key:
+                return
+
+            for state, outcome, time in zip(data["states"], data["outcomes"], data["times"]):
+                self.cells[tuple(state)] = (int(outcome), float(time))
+
+    def _round(self, states):
+        return [tuple(state) for state in np.round(states, self.decimals) + 0.0] # + 0.0 drops -0.0
+
+    def lookup(self, states):
+        """
+        Parameters
+        ------------
+        states : numpy.ndarray, shape(cells, 4)
+
+        Returns
+        ---------
+        outcomes : numpy.ndarray, shape(cells, ), int8
+        times : numpy.ndarray, shape(cells, ) in seconds
+        missing : numpy.ndarray, shape(cells, ), bool
+            True where the cell is not stored
+        """
+        outcomes = np.zeros(len(states), dtype=np.int8)
+        times = np.full(len(states), np.nan)
+        missing = np.ones(len(states), dtype=bool)
+
+        for i, cell in enumerate(self._round(states)):
+            stored = self.cells.get(cell)
+            if stored is not None:
+                outcomes[i], times[i] = stored
+                missing[i] = False
+
+        return outcomes, times, missing
+
+    def update(self, states, outcomes, times):
+        """
+        Parameters
+        ------------
+        states : numpy.ndarray, shape(cells, 4)
+        outcomes : numpy.ndarray, shape(cells, )
+        times : numpy.ndarray, shape(cells, )
+        """
+        for cell, outcome, time in zip(self._round(states), outcomes, times):
+            self.cells[cell] = (int(outcome), float(time))
+
+    def save(self):
+        if self.path is None:
+            return
+
+        states = np.array(list(self.cells.keys()), dtype=np.float64).reshape(-1, 4)
+        values = list(self.cells.values())
+
+        # written to the temporary file first, an interrupted save does not break the cache
+        temporary = self.path + ".tmp.npz"
+        np.savez(temporary, key=self.key, states=states,
+                 outcomes=np.array([value[0] for value in values], dtype=np.int8),
+                 times=np.array([value[1] for value in values], dtype=np.float64))
+        os.replace(temporary, self.path)
+
+    def __len__(self):
+        return len(self.cells)
+
+def compute_basin(name, states, settings=None, pendulum=None, cache_dir=None, chunk=2048):
+    """
+    Parameters
+    ------------
+    name : str
+        "LQR" or "SDRE"
+    states : numpy.ndarray, shape(cells, 4)
+        initial states made by make_grid
+    settings : dict, optional
+        overwrites DEFAULT_SETTINGS
+    pendulum : SinglePendulumWithCart class, optional
+        plant, default is the nominal one
+    cache_dir : str, optional
+        directory of the cache files, default is None (no cache)
+    chunk : int
+        number of the cells simulated at once, the cache is saved after each chunk, default is 2048
+
+    Returns
+    ---------
+    result : dict
+        outcomes : numpy.ndarray, shape(cells, ), int8
+        times : numpy.ndarray, shape(cells, ) in seconds
+        simulated : int, number of the cells simulated in this call
+        cached : int, number of the cells served from the cache
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    pendulum = SinglePendulumWithCart() if pendulum is None else pendulum
+
+    key = BasinCache.make_key(name, pendulum, settings)
+    path = None if cache_dir is None else os.path.join(cache_dir, "{0}_{1}.npz".format(name, key[:16]))
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    cache = BasinCache(path, key=key)
+    outcomes, times, missing = cache.lookup(states)
+    missing_indices = np.flatnonzero(missing)
+
+    if len(missing_indices):
+        controller = make_controller(name, pendulum, settings)
+
+        for start in range(0, len(missing_indices), chunk):
+            indices = missing_indices[start:start + chunk]
+            outcomes[indices], times[indices] = simulate_cells(controller, pendulum, states[indices], settings)
+
+            cache.update(states[indices], outcomes[indices], times[indices])
+            cache.save()
+
+    return {"outcomes": outcomes, "times": times,
+            "simulated": len(missing_indices), "cached": len(states) - len(missing_indices)}
+
+def basin_map(axes, outcomes, x="th", y="v_th"):
+    """
+    Parameters
+    ------------
+    axes : dict
+        values of each state made by make_grid
+    outcomes : numpy.ndarray, shape(cells, )
+    x, y : str
+        states of the map, default is th and v_th
+
+    Returns
+    ---------
+    converged : numpy.ndarray, shape(len(axes[y]), len(axes[x]))
+        fraction of the converged cells over the other states
+    """
+    grid = np.reshape(outcomes == CONVERGED, [len(axes[name]) for name in STATE_NAMES])
+    others = tuple(i for i, name in enumerate(STATE_NAMES) if name not in (x, y))
+
+    converged = grid.mean(axis=others)
+    if STATE_NAMES.index(x) > STATE_NAMES.index(y):
+        return converged
+
+    return converged.T
+
+def draw_basins(axes, results, save_path=None, x="th", y="v_th"):
+    """
+    Parameters
+    ------------
+    axes : dict
+        values of each state made by make_grid
+    results : dict
+        name of the controller : result of compute_basin
+    save_path : str, optional
+        path of the image, default is None (show the window)
+    x, y : str
+        states of the map, default is th and v_th
+    """
+    import matplotlib
+    if save_path is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    labels = {"z": "z [m]", "th": "th [rad]", "v_z": "v_z [m/s]", "v_th": "v_th [rad/s]"}
+
+    fig, subplots = plt.subplots(1, len(results), figsize=(5 * len(results), 4.5), dpi=100, squeeze=False)
+
+    for subplot, (name, result) in zip(subplots[0], results.items()):
+        converged = basin_map(axes, result["outcomes"], x=x, y=y)
+        image = subplot.pcolormesh(axes[x], axes[y], converged, vmin=0., vmax=1., cmap="viridis", shading="nearest")
+        subplot.set_title("{0} ({1:.1f} % converged)".format(name, 100. * np.mean(result["outcomes"] == CONVERGED)))
+        subplot.set_xlabel(labels[x])
+        subplot.set_ylabel(labels[y])
+
+    fig.colorbar(image, ax=subplots[0].tolist(), label="converged fraction")
+
+    if save_path is None:
+        plt.show()
+    else:
+        fig.savefig(save_path)
+        plt.close(fig)
+
+def _axis(value):
+    """fixed value or (low, high, num) of the command line
+    """
+    if value is None:
+        return None
+    if len(value) == 1:
+        return value[0]
+    if len(value) == 3:
+        return (value[0], value[1], int(value[2]))
+
+    raise argparse.ArgumentTypeError("give a value or low high num")
+
+def main():
+    parser = argparse.ArgumentParser(description="region of attraction of the controllers over a grid of initial states")
+    parser.add_argument("--controllers", nargs="+", default=["LQR", "SDRE"], choices=sorted(CONTROLLERS))
+    parser.add_argument("--th", nargs="+", type=float, default=[-1.2, 1.2, 41],
+                        help="initial pendulum angle [rad], a value or low high num")
+    parser.add_argument("--v-th", nargs="+", type=float, default=[-6.0, 6.0, 41],
+                        help="initial pendulum angle velocity [rad/s], a value or low high num")
+    parser.add_argument("--z", nargs="+", type=float, default=[0.0],
+                        help="initial cart position [m], a value or low high num")
+    parser.add_argument("--v-z", nargs="+", type=float, default=[0.0],
+                        help="initial cart velocity [m/s], a value or low high num")
+    parser.add_argument("--steps", type=int, default=DEFAULT_SETTINGS["steps"], help="maximum simulation steps")
+    parser.add_argument("--dt", type=float, default=DEFAULT_SETTINGS["dt"], help="sampling time [s]")
+    parser.add_argument("--exact-sdre", action="store_true", help="solve the SDRE at every state without the gain table")
+    parser.add_argument("--cache-dir", default=".basin_cache", help="directory of the simulated cells, 'none' disables it")
+    parser.add_argument("--output", default="basin.png", help="path of the basin map, 'show' opens the window")
+    args = parser.parse_args()
+
+    axes, states = make_grid(z=_axis(args.z), th=_axis(args.th), v_z=_axis(args.v_z), v_th=_axis(args.v_th))
+    settings = {"steps": args.steps, "dt": args.dt, "sdre_table": not args.exact_sdre}
+    cache_dir = None if args.cache_dir == "none" else args.cache_dir
+
+    results = {}
+
+    for name in args.controllers:
+        results[name] = compute_basin(name, states, settings=settings, cache_dir=cache_dir)
+        outcomes = results[name]["outcomes"]
+        print("{0} : cells = {1}, converged = {2:.1f} %, diverged = {3:.1f} %, undecided = {4:.1f} %, "
+              "simulated = {5}, cached = {6}".format(name, len(outcomes), 100. * np.mean(outcomes == CONVERGED),
+                                                     100. * np.mean(outcomes == DIVERGED),
+                                                     100. * np.mean(outcomes == UNDECIDED),
+                                                     results[name]["simulated"], results[name]["cached"]))
+
+    draw_basins(axes, results, save_path=None if args.output == "show" else args.output)
+
+    if args.output != "show":
+        print("basin map is saved to {0}".format(os.path.abspath(args.output)))
+
+if __name__ == '__main__':
+    main()
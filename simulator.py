@@ -2,8 +2,70 @@
 import numpy as np
 import math
 from common.math import fit_angle_in_rad_range
+from common.history import StateHistory
+from common.integrators import TABLEAUS, integrate_adaptive
+from common.dynamics import CartPoleDynamics
+from common.events import EventMonitor
+from common.profiling import profiled, profiler
 
-class SinglePendulumWithCart():
+class CartPoleParams():
+    """
+    physical parameters of the pendulum with cart, shared by the simulators
+
+    Attributes
+    ------------
+    p_m, p_l, p_j, p_mu : float
+        pendulum mass, length to the center of gravity, inertia and viscous resistance coefficient
+    c_m, c_mu : float
+        cart mass and viscous resistance coefficient
+    c_width, c_height, c_wheel_size : float
+        size of the drawn cart
+    g : float
+        acceleration of gravity
+    dynamics : CartPoleDynamics class
+        motion equation with the precomputed parameters, use set_params to change them
+    """
+
+    def _init_params(self):
+        # Parameters
+        self.p_m = 0.23 # pendulum mass
+        self.p_l = 0.3096 # pendulum length, especially the length from origin to center gravity position( 0.4 / 2 )
+        self.p_j = self.p_m * (self.p_l ** 2) / 3. # pendulum inertia
+        self.p_mu = 27.41 * 10e-6 # viscous resistance coefficient of pendulum
+
+        self.c_m = 0.94 # cart mass
+        self.c_mu = 27.41 * 10e-6 # viscous resistance coefficient of cart
+        self.c_width = 0.25
+        self.c_height = 0.1
+        self.c_wheel_size = 0.025 # radius of wheel
+
+        self.g = 9.8 # acceleration of gravity
+
+        self.dynamics = CartPoleDynamics.from_pendulum(self)
+
+    def set_params(self, **params):
+        """
+        change the parameters and update the dynamics
+
+        Parameters
+        ------------
+        params : dict
+            p_m, p_l, p_j, p_mu, c_m, c_mu, g
+            if p_m or p_l is given without p_j, p_j is calculated as the uniform rod
+        """
+        unknown = set(params) - {"p_m", "p_l", "p_j", "p_mu", "c_m", "c_mu", "g"}
+        if unknown:
+            raise ValueError("unknown parameters : {0}".format(sorted(unknown)))
+
+        for key, value in params.items():
+            setattr(self, key, value)
+
+        if "p_j" not in params and ("p_m" in params or "p_l" in params):
+            self.p_j = self.p_m * (self.p_l ** 2) / 3.
+
+        self.dynamics = CartPoleDynamics.from_pendulum(self)
+
+class SinglePendulumWithCart(CartPoleParams):
     """
     Attributes
     ------------
@@ -15,21 +77,44 @@ class SinglePendulumWithCart():
          cart velocity in z-coordinate
     v_th : float in rad/s
         pendulum angle velocity
-    history_z : list
-        time history of cart position in z-coordinate
-    history_th : list
-        time history of pendulum angle
-    history_v_z : list
-        time history of cart velocity in z-coordinate
-    history_v_th : list
-        time history of pendulum angle velocity
+    history : StateHistory class
+        time history store of the state and the input
+    history_z : numpy.ndarray
+        time history of cart position in z-coordinate (view of history)
+    history_th : numpy.ndarray
+        time history of pendulum angle (view of history)
+    history_v_z : numpy.ndarray
+        time history of cart velocity in z-coordinate (view of history)
+    history_v_th : numpy.ndarray
+        time history of pendulum angle velocity (view of history)
+    history_input_f : numpy.ndarray
+        time history of input (view of history)
+    history_reference_z : numpy.ndarray
+        time history of the reference of cart position (view of history)
+    history_error_z : numpy.ndarray
+        time history of the tracking error z - reference_z (view of history)
+    dynamics : CartPoleDynamics class
+        motion equation with the precomputed parameters, use set_params to change them
+    integrator : str
+        "rk4" (fixed step), "bs23" or "dopri5" (adaptive step)
+    num_rhs_evals : int
+        number of the evaluations of the motion equation (all 4 states at once)
+    num_rejected_steps : int
+        number of the rejected steps of the adaptive integrator
+    time : float in seconds
+        simulated time
+    event_monitor : EventMonitor class or None
+        detects the events set by set_events
+    reference_z : float in meters
+        reference of cart position recorded with the next samples, default is 0.0
     
     Notes
     --------
     state definition is writen in README 
     """
 
-    def __init__(self, init_z=0.0, init_th=0.0, init_v_z=0.0, init_v_th=0.0):
+    def __init__(self, init_z=0.0, init_th=0.0, init_v_z=0.0, init_v_th=0.0,
+                 history_capacity=2048, history_ring=False, integrator="rk4", rtol=1e-6, atol=1e-8):
         """
         Parameters
         --------------
@@ -41,34 +126,97 @@ class SinglePendulumWithCart():
             initial cart position, defalt is 0.0
         init_v_th : float in radians
             initial pendulum angle, defalt is 0.0
+        history_capacity : int
+            initial number of samples of the history buffer, defalt is 2048
+        history_ring : bool
+            if True, only the latest history_capacity samples are kept, defalt is False
+        integrator : str
+            "rk4" is the classical 4th Runge-Kutta method with the step of dt,
+            "bs23" (Bogacki-Shampine 3(2)) and "dopri5" (Dormand-Prince 5(4)) are
+            adaptive step methods which divide dt by the error control, defalt is "rk4"
+        rtol : float
+            relative tolerance of the adaptive integrator, defalt is 1e-6
+        atol : float
+            absolute tolerance of the adaptive integrator, defalt is 1e-8
         """
+        if integrator != "rk4" and integrator not in TABLEAUS:
+            raise ValueError("integrator should be chosen from rk4, {0}".format(", ".join(sorted(TABLEAUS))))
+
+        self.integrator = integrator
+        self.rtol = rtol
+        self.atol = atol
+
+        self.num_rhs_evals = 0
+        self.num_rejected_steps = 0
+
+        self._adaptive_step = None # proposed step size of the adaptive integrator
+        self._last_derivative = None # ((input_f, state), derivative) at the current state
+
+        self.time = 0.0
+        self.event_monitor = None
+
         self.z = init_z
         self.th = init_th
 
         self.v_z = init_v_z
         self.v_th = init_v_th
 
-        self.history_z = []
-        self.history_th = []
-        self.history_v_th = []
-        self.history_v_z = []
-        self.history_input_f = []
+        self.reference_z = 0.0
+        self.history = StateHistory(["z", "th", "v_z", "v_th", "input_f", "reference_z", "error_z"],
+                                    capacity=history_capacity, ring=history_ring)
 
-        # Parameters
-        self.p_m = 0.23 # pendulum mass
-        self.p_l = 0.3096 # pendulum length, especially the length from origin to center gravity position( 0.4 / 2 )
-        self.p_j = self.p_m * (self.p_l ** 2) / 3. # pendulum inertia
-        self.p_mu = 27.41 * 10e-6 # viscous resistance coefficient of pendulum
+        self._init_params()
 
-        self.c_m = 0.94 # cart mass
-        self.c_mu = 27.41 * 10e-6 # viscous resistance coefficient of cart
-        self.c_width = 0.25
-        self.c_height = 0.1
-        self.c_wheel_size = 0.025 # radius of wheel
+    @property
+    def history_z(self):
+        return self.history.view("z")
 
-        self.g = 9.8 # acceleration of gravity
+    @property
+    def history_th(self):
+        return self.history.view("th")
 
-    def update_state(self, input_f=0.0, dt=0.01):
+    @property
+    def history_v_z(self):
+        return self.history.view("v_z")
+
+    @property
+    def history_v_th(self):
+        return self.history.view("v_th")
+
+    @property
+    def history_input_f(self):
+        return self.history.view("input_f")
+
+    @property
+    def history_reference_z(self):
+        return self.history.view("reference_z")
+
+    @property
+    def history_error_z(self):
+        return self.history.view("error_z")
+
+    @property
+    def terminal_event(self):
+        """EventRecord of the first terminal event, None if it has not happened
+        """
+        return None if self.event_monitor is None else self.event_monitor.terminal
+
+    def set_events(self, events):
+        """
+        Parameters
+        ------------
+        events : list of Event or None
+            events detected from the current state, e.g. common.events.default_events(),
+            None removes the events
+        """
+        if events is None:
+            self.event_monitor = None
+            return
+
+        self.event_monitor = EventMonitor(events, self.time, (self.z, self.th, self.v_z, self.v_th))
+
+    @profiled("simulator.update_state")
+    def update_state(self, input_f=0.0, dt=0.01, num_steps=1):
         """
         Parameters
         -------------
@@ -76,179 +224,220 @@ class SinglePendulumWithCart():
             input for the system, default is 0.0 [N]
         dt : float in seconds
             sampling time of simulation, default is 0.01 [s]
+        num_steps : int
+            number of the sampling times the input is held, default is 1
+            the adaptive integrator can take internal steps longer than dt over them
 
         Also see
         ------------
-        _func_z
-        _func_th
-        _func_v_z
-        _func_v_th
+        dynamics : CartPoleDynamics class
 
-        all functions is defined by the motion equation 
+        the derivative is defined by the motion equation 
 
         Notes
         --------
-        the state is updated by 4th Runge-Kutta method
+        the state is updated by 4th Runge-Kutta method,
+        or the adaptive step method which is selected by integrator
+        the history is recorded every dt
+        if the events are set, the remaining steps are skipped after a terminal event
+        and the state and the last sample are the localized state of the event
         """
-        # Runge-Kutta method
-        k0 = [0.0 for _ in range(4)]
-        k1 = [0.0 for _ in range(4)]
-        k2 = [0.0 for _ in range(4)]
-        k3 = [0.0 for _ in range(4)]
-        
-        functions = [self._func_z, self._func_th, self._func_v_z, self._func_v_th]
-        
-        for i, func in enumerate(functions):
-            k0[i] = dt * func(self.z, self.th, self.v_z, self.v_th, input_f)
+        if self.integrator != "rk4":
+            self._update_state_adaptive(input_f, dt, num_steps)
+            return
 
-        for i, func in enumerate(functions):
-            k1[i] = dt * func(self.z + k0[0]/2.0 , self.th + k0[1]/2.0,
-                         self.v_z + k0[2]/2.0, self.v_th + k0[3]/2.0, input_f)
+        for _ in range(num_steps):
+            state = (self.z, self.th, self.v_z, self.v_th)
 
-        for i, func in enumerate(functions):
-            k2[i] = dt * func(self.z + k1[0]/2.0 , self.th + k1[1]/2.0,
-                         self.v_z + k1[2]/2.0, self.v_th + k1[3]/2.0, input_f)
+            self._update_state_rk4(input_f, dt)
 
-        for i, func in enumerate(functions):
-            k3[i] = dt * func(self.z + k2[0] , self.th + k2[1],
-                         self.v_z + k2[2], self.v_th + k2[3], input_f)
+            # self.th, = fit_angle_in_rad_range([self.th])
+            # self.th = abs(self.th)
 
-        self.z += (k0[0] + 2 * k1[0] + 2 * k2[0] + k3[0]) / 6.0
-        self.th += (k0[1] + 2 * k1[1] + 2 * k2[1] + k3[1]) / 6.0
-        self.v_z += (k0[2] + 2 * k1[2] + 2 * k2[2] + k3[2]) / 6.0
-        self.v_th += (k0[3] + 2 * k1[3] + 2 * k2[3] + k3[3]) / 6.0
+            start_time = self.time
+            terminal = self._check_events(state, (self.z, self.th, self.v_z, self.v_th), dt, input_f)
 
-        # self.th, = fit_angle_in_rad_range([self.th])
-        # self.th = abs(self.th)
+            if terminal:
+                self.z, self.th, self.v_z, self.v_th = self._terminal_state(start_time, (self.z, self.th, self.v_z, self.v_th))
 
-        variables = [self.z, self.th, self.v_z, self.v_th, input_f]
-        histories = [self.history_z, self.history_th, self.history_v_z, self.history_v_th, self.history_input_f]
+            self.history.append((self.z, self.th, self.v_z, self.v_th, input_f,
+                                 self.reference_z, self.z - self.reference_z))
 
-        for i, variable in enumerate(variables):
-            histories[i].append(variable)
+            if terminal:
+                break
         
         # print('z = {0}'.format(self.z))
         # print('th = {0}'.format(self.th))
         # print('v_z = {0}'.format(self.v_z))
         # print('v_th = {0}'.format(self.v_th))
 
-    def _func_z(self, z, th, v_z, v_th, input_f):
+    def _check_events(self, state, next_state, dt, input_f, derivative=True):
         """
+        advance the time and detect the events of one step
+
         Parameters
-        ------------
-        z : float in meters
-            cart position in z-coordinate
-        th : float in radians
-            pendulum angle
-        v_z : float in m/s
-            cart velocity in z-coordinate
-        v_th : float in rad/s
-            pendulum angle velocity
+        -------------
+        state : tuple of float
+            state at the start of the step
+        next_state : tuple of float
+            state at the end of the step
+        dt : float in seconds
+            length of the step
         input_f : float in N
-            input for the system
+            input held over the step
+        derivative : bool
+            if True, the events are localized on the Hermite interpolation of the motion equation,
+            otherwise on the straight line of the step, default is True
+
         Returns
-        -----------
-        y : float
-            Differential coefficient of z
+        ---------
+        terminal : bool
+            True if a terminal event has happened
+        """
+        time = self.time
+        self.time += dt
+
+        if self.event_monitor is None:
+            return False
 
+        func = (lambda y: self._func_state(y, input_f)) if derivative else None
+
+        return self.event_monitor.step(time, state, next_state, dt, derivative=func) is not None
+
+    def _terminal_state(self, start_time, state):
+        """
+        stop at the terminal event, same on every integrator
+
+        Parameters
+        -------------
+        start_time : float in seconds
+            time at the start of the step
+        state : array-like, shape(4, )
+            state at the end of the step
+
+        Returns
+        ---------
+        state : list of float
+            localized state of the terminal event if it has happened inside the step,
+            otherwise (e.g. the settled event of the hold time) the state at the end of the step
         """
+        terminal = self.event_monitor.terminal
+
+        if terminal.time >= start_time:
+            self.time = terminal.time
+            state = terminal.state
 
-        y = v_z
-        return y
+        return np.asarray(state, dtype=np.float64).tolist()
 
-    def  _func_th(self, z, th, v_z, v_th, input_f):
+    def _update_state_rk4(self, input_f, dt):
         """
         Parameters
-        ------------
-        z : float in meters
-            cart position in z-coordinate
-        th : float in radians
-            pendulum angle
-        v_z : float in m/s
-            cart velocity in z-coordinate
-        v_th : float in rad/s
-            pendulum angle velocity
+        -------------
         input_f : float in N
             input for the system
-        Returns
-        -----------
-        y : float
-            Differential coefficient of th
-
+        dt : float in seconds
+            sampling time of simulation
         """
-        y = v_th
-        return y
+        # Runge-Kutta method
+        func = self.dynamics.derivative
+        z, th, v_z, v_th = self.z, self.th, self.v_z, self.v_th
+
+        k0 = func(z, th, v_z, v_th, input_f)
+        k1 = func(z + k0[0] * dt / 2.0, th + k0[1] * dt / 2.0,
+                  v_z + k0[2] * dt / 2.0, v_th + k0[3] * dt / 2.0, input_f)
+        k2 = func(z + k1[0] * dt / 2.0, th + k1[1] * dt / 2.0,
+                  v_z + k1[2] * dt / 2.0, v_th + k1[3] * dt / 2.0, input_f)
+        k3 = func(z + k2[0] * dt, th + k2[1] * dt,
+                  v_z + k2[2] * dt, v_th + k2[3] * dt, input_f)
+
+        self.z = z + dt * (k0[0] + 2 * k1[0] + 2 * k2[0] + k3[0]) / 6.0
+        self.th = th + dt * (k0[1] + 2 * k1[1] + 2 * k2[1] + k3[1]) / 6.0
+        self.v_z = v_z + dt * (k0[2] + 2 * k1[2] + 2 * k2[2] + k3[2]) / 6.0
+        self.v_th = v_th + dt * (k0[3] + 2 * k1[3] + 2 * k2[3] + k3[3]) / 6.0
 
-    def _func_v_z(self, z, th, v_z, v_th, input_f):
+        self.num_rhs_evals += 4
+
+    def _update_state_adaptive(self, input_f, dt, num_steps):
         """
         Parameters
-        ------------
-        z : float in meters
-            cart position in z-coordinate
-        th : float in radians
-            pendulum angle
-        v_z : float in m/s
-            cart velocity in z-coordinate
-        v_th : float in rad/s
-            pendulum angle velocity
+        -------------
         input_f : float in N
             input for the system
-        Returns
-        -----------
-        y : float
-            Differential coefficient of v_z
+        dt : float in seconds
+            sampling time of simulation
+        num_steps : int
+            number of the sampling times the input is held
 
+        Notes
+        --------
+        the step size is carried over to the next call,
+        so the calm phase is integrated by long steps and
+        the fast phase is divided only where the error control requires
+        the samples on the dt grid inside a step are interpolated
+        after a terminal event inside a sampling time, the state and the last sample are
+        the localized state of the event and the remaining samples are dropped
         """
-        
-        alpha = self.p_j * (self.p_m + self.c_m) + self.c_m * self.p_m * (self.p_l**2) +\
-               (self.p_m**2) * (self.p_l**2) * (math.sin(th)**2)
+        state = np.array([self.z, self.th, self.v_z, self.v_th])
 
-        mass_total = self.p_j + self.p_m * (self.p_l**2)
+        k0 = None
+        if self._last_derivative is not None and self._last_derivative[0] == (input_f, self.z, self.th, self.v_z, self.v_th):
+            k0 = self._last_derivative[1] # the input and state are same, reuse the last stage
 
-        temp_y = mass_total * input_f - self.c_mu * mass_total * v_z +\
-                 self.p_mu * self.p_m * self.p_l * math.cos(th) * v_th +\
-                 mass_total * self.p_m * self.p_l * math.sin(th) * (v_th**2) -\
-                 (self.p_m**2) * (self.p_l**2) * self.g * math.sin(th) * math.cos(th)
-        
-        y = temp_y / alpha
+        h = dt if self._adaptive_step is None else self._adaptive_step
 
-        return y
-    
-    def _func_v_th(self, z, th, v_z, v_th, input_f):
+        states, self._adaptive_step, num_evals, num_rejected, k_last =\
+            integrate_adaptive(lambda y: self._func_state(y, input_f), state, dt * num_steps, h,
+                               TABLEAUS[self.integrator], rtol=self.rtol, atol=self.atol, k0=k0,
+                               num_samples=num_steps)
+
+        previous = state
+        for sample in states:
+            start_time = self.time
+            terminal = self._check_events(previous, sample, dt, input_f)
+
+            if terminal:
+                sample = self._terminal_state(start_time, sample)
+
+            self.history.append((sample[0], sample[1], sample[2], sample[3], input_f,
+                                 self.reference_z, sample[0] - self.reference_z))
+            previous = sample
+
+            if terminal:
+                break
+
+        self.z, self.th, self.v_z, self.v_th = np.asarray(previous, dtype=np.float64).tolist()
+
+        self._last_derivative = ((input_f, self.z, self.th, self.v_z, self.v_th), k_last)
+        self.num_rhs_evals += num_evals
+        self.num_rejected_steps += num_rejected
+
+        profiler.count("simulator.rhs_evals", num_evals)
+        profiler.count("simulator.rejected_steps", num_rejected)
+
+    def _func_state(self, state, input_f):
         """
         Parameters
         ------------
-        z : float in meters
-            cart position in z-coordinate
-        th : float in radians
-            pendulum angle
-        v_z : float in m/s
-            cart velocity in z-coordinate
-        v_th : float in rad/s
-            pendulum angle velocity
+        state : numpy.ndarray, shape(4, )
+            [z, th, v_z, v_th]
         input_f : float in N
             input for the system
 
         Returns
         -----------
-        y : float
-            Differential coefficient of v_th
+        y : numpy.ndarray, shape(4, )
+            Differential coefficient of the state
         """
+        z, th, v_z, v_th = state.tolist()
 
-        alpha = self.p_j * (self.p_m + self.c_m) + self.c_m * self.p_m * (self.p_l**2) +\
-               (self.p_m**2) * (self.p_l**2) * (math.sin(th)**2)
-
-        mass_total = self.p_m + self.c_m
-
-        temp_y = -self.p_m * self.p_l * math.cos(th) * input_f +\
-                  self.c_mu * self.p_m * self.p_l * math.cos(th) * v_z -\
-                  self.p_mu * mass_total * v_th -\
-                  (self.p_m**2) * (self.p_l**2) * math.sin(th) * math.cos(th) * (v_th**2) +\
-                  mass_total * self.p_m * self.p_l * self.g * math.sin(th)
+        return np.array(self.dynamics.derivative(z, th, v_z, v_th, input_f))
 
-        y = temp_y / alpha
-
-        return y 
+    def set_params(self, **params):
+        """
+        see CartPoleParams, the reused derivative of the adaptive integrator is dropped
+        """
+        super().set_params(**params)
+        self._last_derivative = None
 
 # memo
     """
@@ -273,3 +462,287 @@ class SinglePendulumWithCart():
     y = temp_y / coeffice_v_th
     """
 
+
+
+class LinearSinglePendulumWithCart(SinglePendulumWithCart):
+    """
+    linearized pendulum with cart, x[k+1] = Ad x[k] + Bd u[k]
+
+    Attributes
+    ------------
+    same as SinglePendulumWithCart
+
+    Notes
+    --------
+    Ad and Bd are the exact zero order hold discretization of the motion equation
+    linearized around the upright equilibrium, calculated once for each sampling time,
+    so one step is a 4x4 matrix product instead of 4 evaluations of the nonlinear equation
+    it is only valid near the upright position, use it for linearized studies
+    """
+
+    def __init__(self, init_z=0.0, init_th=0.0, init_v_z=0.0, init_v_th=0.0,
+                 history_capacity=2048, history_ring=False):
+        """
+        Parameters
+        --------------
+        see SinglePendulumWithCart
+        """
+        super().__init__(init_z=init_z, init_th=init_th, init_v_z=init_v_z, init_v_th=init_v_th,
+                         history_capacity=history_capacity, history_ring=history_ring)
+
+        self._discrete = {} # dt : (Ad, Bd)
+
+    def discretize(self, dt):
+        """
+        Parameters
+        ------------
+        dt : float in seconds
+            sampling time
+
+        Returns
+        ---------
+        Ad : numpy.ndarray, shape(4, 4)
+        Bd : numpy.ndarray, shape(4, 1)
+        """
+        if dt not in self._discrete:
+            self._discrete[dt] = self.dynamics.discretize(dt)
+
+        return self._discrete[dt]
+
+    @profiled("simulator.linear_update_state")
+    def update_state(self, input_f=0.0, dt=0.01, num_steps=1):
+        """
+        Parameters
+        -------------
+        input_f : float in N
+            input for the system, default is 0.0 [N]
+        dt : float in seconds
+            sampling time of simulation, default is 0.01 [s]
+        num_steps : int
+            number of the sampling times the input is held, default is 1
+        """
+        Ad, Bd = self.discretize(dt)
+
+        state = np.array([self.z, self.th, self.v_z, self.v_th])
+        input_term = Bd[:, 0] * input_f
+
+        for _ in range(num_steps):
+            next_state = np.dot(Ad, state) + input_term
+
+            start_time = self.time
+            terminal = self._check_events(state, next_state, dt, input_f, derivative=False)
+
+            if terminal:
+                next_state = np.array(self._terminal_state(start_time, next_state))
+
+            self.history.append((next_state[0], next_state[1], next_state[2], next_state[3], input_f,
+                                 self.reference_z, next_state[0] - self.reference_z))
+            state = next_state
+
+            if terminal:
+                break
+
+        self.z, self.th, self.v_z, self.v_th = state.tolist()
+
+    def simulate(self, K, num_steps, dt=0.01, reference_z=None):
+        """
+        simulate the closed loop u[k] = -K (x[k] - x_ref) by the closed loop matrix
+
+        Parameters
+        -------------
+        K : numpy.ndarray, shape(1, 4)
+            feedback gain
+        num_steps : int
+            number of the steps
+        dt : float in seconds
+            sampling time, default is 0.01 [s]
+        reference_z : float, optional
+            reference of cart position, also set to the attribute reference_z
+
+        Returns
+        ---------
+        states : numpy.ndarray, shape(num_steps, 4)
+            states after each step, also appended to the history
+        """
+        Ad, Bd = self.discretize(dt)
+        K = np.asarray(K, dtype=np.float64).reshape(1, 4)
+
+        A_cl = Ad - np.dot(Bd, K)
+
+        offset = np.zeros(4)
+        if reference_z is not None:
+            offset = np.array([reference_z, 0.0, 0.0, 0.0])
+            self.reference_z = reference_z
+
+        state = np.array([self.z, self.th, self.v_z, self.v_th]) - offset
+        states = self._propagate(A_cl, state, num_steps)
+
+        # u[k] is the feedback of x[k], the state before each step
+        inputs = - np.dot(np.vstack((state, states))[:num_steps], K[0])
+
+        states += offset
+
+        references = np.full(num_steps, self.reference_z)
+        self.history.extend(np.vstack((states.T, inputs, references, states[:, 0] - references)))
+
+        if num_steps:
+            self.z, self.th, self.v_z, self.v_th = states[-1].tolist()
+
+        self.time += num_steps * dt # the events are not detected in the closed loop at once
+
+        return states
+
+    def _propagate(self, A, state, num_steps):
+        """
+        Parameters
+        ------------
+        A : numpy.ndarray, shape(4, 4)
+            transition matrix
+        state : numpy.ndarray, shape(4, )
+            initial state
+        num_steps : int
+
+        Returns
+        ---------
+        states : numpy.ndarray, shape(num_steps, 4)
+            A^k state for k = 1 ... num_steps
+
+        Notes
+        ---------
+        the powers are calculated at once by the eigen decomposition A = V diag(e) V^-1,
+        the step by step product is used if V is ill conditioned
+        """
+        eigenvalues, V = np.linalg.eig(A)
+
+        if np.linalg.cond(V) < 1e8:
+            coefficients = np.linalg.solve(V, state)
+            with np.errstate(divide="ignore"):
+                log_eigenvalues = np.log(eigenvalues.astype(np.complex128))
+            powers = np.exp(np.arange(1, num_steps + 1)[:, np.newaxis] * log_eigenvalues)
+            return np.dot(powers * coefficients, V.T).real
+
+        states = np.empty((num_steps, 4))
+        for step in range(num_steps):
+            state = np.dot(A, state)
+            states[step] = state
+
+        return states
+
+    def set_params(self, **params):
+        """
+        see SinglePendulumWithCart, the discretized matrices are calculated again
+        """
+        super().set_params(**params)
+        self._discrete = {}
+
+class BatchSinglePendulumWithCart(CartPoleParams):
+    """
+    Attributes
+    ------------
+    states : numpy.ndarray, shape(N, 4)
+        states of N pendulums, each row is [z, th, v_z, v_th]
+    history : StateHistory class
+        time history store of the states and the inputs
+    history_states : numpy.ndarray, shape(T, N, 4)
+        time history of states (copy)
+    history_z, history_th, history_v_z, history_v_th, history_input_f : numpy.ndarray, shape(T, N)
+        time history of each state and input (view of history)
+    dynamics : CartPoleDynamics class
+        motion equation, the parameters and set_params are those of CartPoleParams
+
+    Notes
+    --------
+    the motion equation and the parameters are same as SinglePendulumWithCart
+    all pendulums are advanced by one vectorized 4th Runge-Kutta step
+    """
+
+    def __init__(self, init_states, record_history=True, history_capacity=256, history_ring=False):
+        """
+        Parameters
+        --------------
+        init_states : array-like, shape(N, 4)
+            initial states of pendulums, each row is [z, th, v_z, v_th]
+        record_history : bool
+            if True, the states and inputs are stored every update, default is True
+        history_capacity : int
+            initial number of samples of the history buffer, defalt is 256
+        history_ring : bool
+            if True, only the latest history_capacity samples are kept, defalt is False
+        """
+        self.states = np.array(init_states, dtype=np.float64).reshape(-1, 4)
+        self.num = self.states.shape[0]
+
+        self.record_history = record_history
+        self.history = StateHistory(["z", "th", "v_z", "v_th", "input_f"],
+                                    capacity=history_capacity, ring=history_ring, width=self.num)
+
+        self._init_params()
+
+    @property
+    def z(self):
+        return self.states[:, 0]
+
+    @property
+    def th(self):
+        return self.states[:, 1]
+
+    @property
+    def v_z(self):
+        return self.states[:, 2]
+
+    @property
+    def v_th(self):
+        return self.states[:, 3]
+
+    @property
+    def history_z(self):
+        return self.history.view("z")
+
+    @property
+    def history_th(self):
+        return self.history.view("th")
+
+    @property
+    def history_v_z(self):
+        return self.history.view("v_z")
+
+    @property
+    def history_v_th(self):
+        return self.history.view("v_th")
+
+    @property
+    def history_input_f(self):
+        return self.history.view("input_f")
+
+    @property
+    def history_states(self):
+        return np.stack(self.history.as_array()[:4], axis=-1)
+
+    @profiled("simulator.batch_update_state")
+    def update_state(self, input_f=0.0, dt=0.01):
+        """
+        Parameters
+        -------------
+        input_f : float or array-like, shape(N, ) in N
+            input for the systems, default is 0.0 [N]
+        dt : float in seconds
+            sampling time of simulation, default is 0.01 [s]
+
+        Notes
+        --------
+        the states are updated by 4th Runge-Kutta method
+        """
+        input_f = np.broadcast_to(np.asarray(input_f, dtype=np.float64), (self.num, ))
+
+        func = self.dynamics.derivatives
+
+        k0 = dt * func(self.states, input_f)
+        k1 = dt * func(self.states + k0 / 2.0, input_f)
+        k2 = dt * func(self.states + k1 / 2.0, input_f)
+        k3 = dt * func(self.states + k2, input_f)
+
+        self.states += (k0 + 2. * k1 + 2. * k2 + k3) / 6.0
+
+        if self.record_history:
+            self.history.append((self.states[:, 0], self.states[:, 1],
+                                 self.states[:, 2], self.states[:, 3], input_f))
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from simulator import SinglePendulumWithCart, BatchSinglePendulumWithCart
+from controllers.LQR import LQR
+from controllers.SDRE import SDRE
+
+STATES = np.array([[0.0, 0.1, 0.0, 0.0],
+                   [0.3, -0.4, 0.2, 1.0],
+                   [-1.0, 0.8, -0.5, -2.0],
+                   [2.8, 0.02, 0.1, 0.3]])
+
+REFERENCES = [{}, {"reference_z": 0.5},
+              {"reference_z": np.array([0.5, -0.2, 0.0, 1.0]), "reference_v_z": np.array([0.1, 0.0, -0.3, 0.2]),
+               "reference_a_z": 0.05}]
+
+def _single_inputs(controller, references):
+    inputs = []
+
+    for i, state in enumerate(STATES):
+        pendulum = SinglePendulumWithCart(*state)
+        kwargs = {name: (value[i] if np.ndim(value) else value) for name, value in references.items()}
+        inputs.append(controller.calc_input(pendulum, **kwargs)[0, 0])
+
+    return np.array(inputs)
+
+@pytest.mark.parametrize("references", REFERENCES)
+def test_lqr_batch_matches_single(references):
+    controller = LQR(SinglePendulumWithCart(), cache=None)
+    batch = BatchSinglePendulumWithCart(STATES)
+
+    np.testing.assert_allclose(controller.calc_inputs(batch, **references),
+                               _single_inputs(controller, references), rtol=1e-10, atol=1e-10)
+
+@pytest.mark.parametrize("references", REFERENCES)
+@pytest.mark.parametrize("solver", ["control", "newton"])
+def test_sdre_batch_matches_single(references, solver):
+    weights = {"Q_z_boost": 500.0, "R_boost": 1000.0, "Q_th_boost": 10.0}
+    batch_controller = SDRE(SinglePendulumWithCart(), solver=solver, weights=weights)
+    batch = BatchSinglePendulumWithCart(STATES)
+
+    f = batch_controller.calc_inputs(batch, **references)
+
+    # the batch leaves the state of the controller untouched
+    assert batch_controller.P is None
+    assert batch_controller.history_iterations == []
+    assert batch_controller.num_fallbacks == 0
+
+    # the order of the rows does not matter
+    order = np.arange(len(STATES))[::-1]
+    reversed_references = {name: (value[order] if np.ndim(value) else value) for name, value in references.items()}
+    np.testing.assert_allclose(batch_controller.calc_inputs(batch, states=STATES[order], **reversed_references),
+                               f[order], rtol=1e-12, atol=1e-12)
+
+    single = _single_inputs(SDRE(SinglePendulumWithCart(), solver="control", weights=weights), references)
+    np.testing.assert_allclose(f, single, rtol=1e-6, atol=1e-8)
+
+def test_batch_closed_loop_matches_single():
+    controller = LQR(SinglePendulumWithCart(), cache=None)
+    batch = BatchSinglePendulumWithCart(STATES)
+    singles = [SinglePendulumWithCart(*state) for state in STATES]
+
+    for _ in range(100):
+        batch.update_state(input_f=controller.calc_inputs(batch), dt=0.01)
+        for pendulum in singles:
+            pendulum.update_state(input_f=controller.calc_input(pendulum)[0, 0], dt=0.01)
+
+    np.testing.assert_allclose(batch.states, [[p.z, p.th, p.v_z, p.v_th] for p in singles], rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(batch.history_states[:, 0, 1], singles[0].history_th, rtol=1e-9, atol=1e-12)
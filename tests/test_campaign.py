@@ -0,0 +1,26 @@
+import pytest
+
+import campaign
+from controllers.LQR import LQR
+from controllers.MPC import MPC
+
+@pytest.mark.parametrize("name, options, expected", [("MPC", None, 0.02),
+                                                       ("LQR", {"dt": 0.01}, 0.02),
+                                                       ("LQR", None, None)])
+def test_controller_is_made_at_sampling_time(monkeypatch, name, options, expected):
+    made = []
+
+    def record(controller_class):
+        def make(model, **kwargs):
+            made.append(controller_class(model, **kwargs))
+            return made[-1]
+        return make
+
+    monkeypatch.setitem(campaign.CONTROLLERS, "MPC", record(MPC))
+    monkeypatch.setitem(campaign.CONTROLLERS, "LQR", record(LQR))
+
+    trial = campaign.make_trials(1, [name])[0]
+    result = campaign.run_trial(trial, simulation_time=50, sampling_time=0.02, controller_options=options)
+
+    assert made[0].dt == expected
+    assert not result["diverged"]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.integrate import solve_ivp
+
+from simulator import SinglePendulumWithCart, LinearSinglePendulumWithCart
+from common.dynamics import CartPoleDynamics
+from controllers.LQR import LQR
+
+def test_discretization_matches_held_input():
+    dynamics = CartPoleDynamics.from_pendulum(SinglePendulumWithCart())
+    A, B = dynamics.linearize()
+    Ad, Bd = dynamics.discretize(0.05)
+
+    x0 = np.array([0.1, 0.05, -0.2, 0.3])
+    u = 2.0
+    exact = solve_ivp(lambda t, x: np.dot(A, x) + B[:, 0] * u, (0., 0.05), x0, rtol=1e-12, atol=1e-14).y[:, -1]
+
+    np.testing.assert_allclose(np.dot(Ad, x0) + Bd[:, 0] * u, exact, rtol=1e-8, atol=1e-12)
+
+def test_discrete_lqr_is_stable_at_its_sampling_time():
+    controller = LQR(SinglePendulumWithCart(), dt=0.05, cache=None)
+
+    closed_loop = controller.Ad - np.dot(controller.Bd, controller.K)
+    assert np.all(np.abs(np.linalg.eigvals(closed_loop)) < 1.)
+    np.testing.assert_allclose(np.sort_complex(np.linalg.eigvals(closed_loop)), np.sort_complex(controller.e))
+
+@pytest.mark.parametrize("reference_z", [None, 0.5])
+def test_simulate_matches_steps(reference_z):
+    controller = LQR(SinglePendulumWithCart(), dt=0.01, cache=None)
+
+    at_once = LinearSinglePendulumWithCart(init_z=-0.2, init_th=0.1, init_v_th=-0.3)
+    states = at_once.simulate(controller.K, 300, dt=0.01, reference_z=reference_z)
+
+    stepped = LinearSinglePendulumWithCart(init_z=-0.2, init_th=0.1, init_v_th=-0.3)
+    stepped.reference_z = 0.0 if reference_z is None else reference_z
+    for _ in range(300):
+        stepped.update_state(input_f=controller.calc_input(stepped, reference_z)[0, 0], dt=0.01)
+
+    np.testing.assert_allclose(states, stepped.history.as_array()[:4].T, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(at_once.history.as_array(), stepped.history.as_array(), rtol=1e-8, atol=1e-10)
+    assert at_once.time == pytest.approx(stepped.time)
+
+def test_linear_plant_matches_nonlinear_near_upright():
+    linear = LinearSinglePendulumWithCart(init_th=1e-3)
+    nonlinear = SinglePendulumWithCart(init_th=1e-3)
+
+    for _ in range(20):
+        linear.update_state(input_f=0.01, dt=0.01)
+        nonlinear.update_state(input_f=0.01, dt=0.01)
+
+    np.testing.assert_allclose([linear.z, linear.th, linear.v_z, linear.v_th],
+                               [nonlinear.z, nonlinear.th, nonlinear.v_z, nonlinear.v_th], rtol=1e-3, atol=1e-7)
@@ -0,0 +1,60 @@
+import math
+import numpy as np
+import pytest
+
+from simulator import SinglePendulumWithCart, LinearSinglePendulumWithCart
+from common.events import default_events
+
+@pytest.mark.parametrize("integrator", ["rk4", "dopri5", "bs23"])
+def test_terminal_event_stops_held_steps(integrator):
+    pendulum = SinglePendulumWithCart(init_z=0.0, init_th=0.3, init_v_z=0.0, init_v_th=0.0, integrator=integrator)
+    pendulum.set_events(default_events())
+
+    pendulum.update_state(input_f=0.0, dt=0.01, num_steps=300)
+
+    event = pendulum.terminal_event
+    assert event is not None and event.name == "fallen"
+    assert event.time == pytest.approx(0.4711, abs=1e-3)
+    assert len(pendulum.history) == 48
+
+@pytest.mark.parametrize("integrator", ["rk4", "dopri5", "bs23"])
+def test_stops_at_localized_event(integrator):
+    pendulum = SinglePendulumWithCart(init_z=0.0, init_th=0.3, init_v_z=0.0, init_v_th=0.0, integrator=integrator)
+    pendulum.set_events(default_events())
+
+    pendulum.update_state(input_f=0.0, dt=0.01, num_steps=300)
+
+    assert pendulum.th == pytest.approx(math.pi / 2., abs=1e-8)
+    assert pendulum.history_th[-1] == pendulum.th
+    assert pendulum.time == pendulum.terminal_event.time
+
+def test_integrators_stop_at_same_event():
+    pendulums = {}
+
+    for integrator in ["rk4", "dopri5"]:
+        pendulum = SinglePendulumWithCart(init_z=0.0, init_th=0.3, init_v_z=0.0, init_v_th=0.0, integrator=integrator)
+        pendulum.set_events(default_events())
+
+        for _ in range(300):
+            pendulum.update_state(input_f=0.5, dt=0.01)
+
+        pendulums[integrator] = pendulum
+
+    rk4, dopri5 = pendulums["rk4"], pendulums["dopri5"]
+
+    assert len(rk4.history) == len(dopri5.history)
+    assert rk4.time == pytest.approx(dopri5.time, abs=1e-6)
+    np.testing.assert_allclose([rk4.z, rk4.th, rk4.v_z, rk4.v_th],
+                               [dopri5.z, dopri5.th, dopri5.v_z, dopri5.v_th], atol=1e-5)
+    np.testing.assert_allclose(rk4.history.as_array()[:, -1], dopri5.history.as_array()[:, -1], atol=1e-5)
+
+def test_linear_plant_stops_at_localized_event():
+    pendulum = LinearSinglePendulumWithCart(init_z=0.0, init_th=0.3, init_v_z=0.0, init_v_th=0.0)
+    pendulum.set_events(default_events())
+
+    pendulum.update_state(input_f=0.0, dt=0.01, num_steps=300)
+
+    assert pendulum.terminal_event.name == "fallen"
+    assert pendulum.th == pytest.approx(math.pi / 2., abs=1e-8)
+    assert pendulum.history_th[-1] == pendulum.th
+    assert pendulum.time == pendulum.terminal_event.time
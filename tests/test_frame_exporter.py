@@ -0,0 +1,75 @@
+import io
+import os
+import numpy as np
+import pytest
+
+import frame_exporter
+from frame_exporter import FrameExporter, FrameRenderer
+
+class _Writer():
+    """stand-in of the ffmpeg process, keeps the piped bytes"""
+
+    def __init__(self, command, stdin=None, stderr=None):
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+        self.stderr = io.BytesIO()
+        self.returncode = 0
+
+    def wait(self):
+        return 0
+
+def _exporter():
+    times = np.arange(60) * 0.01
+    return FrameExporter(0.1 * np.sin(times), 0.2 * np.cos(times), 0.01, 0.3, 0.3, 0.1, 0.05,
+                         fps=50., width=160, height=90)
+
+def test_serial_video_export_makes_one_renderer(monkeypatch):
+    made = []
+    init = FrameRenderer.__init__
+
+    def counted_init(self, settings):
+        made.append(self)
+        init(self, settings)
+
+    writers = []
+
+    def popen(command, stdin=None, stderr=None):
+        writers.append(_Writer(command, stdin, stderr))
+        return writers[-1]
+
+    monkeypatch.setattr(FrameRenderer, "__init__", counted_init)
+    monkeypatch.setattr(frame_exporter.shutil, "which", lambda name: name)
+    monkeypatch.setattr(frame_exporter.subprocess, "Popen", popen)
+
+    exporter = _exporter()
+    num_frames = exporter.export("out.mp4", processes=1, chunk_size=8)
+
+    assert len(made) == 1
+    assert len(writers[0].stdin.getvalue()) == num_frames * made[0].width * made[0].height * 4
+    assert frame_exporter._renderer is None
+
+class _DeadWriter(_Writer):
+    """ffmpeg which exited with an error before reading the frames"""
+
+    def __init__(self, command, stdin=None, stderr=None):
+        super().__init__(command, stdin, stderr)
+        self.stdin.write = self._broken
+        self.stderr = io.BytesIO(b"Unknown encoder 'libx264'\n")
+        self.returncode = 1
+
+    def _broken(self, frames):
+        raise BrokenPipeError(32, "Broken pipe")
+
+def test_dead_ffmpeg_raises_its_error(monkeypatch):
+    monkeypatch.setattr(frame_exporter.shutil, "which", lambda name: name)
+    monkeypatch.setattr(frame_exporter.subprocess, "Popen", _DeadWriter)
+
+    with pytest.raises(RuntimeError, match="code 1 : Unknown encoder 'libx264'"):
+        _exporter().export("out.mp4", processes=1, chunk_size=8)
+
+    assert frame_exporter._renderer is None
+
+def test_png_export(tmp_path):
+    num_frames = _exporter().export(str(tmp_path), processes=1)
+
+    assert len(os.listdir(tmp_path)) == num_frames
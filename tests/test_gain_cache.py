@@ -0,0 +1,72 @@
+import numpy as np
+
+from simulator import SinglePendulumWithCart
+from controllers.gain_cache import GainCache
+from controllers.LQR import LQR
+
+def _solution(value):
+    return np.full((1, 4), value), np.full((4, 4), value), np.full(4, value)
+
+def test_memory_store_evicts_least_recently_used():
+    cache = GainCache(maxsize=2)
+    cache.put("a", _solution(1.))
+    cache.put("b", _solution(2.))
+
+    cache.get("a") # b is the least recently used
+    cache.put("c", _solution(3.))
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a")[0][0, 0] == 1.
+    assert cache.get("c")[0][0, 0] == 3.
+
+def test_disk_store_round_trip(tmp_path):
+    cache = GainCache(maxsize=1, directory=str(tmp_path))
+    stored = cache.put("a", _solution(1.))
+    cache.put("b", _solution(2.)) # a is evicted from the memory, not from the disk
+
+    other = GainCache(directory=str(tmp_path))
+    loaded = other.get("a")
+
+    for value, expected in zip(loaded, stored):
+        np.testing.assert_array_equal(value, expected)
+    assert not loaded[0].flags.writeable
+    assert cache.get("a") is not None
+
+def test_get_or_solve_counts_and_solves_once():
+    cache = GainCache()
+    calls = []
+
+    def solve():
+        calls.append(None)
+        return _solution(1.)
+
+    cache.get_or_solve("a", solve)
+    cache.get_or_solve("a", solve)
+
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_key_depends_on_params_weights_and_dt():
+    pendulum = SinglePendulumWithCart()
+    heavy = SinglePendulumWithCart()
+    heavy.set_params(c_m=2.0)
+    Q = np.eye(4)
+
+    key = GainCache.make_key(pendulum, Q, 1.0)
+
+    assert key == GainCache.make_key(SinglePendulumWithCart(), Q, 1.0)
+    assert key != GainCache.make_key(heavy, Q, 1.0)
+    assert key != GainCache.make_key(pendulum, 2. * Q, 1.0)
+    assert key != GainCache.make_key(pendulum, Q, 2.0)
+    assert key != GainCache.make_key(pendulum, Q, 1.0, dt=0.01)
+
+def test_lqr_controllers_share_the_cache():
+    cache = GainCache()
+    pendulum = SinglePendulumWithCart()
+
+    first = LQR(pendulum, cache=cache)
+    second = LQR(pendulum, cache=cache)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(first.K, second.K)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from simulator import SinglePendulumWithCart
+from controllers.SDRE import SDRE
+from controllers.gain_schedule import SDREGainTable
+
+def test_table_rejects_z_dependent_weights():
+    pendulum = SinglePendulumWithCart()
+    controller = SDRE(pendulum, weights={"Q_z_boost": 100.0})
+
+    with pytest.raises(ValueError, match="Q_z_boost"):
+        SDREGainTable(controller, pendulum, num_th=3, num_v_th=3, check_error=False)
+
+def test_controller_rejects_table_with_z_dependent_weights():
+    pendulum = SinglePendulumWithCart()
+    table = SDREGainTable(SDRE(pendulum), pendulum, num_th=3, num_v_th=3, check_error=False)
+
+    with pytest.raises(ValueError, match="Q_z_boost"):
+        SDRE(pendulum, gain_table=table, weights={"Q_z_boost": 100.0})
+
+    # the constant Q does not depend on z
+    Q = np.eye(4)
+    table = SDREGainTable(SDRE(pendulum, weights={"Q_z_boost": 100.0}, Q=Q), pendulum,
+                          num_th=3, num_v_th=3, check_error=False)
+    SDRE(pendulum, gain_table=table, weights={"Q_z_boost": 100.0}, Q=Q)
+
+def test_controller_rejects_table_of_other_settings():
+    pendulum = SinglePendulumWithCart()
+    table = SDREGainTable(SDRE(pendulum), pendulum, num_th=3, num_v_th=3, check_error=False)
+
+    SDRE(pendulum, gain_table=table)
+
+    with pytest.raises(ValueError, match="other weights"):
+        SDRE(pendulum, gain_table=table, weights={"R": 1.0})
+
+    with pytest.raises(ValueError, match="other Q or R"):
+        SDRE(pendulum, gain_table=table, Q=np.eye(4))
+
+    with pytest.raises(ValueError, match="other Q or R"):
+        SDRE(pendulum, gain_table=table, R=1.0)
+
+    heavy = SinglePendulumWithCart()
+    heavy.set_params(c_m=2.0)
+    with pytest.raises(ValueError, match="plant parameters"):
+        SDRE(heavy, gain_table=table)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from common.history import StateHistory
+from simulator import SinglePendulumWithCart
+
+def test_growing_history_keeps_all_samples():
+    history = StateHistory(["a", "b"], capacity=2)
+
+    for i in range(5):
+        history.append((i, -i))
+    history.extend([[5, 6], [-5, -6]])
+
+    assert len(history) == 7
+    assert history.capacity == 8
+    np.testing.assert_array_equal(history["a"], np.arange(7))
+    np.testing.assert_array_equal(history.as_array(), [np.arange(7), -np.arange(7)])
+
+@pytest.mark.parametrize("num", [2, 4, 5, 11])
+def test_ring_history_keeps_latest_samples_in_order(num):
+    history = StateHistory(["a", "b"], capacity=4, ring=True)
+
+    for i in range(num):
+        history.append((i, 10 * i))
+
+    latest = np.arange(max(0, num - 4), num)
+    assert len(history) == len(latest)
+    assert history.capacity == 4
+    np.testing.assert_array_equal(history.view("a"), latest)
+    np.testing.assert_array_equal(history.view("b"), 10 * latest)
+
+def test_ring_views_are_contiguous_after_wraparound():
+    history = StateHistory(["a"], capacity=3, ring=True)
+    history.extend([[0, 1, 2, 3, 4]])
+
+    view = history.view("a")
+
+    assert view.flags["C_CONTIGUOUS"]
+    assert np.shares_memory(view, history.as_array())
+    np.testing.assert_array_equal(view, [2, 3, 4])
+
+def test_history_of_width():
+    history = StateHistory(["state"], capacity=2, width=3)
+    history.append([[1, 2, 3]])
+    history.append([[4, 5, 6]])
+    history.append([[7, 8, 9]])
+
+    assert history.view("state").shape == (3, 3)
+    np.testing.assert_array_equal(history.view("state")[:, 0], [1, 4, 7])
+
+def test_clear_keeps_buffer():
+    history = StateHistory(["a"], capacity=2, ring=True)
+    history.extend([[1, 2, 3]])
+    history.clear()
+    history.append((4, ))
+
+    assert len(history) == 1
+    np.testing.assert_array_equal(history.view("a"), [4])
+
+def test_pendulum_views_follow_history():
+    pendulum = SinglePendulumWithCart(init_th=0.1, history_capacity=4, history_ring=True)
+
+    for _ in range(6):
+        pendulum.update_state(input_f=1.0, dt=0.01)
+
+    assert len(pendulum.history_z) == 4
+    assert pendulum.history_th[-1] == pendulum.th
+    np.testing.assert_array_equal(pendulum.history_input_f, np.ones(4))
+    np.testing.assert_array_equal(pendulum.history_error_z, pendulum.history_z - pendulum.history_reference_z)
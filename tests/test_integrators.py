@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from simulator import SinglePendulumWithCart
+from common.integrators import TABLEAUS, DORMAND_PRINCE, integrate_adaptive
+
+@pytest.mark.parametrize("integrator", ["dopri5", "bs23"])
+def test_samples_inside_steps_keep_tolerance(integrator):
+    pendulum = SinglePendulumWithCart()
+    func = lambda y: pendulum._func_state(y, 0.0)
+    state = np.array([0.0, 0.3, 0.0, 0.0])
+    rtol, atol = 1e-6, 1e-8
+
+    # 30 samples held over 0.3 s, the steps of dopri5 are longer than the sampling time
+    reference, _, _, _, _ = integrate_adaptive(func, state, 0.3, 0.01, DORMAND_PRINCE,
+                                               rtol=1e-13, atol=1e-14, num_samples=30)
+    samples, step, _, _, _ = integrate_adaptive(func, state, 0.3, 0.01, TABLEAUS[integrator],
+                                                rtol=rtol, atol=atol, num_samples=30)
+
+    errors = np.abs(samples - reference) / (atol + rtol * np.abs(reference))
+
+    assert integrator != "dopri5" or step > 0.01
+    assert errors.max() < 2.0
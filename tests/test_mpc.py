@@ -0,0 +1,32 @@
+import math
+import numpy as np
+
+from simulator import SinglePendulumWithCart
+from controllers.MPC import MPC
+from common.diagnostics import DiagnosticsRecorder
+
+def test_constrained_admm_converges():
+    pendulum = SinglePendulumWithCart(init_z=-0.5, init_v_th=-100. * math.pi / 180., history_capacity=500)
+    diagnostics = DiagnosticsRecorder("gain")
+    controller = MPC(pendulum, z_limit=1.0, diagnostics=diagnostics)
+
+    for _ in range(500):
+        f = controller.calc_input(pendulum)
+        pendulum.update_state(input_f=f[0, 0], dt=0.01)
+
+    assert controller.num_not_converged == 0
+    assert max(controller.history_iterations) > 1 # the z bound is active
+    assert np.all(diagnostics.as_arrays()["converged"])
+    assert np.max(np.abs(pendulum.history_z)) < 1.01
+    assert np.max(np.abs(pendulum.history_input_f)) <= 10.0
+
+def test_not_converged_steps_are_recorded():
+    pendulum = SinglePendulumWithCart(init_z=-0.5, init_v_th=-100. * math.pi / 180.)
+    diagnostics = DiagnosticsRecorder("gain")
+    controller = MPC(pendulum, z_limit=1.0, max_iter=2, adapt_interval=None, diagnostics=diagnostics)
+
+    for _ in range(50):
+        f = controller.calc_input(pendulum)
+        pendulum.update_state(input_f=f[0, 0], dt=0.01)
+
+    assert controller.num_not_converged == np.sum(~diagnostics.as_arrays()["converged"]) > 0
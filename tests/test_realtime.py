@@ -0,0 +1,67 @@
+import time
+import numpy as np
+
+from realtime import LocalPlant, RealtimeLoop
+from simulator import SinglePendulumWithCart
+from controllers.LQR import LQR
+
+class SlowLQR(LQR):
+    """overruns the period at every 10th step"""
+
+    num_calls = 0
+
+    def calc_input(self, pendulum, reference_z=None):
+        self.num_calls += 1
+        if self.num_calls % 10 == 0:
+            time.sleep(0.025)
+        return super().calc_input(pendulum, reference_z)
+
+class FakeClock():
+    """clock advanced by the sleeps and the computations, each read takes 0.1 us"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1e-7
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+class CountingController():
+    """returns 1, 2, 3, ... and computes for the given durations"""
+
+    def __init__(self, clock, durations):
+        self.clock = clock
+        self.durations = durations
+        self.num_calls = 0
+
+    def calc_input(self, pendulum, reference_z=None):
+        self.clock.now += self.durations[self.num_calls]
+        self.num_calls += 1
+        return np.array([[float(self.num_calls)]])
+
+def test_plant_keeps_wall_clock_over_skipped_ticks():
+    plant = LocalPlant([0.0, 0.1, 0.0, 0.0], dt=0.01)
+    loop = RealtimeLoop(SlowLQR(SinglePendulumWithCart()), plant, period=0.01)
+
+    summary = loop.run(50)
+
+    assert summary["skipped_ticks"] > 0
+    assert len(plant.pendulum.history) == 50 + summary["skipped_ticks"]
+
+def test_previous_input_is_held_until_the_computation_ends():
+    clock = FakeClock()
+    controller = CountingController(clock, [0.005, 0.005, 0.025, 0.005, 0.005])
+    plant = LocalPlant([0.0, 0.1, 0.0, 0.0], dt=0.01)
+    loop = RealtimeLoop(controller, plant, period=0.01, spin=0.0, clock=clock, sleep=clock.sleep)
+
+    summary = loop.run(5, warmup=0)
+
+    # the third input is computed over 2.5 periods, the second one is held over the overrun
+    # and each input is applied from the tick after its computation
+    np.testing.assert_array_equal(plant.pendulum.history_input_f, [0., 1., 2., 2., 2., 3., 4.])
+    assert summary["skipped_ticks"] == 2
+    assert summary["deadline_misses"] == 1
+    assert plant.input_f == 5.
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import main
+from common.dynamics import CartPoleDynamics
+from common.reference import REFERENCES, Feedforward, make_reference
+from controllers.LQR import LQR
+from simulator import SinglePendulumWithCart, LinearSinglePendulumWithCart
+
+def _params(name, tmp_path):
+    if name == "spline":
+        return {"waypoints": [[0.0, 0.0], [1.0, 0.2], [2.0, 0.0]]}
+
+    if name == "file":
+        path = tmp_path / "reference.csv"
+        np.savetxt(path, [[0.0, 0.0], [1.0, 0.1], [2.0, 0.1]], delimiter=",")
+        return {"path": str(path)}
+
+    return {}
+
+@pytest.mark.parametrize("name", sorted(REFERENCES))
+def test_every_reference_runs(name, tmp_path):
+    scenario = main.make_scenario(reference=name, reference_params=_params(name, tmp_path), steps=200)
+
+    pendulum, _ = main.run_scenario(scenario)
+
+    assert len(pendulum.history) == 200
+    assert np.all(np.isfinite(pendulum.history_error_z))
+    np.testing.assert_allclose(pendulum.history_error_z, pendulum.history_z - pendulum.history_reference_z)
+
+@pytest.mark.parametrize("name", ["spline", "file"])
+def test_missing_reference_params(name):
+    with pytest.raises(ValueError, match="requires"):
+        main.make_scenario(reference=name)
+
+def test_unknown_reference_params():
+    with pytest.raises(ValueError, match="unknown"):
+        main.make_scenario(reference="sine", reference_params={"amp": 1.0})
+
+def test_feedforward_holds_the_reference_motion():
+    A, B = CartPoleDynamics.from_pendulum(SinglePendulumWithCart()).linearize()
+    feedforward = Feedforward(A, B)
+
+    x_ref, f_ff = feedforward.reference_state(0.3, 0.2, 0.5)
+    derivative = np.dot(A, x_ref) + B[:, 0] * f_ff
+
+    np.testing.assert_allclose(derivative[2:], [0.5, 0.0], atol=1e-12)
+    assert x_ref[0] == 0.3 and x_ref[2] == 0.2 and x_ref[3] == 0.0
+
+    # at rest the reference is the upright equilibrium
+    x_rest, f_rest = feedforward.reference_state(0.3)
+    np.testing.assert_allclose(x_rest, [0.3, 0., 0., 0.])
+    assert f_rest == 0.
+
+    states, f = feedforward.reference_states([0.3, 0.0], [0.2, 0.0], 0.5)
+    np.testing.assert_allclose(states[0], x_ref)
+    assert f[0] == pytest.approx(f_ff)
+
+def test_feedforward_removes_ramp_lag():
+    reference = make_reference("ramp", 3000, 0.01, slope=0.1)
+    controller = LQR(SinglePendulumWithCart(), cache=None)
+
+    errors = {}
+    for use_feedforward in (True, False):
+        pendulum = LinearSinglePendulumWithCart()
+        for step in range(3000):
+            z, v_z, a_z = reference.at(step)
+            if use_feedforward:
+                f = controller.calc_input(pendulum, z, v_z, a_z)
+            else:
+                f = controller.calc_input(pendulum, z)
+            pendulum.update_state(input_f=f[0, 0], dt=0.01)
+
+        errors[use_feedforward] = abs(pendulum.z - reference.at(3000)[0])
+
+    # the pure feedback lags behind the ramp by a constant error
+    assert errors[True] < 1e-4
+    assert errors[False] > 0.1
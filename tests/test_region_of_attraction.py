@@ -0,0 +1,48 @@
+import numpy as np
+
+import region_of_attraction as roa
+from controllers.LQR import LQR
+from simulator import SinglePendulumWithCart
+
+SETTINGS = {"steps": 600, "sdre_table": False}
+
+def test_refined_grid_contains_coarse_grid():
+    _, coarse = roa.make_grid(th=(-1.0, 1.0, 5), v_th=(-4.0, 4.0, 3))
+    _, fine = roa.make_grid(th=(-1.0, 1.0, 9), v_th=(-4.0, 4.0, 5))
+
+    fine_cells = {tuple(state) for state in np.round(fine, 9)}
+    assert all(tuple(state) in fine_cells for state in np.round(coarse, 9))
+
+def test_cells_stop_at_their_outcome():
+    settings = dict(roa.DEFAULT_SETTINGS, **SETTINGS)
+    states = np.array([[0.0, 0.01, 0.0, 0.0], [0.0, 1.4, 0.0, 6.0], [0.0, 0.3, 0.0, 0.0]])
+    pendulum = SinglePendulumWithCart()
+
+    outcomes, times = roa.simulate_cells(LQR(pendulum, cache=None), pendulum, states, settings)
+
+    assert outcomes[0] == roa.CONVERGED
+    assert outcomes[1] == roa.DIVERGED
+    assert times[1] < times[0] < settings["steps"] * settings["dt"]
+
+    # each cell is the same as simulated alone
+    for state, outcome, time in zip(states, outcomes, times):
+        alone = roa.simulate_cells(LQR(pendulum, cache=None), pendulum, state[np.newaxis], settings)
+        assert (alone[0][0], alone[1][0]) == (outcome, time)
+
+def test_refined_grid_simulates_only_new_cells(tmp_path):
+    axes, coarse = roa.make_grid(th=(-0.6, 0.6, 3), v_th=(-2.0, 2.0, 3))
+    first = roa.compute_basin("LQR", coarse, settings=SETTINGS, cache_dir=str(tmp_path))
+
+    axes, fine = roa.make_grid(th=(-0.6, 0.6, 5), v_th=(-2.0, 2.0, 5))
+    second = roa.compute_basin("LQR", fine, settings=SETTINGS, cache_dir=str(tmp_path))
+
+    assert (first["simulated"], first["cached"]) == (9, 0)
+    assert (second["simulated"], second["cached"]) == (16, 9)
+
+    uncached = roa.compute_basin("LQR", fine, settings=SETTINGS)
+    np.testing.assert_array_equal(second["outcomes"], uncached["outcomes"])
+    np.testing.assert_array_equal(second["times"], uncached["times"])
+
+    converged = roa.basin_map(axes, second["outcomes"])
+    assert converged.shape == (5, 5)
+    assert converged[2, 2] == 1.
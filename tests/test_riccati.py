@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from scipy.linalg import solve_continuous_are
+
+from simulator import SinglePendulumWithCart
+from common.dynamics import CartPoleDynamics
+from controllers.riccati import solve_care
+from controllers.SDRE import SDRE
+
+def _system():
+    A, B = CartPoleDynamics.from_pendulum(SinglePendulumWithCart()).linearize()
+    Q = np.diag([1000., 1., 1000., 1000.])
+    R = 10000.
+    return A, B, Q, R
+
+def test_newton_matches_schur():
+    A, B, Q, R = _system()
+    P_exact = solve_continuous_are(A, B, Q, np.atleast_2d(R))
+
+    # warm start from a near solution, e.g. the previous control step
+    K, P, e, iterations, fallback = solve_care(A, B, Q, R, P0=P_exact * 1.01)
+
+    assert not fallback
+    assert 0 < iterations < 20
+    np.testing.assert_allclose(P, P_exact, rtol=1e-7)
+    np.testing.assert_allclose(K, np.dot(B.T, P_exact) / R, rtol=1e-7)
+    assert np.all(e.real < 0.)
+
+def test_without_initial_guess_uses_schur():
+    A, B, Q, R = _system()
+
+    K, P, e, iterations, fallback = solve_care(A, B, Q, R)
+
+    assert fallback and iterations == 0
+    np.testing.assert_allclose(P, solve_continuous_are(A, B, Q, np.atleast_2d(R)))
+
+def test_unstabilizing_initial_guess_falls_back():
+    A, B, Q, R = _system()
+
+    K, P, e, iterations, fallback = solve_care(A, B, Q, R, P0=np.zeros((4, 4)))
+
+    assert fallback and iterations == 0
+    np.testing.assert_allclose(P, solve_continuous_are(A, B, Q, np.atleast_2d(R)))
+
+def test_unconverged_newton_falls_back_with_zero_iterations():
+    A, B, Q, R = _system()
+    P_exact = solve_continuous_are(A, B, Q, np.atleast_2d(R))
+
+    K, P, e, iterations, fallback = solve_care(A, B, Q, R, P0=P_exact * 1.5, tol=0., max_iter=2)
+
+    assert fallback and iterations == 0
+    np.testing.assert_allclose(P, P_exact)
+
+def test_newton_sdre_matches_control_sdre():
+    newton = SDRE(SinglePendulumWithCart(), solver="newton")
+    control = SDRE(SinglePendulumWithCart(), solver="control")
+
+    for th in np.linspace(0.3, 0.0, 10):
+        pendulum = SinglePendulumWithCart(init_z=0.1, init_th=th, init_v_th=-0.5)
+        assert newton.calc_input(pendulum)[0, 0] == pytest.approx(control.calc_input(pendulum)[0, 0], rel=1e-6)
+
+    # the first step has no previous solution, the others are warm started
+    assert newton.num_fallbacks == 1
+    assert newton.history_iterations[0] == 0
+    assert all(iterations > 0 for iterations in newton.history_iterations[1:])
@@ -0,0 +1,19 @@
+import numpy as np
+
+from simulator import CartPoleParams, SinglePendulumWithCart, BatchSinglePendulumWithCart
+
+def test_batch_shares_params_with_single():
+    single = SinglePendulumWithCart(init_th=0.2)
+    batch = BatchSinglePendulumWithCart([[0.0, 0.2, 0.0, 0.0]])
+
+    assert isinstance(batch, CartPoleParams)
+
+    single.set_params(p_m=0.3, c_mu=1e-3)
+    batch.set_params(p_m=0.3, c_mu=1e-3)
+    assert batch.p_j == single.p_j
+
+    for _ in range(100):
+        single.update_state(input_f=0.1, dt=0.01)
+        batch.update_state(input_f=0.1, dt=0.01)
+
+    np.testing.assert_allclose(batch.states[0], [single.z, single.th, single.v_z, single.v_th], rtol=1e-10)
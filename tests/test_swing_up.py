@@ -0,0 +1,63 @@
+import math
+import numpy as np
+import pytest
+
+from simulator import SinglePendulumWithCart
+from controllers.SwingUp import SwingUp
+
+def _step(controller, th, v_th=0.0):
+    return controller.calc_input(SinglePendulumWithCart(init_th=th, init_v_th=v_th))
+
+def test_hysteresis_between_catch_and_release():
+    controller = SwingUp(SinglePendulumWithCart(), catch_angle=0.3, release_angle=0.6)
+
+    modes = []
+    for th in [3.0, 0.31, 0.29, 0.45, 0.59, 0.61, 0.45, 0.29]:
+        _step(controller, th)
+        modes.append(controller.mode)
+
+    assert modes == ["swing", "swing", "balance", "balance", "balance", "swing", "swing", "balance"]
+    assert controller.switch_times == [(2, "balance"), (5, "swing"), (7, "balance")]
+
+def test_angle_is_wrapped():
+    controller = SwingUp(SinglePendulumWithCart())
+
+    _step(controller, 2. * math.pi + 0.1)
+    assert controller.mode == "balance"
+
+    _step(controller, -2. * math.pi - 0.7)
+    assert controller.mode == "swing"
+
+def test_balance_is_lqr():
+    pendulum = SinglePendulumWithCart()
+    controller = SwingUp(pendulum)
+    state = SinglePendulumWithCart(init_z=0.1, init_th=0.1, init_v_z=-0.2, init_v_th=0.3)
+
+    np.testing.assert_allclose(controller.calc_input(state), controller.lqr.calc_input(state))
+
+def test_release_angle_below_catch_angle_is_rejected():
+    with pytest.raises(ValueError):
+        SwingUp(SinglePendulumWithCart(), catch_angle=0.5, release_angle=0.4)
+
+def test_swing_phase_pumps_energy():
+    controller = SwingUp(SinglePendulumWithCart(), max_acceleration=4.0)
+    pendulum = SinglePendulumWithCart(init_th=math.pi - 0.05)
+
+    energies = []
+    for _ in range(100):
+        pendulum.update_state(input_f=controller.calc_input(pendulum)[0, 0], dt=0.01)
+        energies.append(controller.dynamics.energy(math.remainder(pendulum.th, 2. * math.pi), pendulum.v_th))
+
+    assert controller.mode == "swing"
+    assert energies[-1] > energies[0]
+
+def test_swings_up_and_catches():
+    pendulum = SinglePendulumWithCart(init_th=math.pi)
+    controller = SwingUp(pendulum)
+
+    for _ in range(2000):
+        pendulum.update_state(input_f=controller.calc_input(pendulum)[0, 0], dt=0.01)
+
+    assert controller.mode == "balance"
+    assert abs(math.remainder(pendulum.th, 2. * math.pi)) < 0.02
+    assert abs(pendulum.v_th) < 0.05
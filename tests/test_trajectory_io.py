@@ -0,0 +1,57 @@
+import warnings
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pytest
+
+import main
+from common.trajectory_io import save_pendulum_trajectory, load_pendulum_trajectory
+from simulator import SinglePendulumWithCart
+from fig_drawer import FigDrawer
+
+def test_round_trip(tmp_path):
+    scenario = main.make_scenario(reference="sine", steps=100)
+    pendulum, controller = main.run_scenario(scenario)
+
+    path = str(tmp_path / "run.traj")
+    save_pendulum_trajectory(path, pendulum, scenario["dt"], controller=controller)
+    loaded = load_pendulum_trajectory(path)
+
+    np.testing.assert_array_equal(loaded.history_z, pendulum.history_z)
+    np.testing.assert_array_equal(loaded.history_reference_z, pendulum.history_reference_z)
+    assert loaded.z == pendulum.z
+
+@pytest.mark.parametrize("reference", [None, "sine"])
+def test_fig_drawer_plots_only_set_reference(reference):
+    scenario = main.make_scenario(reference=reference, steps=100)
+    pendulum, controller = main.run_scenario(scenario)
+
+    drawer = FigDrawer(pendulum, controller)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        drawer.draw_fig(dt=scenario["dt"], show=False)
+
+    labels = [line.get_label() for line in drawer.z_axis.get_lines()]
+    assert ("reference_z" in labels) == (reference is not None)
+
+def test_empty_history_raises(tmp_path):
+    pendulum = SinglePendulumWithCart()
+
+    with pytest.raises(ValueError, match="no history"):
+        save_pendulum_trajectory(str(tmp_path / "empty.traj"), pendulum, 0.01)
+
+    with pytest.raises(ValueError, match="no history"):
+        FigDrawer(pendulum, None).draw_fig(show=False)
+
+def test_fig_drawer_keeps_sampling_time_of_file(tmp_path):
+    scenario = main.make_scenario(steps=50, dt=0.02)
+    pendulum, controller = main.run_scenario(scenario)
+
+    path = str(tmp_path / "run.traj")
+    save_pendulum_trajectory(path, pendulum, scenario["dt"], controller=controller)
+
+    drawer = FigDrawer.from_file(path)
+    drawer.draw_fig(show=False)
+
+    times = drawer.z_axis.get_lines()[0].get_xdata()
+    assert times[-1] == pytest.approx(49 * 0.02)
@@ -0,0 +1,39 @@
+import tuner
+from controllers.SDRE import DEFAULT_WEIGHTS
+
+def test_initial_params_are_inside_the_search_space():
+    for name, space in tuner.SEARCH_SPACES.items():
+        for key, (low, high, scale) in space.items():
+            value = tuner.INITIAL_PARAMS[name][key]
+            assert (scale == "log0" and value == 0.) or low <= value <= high
+
+def test_sdre_search_starts_from_the_default_weights():
+    t = tuner.Tuner("SDRE", processes=1, population=2,
+                    evaluation={"num_trials": 1, "simulation_time": 10})
+
+    t.run(generations=1)
+
+    first = tuner.TuningCache.make_key("SDRE", {key: DEFAULT_WEIGHTS[key] for key in tuner.SEARCH_SPACES["SDRE"]},
+                                       t.evaluation)
+    assert t.cache.get(first) is not None
+
+def test_sdre_searches_the_schedule():
+    assert {"Q_z_boost", "Q_v_z_boost", "z_switch", "th_switch", "steepness"} <= set(tuner.SEARCH_SPACES["SDRE"])
+
+def test_initial_evaluation_is_cached(monkeypatch):
+    evaluated = []
+    evaluate = tuner.evaluate
+
+    def counted_evaluate(name, params, evaluation=None):
+        evaluated.append(dict(params))
+        return evaluate(name, params, evaluation)
+
+    monkeypatch.setattr(tuner, "evaluate", counted_evaluate)
+
+    t = tuner.Tuner("LQR", processes=1, population=2, evaluation={"num_trials": 1, "simulation_time": 10})
+    initial = t.evaluate_initial()
+    t.run(generations=1)
+
+    assert evaluated.count(t.initial) == 1
+    assert t.history[0]["evaluated"] == len(evaluated) - 1
+    assert t.best[1]["cost"] <= initial["cost"]
@@ -0,0 +1,481 @@
+# search of the weights Q / R of the controllers against simulated closed loop trajectories
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import numpy as np
+
+from campaign import make_trials, run_trial
+from controllers.SDRE import DEFAULT_WEIGHTS
+
+# name : (low, high, scale) of each searched parameter,
+# "log0" is "log" whose lowest unit coordinate is 0 (the boost is off, the default of SDRE)
+SEARCH_SPACES = {
+    "LQR": {
+        "Q_z": (1e-2, 1e4, "log"),
+        "Q_th": (1e-2, 1e4, "log"),
+        "Q_v_z": (1e-2, 1e4, "log"),
+        "Q_v_th": (1e-2, 1e4, "log"),
+        "R": (1e-2, 1e4, "log"),
+    },
+    "SDRE": {
+        "Q_z": (1e-1, 1e5, "log"),
+        "Q_th": (1e-1, 1e5, "log"),
+        "Q_v_z": (1e-1, 1e5, "log"),
+        "Q_v_th": (1e-1, 1e5, "log"),
+        "R": (1e0, 1e6, "log"),
+        "R_boost": (1e-1, 1e6, "log0"),
+        "Q_z_boost": (1e-1, 1e6, "log0"),
+        "Q_th_boost": (1e-1, 1e6, "log0"),
+        "Q_v_z_boost": (1e-1, 1e6, "log0"),
+        "th_switch": (0.02, 0.5, "linear"),
+        "z_switch": (0.5, 4.5, "linear"),
+        "steepness": (1e0, 1e3, "log"),
+    },
+}
+
+# initial values of the search, the weights of the controllers, they are inside the search spaces
+INITIAL_PARAMS = {
+    "LQR": {"Q_z": 10.0, "Q_th": 10.0, "Q_v_z": 10.0, "Q_v_th": 10.0, "R": 100.0},
+    "SDRE": {name: DEFAULT_WEIGHTS[name] for name in SEARCH_SPACES["SDRE"]},
+}
+
+DEFAULT_EVALUATION = {
+    "num_trials": 8,
+    "seed": 0,
+    "param_scale": 0.0, # relative perturbation of the plant parameters of the trials
+    "simulation_time": 2000,
+    "sampling_time": 0.01,
+    "failure_cost": 40.0, # cost of a trial which did not settle, in seconds of the settling time
+    "z_weight": 1.0, # cost of max |z| in seconds per meter
+    "effort_weight": 0.01, # cost of the control effort in seconds per N^2 s
+}
+
+def make_options(name, params):
+    """
+    Parameters
+    ------------
+    name : str
+        "LQR" or "SDRE"
+    params : dict
+        values of the searched parameters
+
+    Returns
+    ---------
+    options : dict
+        keyword arguments of the controller
+    """
+    if name == "LQR":
+        Q = np.diag([params["Q_z"], params["Q_th"], params["Q_v_z"], params["Q_v_th"]])
+        return {"Q": Q, "R": params["R"]}
+
+    # the newton solver is warm started from the previous step, the trials are about twice faster
+    return {"weights": dict(params), "solver": "newton"}
+
+def trial_cost(result, evaluation):
+    """
+    Parameters
+    ------------
+    result : dict
+        result of campaign.run_trial
+    evaluation : dict
+        DEFAULT_EVALUATION updated by the user
+
+    Returns
+    ---------
+    cost : float
+        settling time (or failure_cost) plus the weighted max |z| and control effort
+    """
+    if not result["success"]:
+        return evaluation["failure_cost"]
+
+    return result["settling_time"] + evaluation["z_weight"] * result["max_abs_z"] \
+        + evaluation["effort_weight"] * result["control_effort"]
+
+def evaluate(name, params, evaluation=None):
+    """
+    Parameters
+    ------------
+    name : str
+        "LQR" or "SDRE"
+    params : dict
+        values of the searched parameters
+    evaluation : dict, optional
+        overwrites DEFAULT_EVALUATION
+
+    Returns
+    ---------
+    score : dict
+        cost : mean cost of the trials
+        success_rate : float
+        mean_settling_time : mean settling time of the settled trials, nan if none
+
+    Notes
+    --------
+    the trials stop at the settled or diverged events, so the bad candidates are cheap
+    """
+    evaluation = dict(DEFAULT_EVALUATION, **(evaluation or {}))
+    options = make_options(name, params)
+
+    trials = make_trials(evaluation["num_trials"], [name], seed=evaluation["seed"],
+                         param_scale=evaluation["param_scale"])
+
+    costs = []
+    settling_times = []
+
+    for trial in trials:
+        try:
+            result = run_trial(trial, simulation_time=evaluation["simulation_time"],
+                               sampling_time=evaluation["sampling_time"], early_stop=True, controller_options=options)
+        except (ValueError, np.linalg.LinAlgError): # e.g. the weights have no stabilizing solution
+            costs.append(evaluation["failure_cost"])
+            continue
+
+        costs.append(trial_cost(result, evaluation))
+        if result["success"]:
+            settling_times.append(result["settling_time"])
+
+    return {"cost": float(np.mean(costs)), "success_rate": len(settling_times) / len(trials),
+            "mean_settling_time": float(np.mean(settling_times)) if settling_times else math.nan}
+
+class TuningCache():
+    """
+    scores of the evaluated candidates
+
+    Attributes
+    ------------
+    path : str or None
+        if not None, the scores are stored in this json file
+    scores : dict
+        key : score
+    hits : int
+        number of the candidates served from the cache
+
+    Notes
+    --------
+    the candidates are rounded on the grid of the search (see Tuner),
+    so the repeated and converged candidates hit the cache
+    """
+
+    def __init__(self, path=None):
+        """
+        Parameters
+        ------------
+        path : str, optional
+            path of the json file, default is None (memory only)
+        """
+        self.path = path
+        self.scores = {}
+        self.hits = 0
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.scores = json.load(f)
+
+    @staticmethod
+    def make_key(name, params, evaluation):
+        """
+        Returns
+        ---------
+        key : str
+            hash of the controller, parameters and evaluation settings
+        """
+        text = json.dumps({"controller": name, "params": params, "evaluation": evaluation}, sort_keys=True)
+
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def get(self, key):
+        score = self.scores.get(key)
+        if score is not None:
+            self.hits += 1
+
+        return score
+
+    def put(self, key, score):
+        self.scores[key] = score
+
+    def save(self):
+        if self.path is None:
+            return
+
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.scores, f)
+        os.replace(temporary, self.path)
+
+class _CandidateWorker():
+    """picklable evaluate with fixed controller and evaluation settings
+    """
+    def __init__(self, name, evaluation):
+        self.name = name
+        self.evaluation = evaluation
+
+    def __call__(self, params):
+        return evaluate(self.name, params, self.evaluation)
+
+class Tuner():
+    """
+    cross entropy search of the weights of a controller
+
+    Attributes
+    ------------
+    name : str
+        "LQR" or "SDRE"
+    space : dict
+        name : (low, high, scale) of the searched parameters
+    evaluation : dict
+        DEFAULT_EVALUATION updated by the user
+    cache : TuningCache class
+    initial : dict
+        center of the first generation, evaluated as its first candidate
+    best : tuple of (dict, dict) or None
+        (params, score) of the best candidate so far
+    history : list of dict
+        best and mean cost and number of the evaluations of each generation
+
+    Notes
+    --------
+    the parameters are searched in the unit cube, mapped linearly or logarithmically to (low, high),
+    (the unit coordinate 0 of "log0" is the value 0),
+    each generation samples a normal distribution around the mean, evaluates the candidates
+    in parallel and moves the distribution to the elite candidates
+    the unit coordinates are rounded by the resolution, so the candidates are on a grid,
+    except the first candidate of the first generation, which is the initial values
+    """
+
+    def __init__(self, name, space=None, initial=None, evaluation=None, cache=None, processes=None,
+                 population=16, elite_fraction=0.25, initial_std=0.2, resolution=1e-3, seed=0):
+        """
+        Parameters
+        ------------
+        name : str
+            "LQR" or "SDRE"
+        space : dict, optional
+            searched parameters, default is SEARCH_SPACES[name]
+        initial : dict, optional
+            center of the first generation, default is INITIAL_PARAMS[name]
+        evaluation : dict, optional
+            overwrites DEFAULT_EVALUATION
+        cache : TuningCache class, optional
+            default is the memory cache
+        processes : int, optional
+            number of worker processes, default is None (number of cores)
+        population : int
+            number of the candidates of each generation, default is 16
+        elite_fraction : float
+            fraction of the candidates which update the distribution, default is 0.25
+        initial_std : float
+            standard deviation of the first generation in the unit cube, default is 0.2
+        resolution : float
+            grid of the unit coordinates, default is 1e-3
+        seed : int
+            seed of the sampling, default is 0
+        """
+        if name not in SEARCH_SPACES:
+            raise ValueError("controller should be chosen from {0}".format(", ".join(SEARCH_SPACES)))
+
+        self.name = name
+        self.space = SEARCH_SPACES[name] if space is None else space
+        self.evaluation = dict(DEFAULT_EVALUATION, **(evaluation or {}))
+        self.cache = TuningCache() if cache is None else cache
+        self.processes = processes
+
+        self.population = population
+        self.num_elites = max(2, int(round(population * elite_fraction)))
+        self.resolution = resolution
+
+        self._names = sorted(self.space)
+        self._random = np.random.RandomState(seed)
+
+        initial = INITIAL_PARAMS[name] if initial is None else initial
+        self.initial = {key: initial[key] for key in self._names}
+        self.mean = self._to_unit(initial)
+        self.std = np.full(len(self._names), initial_std)
+
+        self.best = None
+        self.history = []
+
+    def evaluate_initial(self):
+        """
+        evaluate the initial values through the cache, run does not evaluate them again
+
+        Returns
+        ---------
+        score : dict
+            score of the initial values, see evaluate
+        """
+        key = TuningCache.make_key(self.name, self.initial, self.evaluation)
+        score = self.cache.get(key)
+
+        if score is None:
+            score = evaluate(self.name, self.initial, self.evaluation)
+            self.cache.put(key, score)
+            self.cache.save()
+
+        return score
+
+    def _to_unit(self, params):
+        unit = []
+
+        for name in self._names:
+            low, high, scale = self.space[name]
+            if scale == "log0" and params[name] <= 0.:
+                unit.append(0.)
+                continue
+
+            value = min(max(params[name], low), high)
+            if scale in ("log", "log0"):
+                unit.append(math.log(value / low) / math.log(high / low))
+            else:
+                unit.append((value - low) / (high - low))
+
+        return np.array(unit)
+
+    def _to_params(self, unit):
+        params = {}
+
+        for name, u in zip(self._names, unit):
+            low, high, scale = self.space[name]
+            if scale == "log0" and u <= 0.:
+                params[name] = 0.0
+            elif scale in ("log", "log0"):
+                params[name] = float(low * (high / low) ** u)
+            else:
+                params[name] = float(low + (high - low) * u)
+
+        return params
+
+    def _sample(self):
+        """
+        Returns
+        ---------
+        units : numpy.ndarray, shape(population, parameters)
+            candidates on the grid, the first one is the mean
+        """
+        units = self.mean + self.std * self._random.randn(self.population, len(self._names))
+        units[0] = self.mean
+
+        return np.round(np.clip(units, 0., 1.) / self.resolution) * self.resolution
+
+    def run(self, generations=10, callback=None):
+        """
+        Parameters
+        ------------
+        generations : int
+            number of the generations, default is 10
+        callback : callable, optional
+            called with the record of history after each generation
+
+        Returns
+        ---------
+        best : tuple of (dict, dict)
+            (params, score) of the best candidate
+        """
+        worker = _CandidateWorker(self.name, self.evaluation)
+        pool = None if self.processes == 1 else multiprocessing.Pool(self.processes)
+
+        try:
+            for generation in range(generations):
+                units = self._sample()
+                candidates = [self._to_params(unit) for unit in units]
+                if not self.history:
+                    candidates[0] = dict(self.initial) # the exact initial values, not the nearest grid point
+                keys = [TuningCache.make_key(self.name, params, self.evaluation) for params in candidates]
+
+                # the candidates out of the cache are evaluated once even if they are repeated
+                pending = {}
+                for key, params in zip(keys, candidates):
+                    if key not in pending and self.cache.get(key) is None:
+                        pending[key] = params
+
+                if pool is None:
+                    scores = [worker(params) for params in pending.values()]
+                else:
+                    scores = pool.map(worker, list(pending.values()))
+
+                for key, score in zip(pending, scores):
+                    self.cache.put(key, score)
+                self.cache.save()
+
+                costs = np.array([self.cache.scores[key]["cost"] for key in keys])
+                order = np.argsort(costs, kind="stable")
+
+                if self.best is None or costs[order[0]] < self.best[1]["cost"]:
+                    self.best = (candidates[order[0]], self.cache.scores[keys[order[0]]])
+
+                elites = units[order[:self.num_elites]]
+                self.mean = elites.mean(axis=0)
+                self.std = np.maximum(elites.std(axis=0), self.resolution)
+
+                record = {"generation": generation, "best_cost": self.best[1]["cost"],
+                          "mean_cost": float(np.mean(costs)), "evaluated": len(pending)}
+                self.history.append(record)
+
+                if callback is not None:
+                    callback(record)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return self.best
+
+    def best_scenario(self):
+        """
+        Returns
+        ---------
+        scenario : dict
+            controller and weights of the best candidate, the keys of main.DEFAULT_SCENARIO
+        """
+        params, _ = self.best
+
+        if self.name == "LQR":
+            return {"controller": "LQR", "Q": [params["Q_z"], params["Q_th"], params["Q_v_z"], params["Q_v_th"]],
+                    "R": params["R"]}
+
+        return {"controller": "SDRE", "weights": params}
+
+def main():
+    parser = argparse.ArgumentParser(description="search the weights of the controller")
+    parser.add_argument("--controller", choices=sorted(SEARCH_SPACES), default="LQR")
+    parser.add_argument("--generations", type=int, default=10)
+    parser.add_argument("--population", type=int, default=16, help="number of the candidates of each generation")
+    parser.add_argument("--trials", type=int, default=DEFAULT_EVALUATION["num_trials"],
+                        help="number of the closed loop trials of each candidate")
+    parser.add_argument("--param-scale", type=float, default=DEFAULT_EVALUATION["param_scale"],
+                        help="relative parameter perturbation of the trials")
+    parser.add_argument("--steps", type=int, default=DEFAULT_EVALUATION["simulation_time"],
+                        help="maximum simulation steps")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default="tuning_cache.json", help="path of the scores of the candidates, 'none' disables it")
+    parser.add_argument("--output", default="tuned.json", help="path of the best scenario, loaded by main.py --config")
+    args = parser.parse_args()
+
+    evaluation = {"num_trials": args.trials, "param_scale": args.param_scale, "simulation_time": args.steps}
+    cache = TuningCache(None if args.cache == "none" else args.cache)
+
+    tuner = Tuner(args.controller, evaluation=evaluation, cache=cache, processes=args.processes,
+                  population=args.population, seed=args.seed)
+
+    initial = tuner.evaluate_initial()
+    print("initial : cost = {0:.4g}, success_rate = {1:.3g}".format(initial["cost"], initial["success_rate"]))
+
+    def report(record):
+        print("generation {0} : best_cost = {1:.4g}, mean_cost = {2:.4g}, evaluated = {3}".format(
+            record["generation"], record["best_cost"], record["mean_cost"], record["evaluated"]))
+
+    params, score = tuner.run(args.generations, callback=report)
+
+    print("best : {0}".format(", ".join("{0} = {1:.4g}".format(key, value) for key, value in params.items())))
+    print("best : cost = {0:.4g}, success_rate = {1:.3g}, mean_settling_time = {2:.4g}, cache hits = {3}".format(
+        score["cost"], score["success_rate"], score["mean_settling_time"], cache.hits))
+
+    with open(args.output, "w") as f:
+        json.dump({"scenarios": [tuner.best_scenario()]}, f, indent=2)
+    print("best scenario is saved to {0}".format(os.path.abspath(args.output)))
+
+if __name__ == '__main__':
+    main()